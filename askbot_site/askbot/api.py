@@ -4,9 +4,11 @@ in the askbot.models module, but
 api must become a place to manupulate the data in the askbot application
 so that other implementations of the data storage could be possible
 """
-from django.db.models import Q
+from django.core.cache import cache
+from django.db.models import Count, Q
 from askbot import models
 from askbot import const
+from askbot.models.user import get_moderation_items_cache_key
 
 
 def get_info_on_moderation_items(user):
@@ -19,6 +21,11 @@ def get_info_on_moderation_items(user):
     if not(user.is_moderator() or user.is_administrator()):
         return None
 
+    cache_key = get_moderation_items_cache_key(user.id)
+    counts = cache.get(cache_key)
+    if counts is not None:
+        return counts
+
     content_types = (
         const.TYPE_ACTIVITY_MARK_OFFENSIVE,
         const.TYPE_ACTIVITY_MODERATED_NEW_POST,
@@ -27,15 +34,16 @@ def get_info_on_moderation_items(user):
 
     messages = models.ActivityAuditStatus.objects.filter(
         activity__activity_type__in=content_types, user=user)
+    status_counts = dict(messages.values_list('status').annotate(Count('id')))
 
-    seen_count = messages.filter(
-        status=models.ActivityAuditStatus.STATUS_SEEN).count()
-    new_count = messages.filter(
-        status=models.ActivityAuditStatus.STATUS_NEW).count()
-    return {
-        'seen_count': seen_count,
-        'new_count': new_count
+    counts = {
+        'seen_count': status_counts.get(models.ActivityAuditStatus.STATUS_SEEN, 0),
+        'new_count': status_counts.get(models.ActivityAuditStatus.STATUS_NEW, 0)
     }
+    # the cached value is dropped when the user's
+    # ActivityAuditStatus records change, see askbot.models
+    cache.set(cache_key, counts, const.LONG_TIME)
+    return counts
 
 
 def get_admin(seed_user_id=None):
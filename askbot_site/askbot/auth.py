@@ -267,10 +267,7 @@ def onUpVoted(vote, post, user, timestamp=None):
         timestamp = timezone.now()
     vote.save()
 
-    if post.post_type != 'comment':
-        post.vote_up_count = int(post.vote_up_count) + 1
-    post.points = int(post.points) + 1
-    post.save()
+    post.change_vote_counts(up_votes=1)
 
     if post.post_type == 'comment':
         # reputation is not affected by the comment votes
@@ -278,12 +275,11 @@ def onUpVoted(vote, post, user, timestamp=None):
 
     if not (post.wiki or post.is_anonymous):
         author = post.author
-        todays_rep_gain = Repute.objects.get_reputation_by_upvoted_today(author)
+        todays_rep_gain = Repute.objects.get_cached_reputation_by_upvoted_today(author)
         if todays_rep_gain < askbot_settings.MAX_REP_GAIN_PER_USER_PER_DAY:
             author.receive_reputation(
                 askbot_settings.REP_GAIN_FOR_RECEIVING_UPVOTE,
                 post.language_code)
-            author.save()
 
             # TODO: this is suboptimal if post is already a question
             question = post.thread._question_post()
@@ -304,13 +300,7 @@ def onUpVotedCanceled(vote, post, user, timestamp=None):
         timestamp = timezone.now()
     vote.delete()
 
-    if post.post_type != 'comment':
-        post.vote_up_count = int(post.vote_up_count) - 1
-        if post.vote_up_count < 0:
-            post.vote_up_count = 0
-
-    post.points = int(post.points) - 1
-    post.save()
+    post.change_vote_counts(up_votes=-1)
 
     if post.post_type == 'comment':
         # comment votes do not affect reputation
@@ -321,7 +311,6 @@ def onUpVotedCanceled(vote, post, user, timestamp=None):
         author.receive_reputation(
             -askbot_settings.REP_GAIN_FOR_RECEIVING_UPVOTE,
             post.language_code)
-        author.save()
 
         # TODO: this is suboptimal if post is already a question
         question = post.thread._question_post()
@@ -342,16 +331,13 @@ def onDownVoted(vote, post, user, timestamp=None):
         timestamp = timezone.now()
     vote.save()
 
-    post.vote_down_count = int(post.vote_down_count) + 1
-    post.points = int(post.points) - 1
-    post.save()
+    post.change_vote_counts(down_votes=1)
 
     if not (post.wiki or post.is_anonymous):
         author = post.author
         author.receive_reputation(
             askbot_settings.REP_LOSS_FOR_RECEIVING_DOWNVOTE,
             post.language_code)
-        author.save()
 
         # TODO: this is suboptimal if post is already a question
         question = post.thread._question_post()
@@ -368,7 +354,6 @@ def onDownVoted(vote, post, user, timestamp=None):
         user.receive_reputation(
             askbot_settings.REP_LOSS_FOR_DOWNVOTING,
             post.language_code)
-        user.save()
 
         reputation = Repute(
             user=user,
@@ -386,18 +371,13 @@ def onDownVotedCanceled(vote, post, user, timestamp=None):
         timestamp = timezone.now()
     vote.delete()
 
-    post.vote_down_count = int(post.vote_down_count) - 1
-    if post.vote_down_count < 0:
-        post.vote_down_count = 0
-    post.points = post.points + 1
-    post.save()
+    post.change_vote_counts(down_votes=-1)
 
     if not (post.wiki or post.is_anonymous):
         author = post.author
         author.receive_reputation(
             -askbot_settings.REP_LOSS_FOR_RECEIVING_DOWNVOTE,
             post.language_code)
-        author.save()
 
         # TODO: this is suboptimal if post is already a question
         question = post.thread._question_post()
@@ -414,7 +394,6 @@ def onDownVotedCanceled(vote, post, user, timestamp=None):
         user.receive_reputation(
             -askbot_settings.REP_LOSS_FOR_DOWNVOTING,
             post.language_code)
-        user.save()
 
         reputation = Repute(
             user=user,
@@ -34,12 +34,14 @@ import askbot.conf.words
 
 #import main settings object
 from askbot.conf.settings_wrapper import settings
+from django.conf import settings as django_settings
 
 def should_show_sort_by_relevance():
     """True if configuration support sorting
     questions by search relevance
     """
-    return ('postgresql_psycopg2' in askbot.get_database_engine_name())
+    return django_settings.ASKBOT_SEARCH_INDEX_ENABLED \
+        or 'postgresql_psycopg2' in askbot.get_database_engine_name()
 
 def get_tag_display_filter_strategy_choices():
     from askbot.conf import settings as askbot_settings
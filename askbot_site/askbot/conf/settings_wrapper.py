@@ -21,9 +21,11 @@ at run time
 askbot.deps.livesettings is a module developed for satchmo project
 """
 import logging
+import time
 
 from django.conf import settings as django_settings
 from django.core.cache import cache
+from django.core.signals import request_started
 from django.contrib.sites.models import Site
 from django.core.files import uploadedfile
 from django.utils.encoding import force_text
@@ -40,6 +42,11 @@ from livesettings import signals
 from askbot.utils.functions import format_setting_name
 
 
+# seconds between the checks of the settings generation
+# outside of the request cycle, e.g. in the celery workers
+LOCAL_CACHE_CHECK_INTERVAL = 1
+
+
 def assert_setting_info_correct(info):
     assert isinstance(info, tuple), 'must be tuple, %s found' % str(info)
     assert len(info) in (3, 4), 'setting tuple must have three or four elements'
@@ -56,6 +63,11 @@ class ConfigSettings(object):
     """
     __instance = None
     __group_map = {}
+    # process-local cache of values (key, language) -> value,
+    # valid while the settings generation stays the same
+    __local_values = {}
+    __local_generation = None
+    __local_checked_at = 0
 
     def __init__(self):
         """assigns SortedDotDict to self.__instance if not set"""
@@ -77,7 +89,34 @@ class ConfigSettings(object):
         settings_key = 'ASKBOT_' + key
         if hasattr(django_settings, settings_key):
             return getattr(django_settings, settings_key)
-        return cls.__instance[key].value
+
+        if time.time() - cls.__local_checked_at > LOCAL_CACHE_CHECK_INTERVAL:
+            cls.validate_local_cache()
+
+        local_key = (key, get_language())
+        try:
+            return cls.__local_values[local_key]
+        except KeyError:
+            value = cls.__instance[key].value
+            cls.__local_values[local_key] = value
+            return value
+
+    @classmethod
+    def validate_local_cache(cls):
+        """Drops the process-local values if the settings
+        were changed since the last check, in any of the processes.
+        Called at the start of each request."""
+        generation = get_settings_generation()
+        if generation != cls.__local_generation:
+            cls.__local_values = {}
+            cls.__local_generation = generation
+        cls.__local_checked_at = time.time()
+
+    @classmethod
+    def clear_local_cache(cls):
+        """Drops the process-local values"""
+        cls.__local_values = {}
+        cls.__local_generation = None
 
     def get_default(self, key):
         """return the defalut value for the setting"""
@@ -112,6 +151,8 @@ class ConfigSettings(object):
             setting.value = value
             setting.save()
         # self.prime_cache()
+        bump_settings_generation()
+        self.clear_local_cache()
 
     def register(self, value):
         """registers the setting
@@ -257,6 +298,32 @@ def get_bulk_cache_key(lang=None):
     return 'askbot-settings-' + (lang or get_language())
 
 
+SETTINGS_GENERATION_CACHE_KEY = 'askbot-settings-generation'
+
+
+def get_settings_generation():
+    """Returns number identifying the current state of the live
+    settings, shared by all the server processes via the cache.
+    The number changes each time any of the settings is updated,
+    so that the process-local copies of settings can be invalidated.
+    """
+    generation = cache.get(SETTINGS_GENERATION_CACHE_KEY)
+    if generation is None:
+        # start from the timestamp so that values memoized
+        # before the cache was flushed are not mistaken as current
+        cache.add(SETTINGS_GENERATION_CACHE_KEY, int(time.time() * 1000), None)
+        generation = cache.get(SETTINGS_GENERATION_CACHE_KEY)
+    return generation
+
+
+def bump_settings_generation():
+    """Marks all process-local copies of the settings as stale"""
+    try:
+        cache.incr(SETTINGS_GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.set(SETTINGS_GENERATION_CACHE_KEY, int(time.time() * 1000), None)
+
+
 def update_cached_value(key, value, language_code=None):
     cache_key = get_bulk_cache_key(language_code or get_language())
     settings_dict = cache.get(cache_key)
@@ -274,10 +341,20 @@ def cached_value_update_handler(setting=None, new_value=None,
             update_cached_value(key, new_value, lang)
     else:
         update_cached_value(key, new_value, language_code)
+    bump_settings_generation()
+    ConfigSettings.clear_local_cache()
+
+
+def validate_local_cache_handler(*args, **kwargs):
+    ConfigSettings.validate_local_cache()
 
 signals.configuration_value_changed.connect(
     cached_value_update_handler,
     dispatch_uid='update_cached_value_upon_config_change'
 )
+request_started.connect(
+    validate_local_cache_handler,
+    dispatch_uid='validate_local_settings_cache_upon_request_start'
+)
 # settings instance to be used elsewhere in the project
 settings = ConfigSettings()
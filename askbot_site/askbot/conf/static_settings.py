@@ -48,6 +48,10 @@ class AskbotStaticSettings(AppConf):
     DEBUG_INCOMING_EMAIL = False
     EXTRA_SKINS_DIR = None #None or path to directory with skins
     IP_MODERATION_ENABLED = False
+    # "next page" links of the question lists carry a cursor
+    # instead of the page offset for the sorts listed in
+    # SearchState.CURSOR_SORT_METHODS, question counts are cached
+    KEYSET_PAGINATION_ENABLED = False
     LANGUAGE_MODE = 'single-lang' # 'single-lang', 'url-lang' or 'user-lang'
     MAIN_PAGE_BASE_URL = pgettext('urls', 'questions') + '/'
     MAX_UPLOAD_FILE_SIZE = 1024 * 1024 #result in bytes
@@ -63,13 +67,53 @@ class AskbotStaticSettings(AppConf):
     # in order to prevent sending too many outdated alerts
     DELAYED_EMAIL_ALERTS_CUTOFF_TIMESTAMP = timezone.datetime.fromtimestamp(0)
     QUESTION_PAGE_BASE_URL = pgettext('urls', 'question') + '/'
+    QUESTIONS_COUNT_CACHE_TIMEOUT = 60 # seconds, used with KEYSET_PAGINATION_ENABLED
+    RELATED_TAGS_CACHE_TIMEOUT = 600 # seconds, related tags of the searches not precomputed
+    SEARCH_RESULTS_CACHE_TIMEOUT = 30 # seconds, ids of the threads found on the questions page, 0 to disable
     SERVICE_URL_PREFIX = 's/' # prefix for non-UI urls
     SELF_TEST = True # if true - run startup self-test
     TRANSLATE_URL = True # set true to localize urls
     USER_DATA_EXPORT_DIR = const.DEFAULT_USER_DATA_EXPORT_DIR
     USE_LOCAL_FONTS = False
+    # accumulate question view counts in the cache, they are saved
+    # by the `askbot_flush_view_counts` command or the
+    # `askbot.tasks.flush_view_counts` celery task, run periodically
+    VIEW_COUNT_BUFFER_ENABLED = False
+    # full text search with the built-in index askbot.search.native,
+    # run `askbot_rebuild_search_index` before enabling on a live site
+    SEARCH_INDEX_ENABLED = False
+    SEARCH_INDEX_DIR = const.DEFAULT_SEARCH_INDEX_DIR
+    SEARCH_INDEX_MAX_RESULTS = 500 # best matching threads per search
+    TITLE_INDEX_ENABLED = False # in-memory index of the titles for the ask form suggestions
     SEARCH_FRONTEND_SRC_URL = None
     SEARCH_FRONTEND_CSS_URL = None
+    # answer question lists from the denormalized ThreadListing table,
+    # run `askbot_rebuild_thread_listing` before enabling on a live site
+    THREAD_LISTING_INDEX_ENABLED = False
+    # prefix search in the users directory from the UserSearchTerm records,
+    # run `askbot_rebuild_user_search_index` before enabling on a live site
+    USER_SEARCH_INDEX_ENABLED = False
+    # PostgreSQL only, the text search vectors of the changed threads
+    # are recomputed by `askbot_update_search_vectors` instead of triggers,
+    # run `init_postgresql_full_text_search` after enabling
+    POSTGRESQL_DEFERRED_SEARCH_VECTORS = False
+    # share of the question searches measured for the
+    # `askbot_search_stats` command, 0 disables the profiling
+    SEARCH_PROFILE_SAMPLE_RATE = 0
+    # profiled searches slower than this many milliseconds are logged
+    SEARCH_SLOW_LOG_THRESHOLD = 500
+    # number of the slow searches kept in the log
+    SEARCH_SLOW_LOG_SIZE = 1000
+    # save the query plans of the slow searches, runs EXPLAIN
+    SEARCH_SLOW_LOG_EXPLAIN = False
+    # badge events are queued and evaluated in batches by
+    # `askbot_evaluate_badges` instead of during the request
+    BADGE_EVALUATION_DEFERRED = False
+    # draw the reputation graphs from the daily ReputationSnapshot records,
+    # run `askbot_rebuild_reputation_snapshots` before enabling on a live site
+    REPUTATION_SNAPSHOTS_ENABLED = False
+    USERS_COUNT_CACHE_TIMEOUT = 300 # seconds, number of users on the users page
+    SEARCH_POSTS_CACHE_TIMEOUT = 300 # seconds, results of the moderator post search
     WHITELISTED_IPS = tuple() # a tuple of whitelisted ips for moderation
 
     class Meta:
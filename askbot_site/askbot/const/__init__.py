@@ -14,6 +14,9 @@ from askbot.const.message_keys import * #pylint: disable=wildcard-import
 DEFAULT_USER_DATA_EXPORT_DIR = os.path.abspath(
     os.path.join(get_install_directory(), '..', 'user_data'))
 
+DEFAULT_SEARCH_INDEX_DIR = os.path.abspath(
+    os.path.join(get_install_directory(), '..', 'search_index'))
+
 #todo: customize words
 CLOSE_REASONS = (
     (1, _('duplicate question')),
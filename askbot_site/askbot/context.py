@@ -5,6 +5,7 @@ and the application available for the templates
 import sys
 import json
 from django.conf import settings
+from django.core.cache import cache
 from django.middleware import csrf
 from django.urls import reverse
 from django.utils import timezone
@@ -14,15 +15,21 @@ from askbot import api
 from askbot import models
 from askbot import const
 from askbot.conf import settings as askbot_settings
+from askbot.conf.settings_wrapper import get_settings_generation
+from askbot.models.user import GROUP_LIST_CACHE_KEY
 from askbot.search.state_manager import SearchState
 from askbot.utils import url_utils
 from askbot.utils.slug import slugify
 from askbot.utils.html import site_url
 from askbot.utils.translation import get_language
 
-def should_show_ask_button(user): #pylint: disable=missing-docstring
+# process-local memo of the settings dictionaries used in the templates,
+# language code -> (settings generation, dictionary)
+SETTINGS_SNAPSHOTS = dict()
+
+def should_show_ask_button(user, groups_enabled): #pylint: disable=missing-docstring
     # without groups we always show the ASK button
-    if not askbot_settings.GROUPS_ENABLED:
+    if not groups_enabled:
         return True
 
     # with groups - users must be logged in to ask
@@ -32,10 +39,8 @@ def should_show_ask_button(user): #pylint: disable=missing-docstring
     # get permission to ask based on the group memberships
     return user.can_post_question()
 
-def make_group_list():
+def calculate_group_list():
     """Returns list of dictionaries with keys 'name' and 'link'"""
-    if not askbot_settings.GROUPS_ENABLED:
-        return []
     # calculate context needed to list all the groups
     def _get_group_url(group):
         """calculates url to the group based on its id and name"""
@@ -63,10 +68,32 @@ def make_group_list():
         group_list.append({'name': group['name'], 'link': link})
     return group_list
 
-def application_settings(request):
-    """The context processor function"""
-    my_settings = askbot_settings.as_dict()
-    my_settings['LANGUAGE_CODE'] = getattr(request, 'LANGUAGE_CODE', settings.LANGUAGE_CODE)
+def make_group_list(groups_enabled=None):
+    """Returns list of dictionaries with keys 'name' and 'link'.
+    The list is cached per language until a non-personal group
+    is saved or deleted, or the settings change.
+    """
+    if groups_enabled is None:
+        groups_enabled = askbot_settings.GROUPS_ENABLED
+    if not groups_enabled:
+        return []
+
+    # the global group name is a setting
+    generation = get_settings_generation()
+    language = get_language()
+    group_lists = cache.get(GROUP_LIST_CACHE_KEY) or dict()
+    if language in group_lists and group_lists[language][0] == generation:
+        return group_lists[language][1]
+
+    group_list = calculate_group_list()
+    group_lists[language] = (generation, group_list)
+    cache.set(GROUP_LIST_CACHE_KEY, group_lists, const.LONG_TIME)
+    return group_list
+
+def calculate_settings_snapshot():
+    """Returns dictionary with the livesettings and the values of
+    the django settings used in the templates"""
+    my_settings = dict(askbot_settings.as_dict())
     my_settings['LANGUAGE_MODE'] = askbot.get_lang_mode()
     my_settings['MULTILINGUAL'] = askbot.is_multilingual()
     my_settings['LANGUAGES_DICT'] = dict(getattr(settings, 'LANGUAGES', []))
@@ -95,6 +122,30 @@ def application_settings(request):
         my_settings['TINYMCE_EDITOR_DESELECTOR'] = ''
 
     my_settings['LOGOUT_REDIRECT_URL'] = url_utils.get_logout_redirect_url()
+    my_settings['USE_ASKBOT_LOGIN_SYSTEM'] = \
+        'askbot.deps.django_authopenid' in settings.INSTALLED_APPS
+    return my_settings
+
+def get_settings_snapshot():
+    """Returns the memoized result of `calculate_settings_snapshot`
+    for the current language, the memo is recalculated after
+    any of the livesettings is updated in any of the processes.
+    The returned dictionary must not be modified.
+    """
+    generation = get_settings_generation()
+    language = get_language()
+    snapshot = SETTINGS_SNAPSHOTS.get(language)
+    if snapshot and snapshot[0] == generation:
+        return snapshot[1]
+
+    my_settings = calculate_settings_snapshot()
+    SETTINGS_SNAPSHOTS[language] = (generation, my_settings)
+    return my_settings
+
+def application_settings(request):
+    """The context processor function"""
+    my_settings = dict(get_settings_snapshot())
+    my_settings['LANGUAGE_CODE'] = getattr(request, 'LANGUAGE_CODE', settings.LANGUAGE_CODE)
 
     current_language = get_language()
 
@@ -106,9 +157,9 @@ def application_settings(request):
     else:
         min_search_word_length = my_settings['MIN_SEARCH_WORD_LENGTH']
 
-    need_scope_links = askbot_settings.ALL_SCOPE_ENABLED or \
-        askbot_settings.UNANSWERED_SCOPE_ENABLED or \
-        (request.user.is_authenticated and askbot_settings.FOLLOWED_SCOPE_ENABLED)
+    need_scope_links = my_settings['ALL_SCOPE_ENABLED'] or \
+        my_settings['UNANSWERED_SCOPE_ENABLED'] or \
+        (request.user.is_authenticated and my_settings['FOLLOWED_SCOPE_ENABLED'])
 
     context = {
         'base_url': site_url(''),
@@ -121,18 +172,18 @@ def application_settings(request):
         'need_scope_links': need_scope_links,
         'now': timezone.now(),
         'noscript_url': const.DEPENDENCY_URLS['noscript'],
-        'show_ask_button': should_show_ask_button(request.user)
+        'show_ask_button': should_show_ask_button(
+                                request.user, my_settings['GROUPS_ENABLED']
+                            )
     }
 
-    use_askbot_login = 'askbot.deps.django_authopenid' in settings.INSTALLED_APPS
-    my_settings['USE_ASKBOT_LOGIN_SYSTEM'] = use_askbot_login
-    if use_askbot_login and request.user.is_anonymous:
+    if my_settings['USE_ASKBOT_LOGIN_SYSTEM'] and request.user.is_anonymous:
         from askbot.deps.django_authopenid import context as login_context
         context.update(login_context.login_context(request))
 
-    context['group_list'] = json.dumps(make_group_list())
+    context['group_list'] = json.dumps(make_group_list(my_settings['GROUPS_ENABLED']))
 
-    if askbot_settings.EDITOR_TYPE == 'tinymce':
+    if my_settings['EDITOR_TYPE'] == 'tinymce':
         from tinymce.widgets import TinyMCE
         context['tinymce'] = TinyMCE()
 
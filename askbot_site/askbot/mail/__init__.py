@@ -44,8 +44,23 @@ def extract_first_email_address(text):
         return match.group(0)
     return None
 
+def open_connection():
+    """returns an open connection to the mail server,
+    which allows to send many messages via one connection,
+    the connection must be closed by the caller.
+    Returns ``None`` if the connection could not be opened,
+    then each message is sent through its own connection.
+    """
+    connection = mail.get_connection()
+    try:
+        connection.open()
+    except Exception as error: # pylint: disable=broad-except
+        sys.stderr.write('\n' + str(error) + '\n')
+        return None
+    return connection
+
 def _send_mail(subject_line, body_text, sender_email, recipient_list, # pylint: disable=too-many-arguments
-               headers=None, attachments=None):
+               headers=None, attachments=None, connection=None):
     """base send_mail function, which will attach email in html format
     if html email is enabled"""
     html_enabled = askbot_settings.HTML_EMAIL_ENABLED
@@ -69,7 +84,8 @@ def _send_mail(subject_line, body_text, sender_email, recipient_list, # pylint:
                 sender_email,
                 email_list,
                 headers=headers,
-                attachments=attachments
+                attachments=attachments,
+                connection=connection
             )
     if html_enabled:
         msg.attach_alternative(body_text, "text/html")
@@ -83,7 +99,8 @@ def send_mail( # pylint: disable=too-many-arguments
             recipient_list=None,
             headers=None,
             raise_on_failure=False,
-            attachments=None
+            attachments=None,
+            connection=None
         ):
     """
     todo: remove parameters not relevant to the function
@@ -94,6 +111,8 @@ def send_mail( # pylint: disable=too-many-arguments
 
     if raise_on_failure is True, exceptions.EmailNotSent is raised
     `attachments` is a tuple of triples ((filename, filedata, mimetype), ...)
+    `connection` - optional connection to the mail server,
+    see :func:`open_connection`
     """
     from_email = from_email or askbot_settings.FROM_EMAIL
     body_text = absolutize_urls(body_text)
@@ -107,13 +126,14 @@ def send_mail( # pylint: disable=too-many-arguments
             from_email,
             recipient_list,
             headers=headers,
-            attachments=attachments
+            attachments=attachments,
+            connection=connection
         )
         logging.debug('sent update to %s' % ','.join(map(str, recipient_list)))
     except Exception as error: # pylint: disable=broad-except
         sys.stderr.write('\n' + str(error) + '\n')
         if raise_on_failure:
-            raise exceptions.EmailNotSent(str(error))
+            raise exceptions.EmailNotSent(str(error)) from error
 
 INSTRUCTIONS_PREAMBLE = ugettext_lazy('<p>To post by email, please:</p>')
 QUESTION_TITLE_INSTRUCTION = ugettext_lazy(
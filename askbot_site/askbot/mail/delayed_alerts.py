@@ -0,0 +1,696 @@
+"""Daily and weekly email alerts.
+
+The alerts are calculated for batches of users: the subscriptions,
+followed threads, answers, question views, comments and mentions
+of all users in the batch are loaded with a few queries, instead
+of running the same queries separately for each user.
+
+Used by the ``send_email_alerts`` management command and by the
+``askbot.tasks.send_delayed_email_alerts`` celery task.
+"""
+import datetime
+import logging
+import traceback
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings as django_settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sites.models import Site
+from django.db.models import Q, F
+from django.utils import timezone
+from django.utils.translation import ugettext as _
+from django.utils.translation import activate as activate_language
+
+import askbot
+from askbot import const
+from askbot.conf import settings as askbot_settings
+from askbot.deps.django_authopenid.util import email_is_blacklisted
+from askbot.mail import send_mail
+from askbot.mail.messages import BatchEmailAlert
+from askbot.models import (Activity, ActivityAuditStatus, EmailFeedSetting,
+                           Post, PostRevision, QuestionView, Thread, User)
+from askbot.utils.html import site_url
+
+# when True - feeds are not marked as reported and
+# all alerts are sent to the ADMIN_EMAIL
+DEBUG_DELAYED_ALERTS = False
+# max number of values in the sql "IN" clauses
+MAX_IDS_PER_QUERY = 500
+
+
+def slice_ids(ids):
+    """yields lists of ids of size acceptable for the sql "IN" clause"""
+    ids = list(ids)
+    for start in range(0, len(ids), MAX_IDS_PER_QUERY):
+        yield ids[start:start + MAX_IDS_PER_QUERY]
+
+
+#todo: refactor this as class
+def extend_question_list(
+                    src, dst, cutoff_time = None,
+                    limit=False, add_mention=False,
+                    add_comment = False,
+                    languages=None
+                ):
+    """src is a query set with questions
+    or None
+    dst - is an ordered dictionary
+    update reporting cutoff time for each question
+    to the latest value to be more permissive about updates
+    """
+    if src is None:#is not QuerySet
+        return #will not do anything if subscription of this type is not used
+    if limit and len(list(dst.keys())) >= askbot_settings.MAX_ALERTS_PER_EMAIL:
+        return
+    if cutoff_time is None:
+        if hasattr(src, 'cutoff_time'):
+            cutoff_time = src.cutoff_time
+        else:
+            raise ValueError('cutoff_time is a mandatory parameter')
+
+    for q in src:
+        if languages and q.language_code not in languages:
+            continue
+        if q in dst:
+            meta_data = dst[q]
+        else:
+            meta_data = {'cutoff_time': cutoff_time}
+            dst[q] = meta_data
+
+        if cutoff_time > meta_data['cutoff_time']:
+            #the latest cutoff time wins for a given question
+            #if the question falls into several subscription groups
+            #this makes mailer more eager in sending email
+            meta_data['cutoff_time'] = cutoff_time
+        if add_mention:
+            if 'mentions' in meta_data:
+                meta_data['mentions'] += 1
+            else:
+                meta_data['mentions'] = 1
+        if add_comment:
+            if 'comments' in meta_data:
+                meta_data['comments'] += 1
+            else:
+                meta_data['comments'] = 1
+
+
+def format_action_count(string, number, output):
+    if number > 0:
+        output.append(_(string) % {'num':number})
+
+
+def format_debug_msg(user, content):
+    msg = "%s site_id=%d user=%s: %s" % (
+        timezone.now().strftime('%y-%m-%d %h:%m:%s'),
+        Site.objects.get_current().id,
+        repr(user.username),
+        content
+    )
+    return msg.encode('utf-8')
+
+
+def report_exception(user):
+    """reports exception that happened during sending email alert to user"""
+    message = format_debug_msg(user, traceback.format_exc())
+    print(message)
+    admin_email = askbot_settings.ADMIN_EMAIL
+    site_id = Site.objects.get_current().id
+    try:
+        subject_line = "Error processing daily/weekly notification for User '%s' for Site '%s'" % (user.username, site_id)
+        send_mail(
+            subject_line=subject_line.encode('utf-8'),
+            body_text=message,
+            recipient_list=[admin_email,]
+        )
+    except:
+        message = "ERROR: was unable to report this exception to %s: %s" % (admin_email, traceback.format_exc())
+        print(format_debug_msg(user, message))
+    else:
+        message = "Sent email reporting this exception to %s" % admin_email
+        print(format_debug_msg(user, message))
+
+
+def get_base_questions():
+    """Returns query set of questions that may be
+    reported in the alerts, before the per-user conditions
+    are applied: not deleted, not closed, approved"""
+    questions = Post.objects.get_questions().exclude(
+        deleted=True
+    ).exclude(
+        thread__closed=True
+    )
+    if askbot_settings.CONTENT_MODERATION_MODE == 'premoderation':
+        questions = questions.filter(approved=True)
+    return questions
+
+
+def get_question_sets_for_user(user):
+    """Returns query sets of questions not seen by the user
+    and of questions seen before the last modification"""
+    old_content_cutoff_timestamp = max(
+        user.date_joined, #exclude old stuff
+        django_settings.ASKBOT_DELAYED_EMAIL_ALERTS_CUTOFF_TIMESTAMP
+    )
+    base_qs = get_base_questions().exclude(
+        thread__last_activity_by=user
+    ).exclude(
+        thread__last_activity_at__lt=old_content_cutoff_timestamp
+    ).order_by('-thread__last_activity_at')
+
+    #todo: for some reason filter on did not work as expected ~Q(viewed__who=user) |
+    #      Q(viewed__who=user,viewed__when__lt=F('thread__last_activity_at'))
+    #returns way more questions than you might think it should
+    #so because of that there are two separate query sets
+    not_seen_qs = base_qs.filter(~Q(viewed__who=user))
+    seen_before_last_mod_qs = base_qs.filter(
+        Q(viewed__who=user, viewed__when__lt=F('thread__last_activity_at'))
+    )
+    return not_seen_qs, seen_before_last_mod_qs
+
+
+class DelayedAlertBatch(object):
+    """Calculates and sends the delayed email alerts
+    to a batch of users.
+
+    Only the questions reported on the subscriptions
+    "entire forum" (which are tag filtered) and the per-question
+    update counts are queried separately for each user.
+    """
+
+    def __init__(self, user_ids):
+        self.user_ids = list(user_ids)
+        self.users = OrderedDict()
+        # user id -> {feed type: (feed, cutoff time)}
+        self.due_feeds = defaultdict(dict)
+        # question id -> question
+        self.questions = dict()
+        # user id -> set of thread ids
+        self.followed_threads = defaultdict(set)
+        self.answered_threads = defaultdict(set)
+        # (user id, question id) -> list of view timestamps
+        self.views = defaultdict(list)
+        # user id -> list of thread ids of commented posts
+        self.commented_threads = defaultdict(list)
+        # thread id -> question, for the commented posts
+        self.commented_questions = dict()
+        # user id -> list of thread ids of the mentions
+        self.mentioned_threads = defaultdict(list)
+
+    def get_users_with_due_feed(self, feed_type):
+        """returns ids of users for whom feed of a given type is due"""
+        return [user_id for user_id, feeds in self.due_feeds.items() \
+                                            if feed_type in feeds]
+
+    def get_max_cutoff_time(self, feed_type):
+        """returns the latest cutoff time of the due feeds of a type"""
+        cutoffs = [feeds[feed_type][1] for feeds in self.due_feeds.values() \
+                                            if feed_type in feeds]
+        return max(cutoffs)
+
+    def load_users(self):
+        users = User.objects.filter(
+            id__in=self.user_ids
+        ).exclude(
+            askbot_profile__status__in=('b', 't')
+        ).select_related('askbot_profile').order_by('id')
+
+        for user in users:
+            if email_is_blacklisted(user.email) \
+                and askbot_settings.BLACKLISTED_EMAIL_PATTERNS_MODE == 'strict':
+                continue
+            self.users[user.id] = user
+
+    def add_missing_subscriptions(self):
+        """adds default subscriptions to the users who lack some"""
+        from askbot import forms#need to avoid circular dependency
+        need_feed_types = set(
+            forms.EditUserEmailFeedsForm().get_db_model_subscription_type_names()
+        )
+        feed_types = defaultdict(set)
+        feeds = EmailFeedSetting.objects.filter(subscriber_id__in=self.users.keys())
+        for subscriber_id, feed_type in feeds.values_list('subscriber_id', 'feed_type'):
+            feed_types[subscriber_id].add(feed_type)
+
+        for user_id, user in list(self.users.items()):
+            if need_feed_types - feed_types[user_id]:
+                try:
+                    user.add_missing_askbot_subscriptions()
+                except Exception:
+                    report_exception(user)
+                    del self.users[user_id]
+
+    def load_due_feeds(self):
+        """finds the feeds ripe for reporting, marks them as
+        reported and calculates the cutoff times"""
+        feeds = EmailFeedSetting.objects.filter(
+            subscriber_id__in=self.users.keys()
+        ).exclude(frequency__in=('n', 'i'))
+
+        reported_feed_ids = list()
+        for feed in feeds:
+            if not feed.should_send_now():
+                continue
+            cutoff_time = feed.get_previous_report_cutoff_time()
+            self.due_feeds[feed.subscriber_id][feed.feed_type] = (feed, cutoff_time)
+            #alerts on mentions and comments are processed separately
+            #because comments to questions do not trigger change of last_updated
+            #this may be changed in the future though, see
+            #http://askbot.org/en/question/96/
+            if feed.feed_type != 'm_and_c':
+                reported_feed_ids.append(feed.id)
+
+        if reported_feed_ids and DEBUG_DELAYED_ALERTS == False:
+            EmailFeedSetting.objects.filter(
+                id__in=reported_feed_ids
+            ).update(reported_at=timezone.now())
+
+    def load_comments_and_mentions(self):
+        """loads comments to the posts of the users subscribed to
+        the mentions and comments, and the mentions of those users"""
+        user_ids = self.get_users_with_due_feed('m_and_c')
+        if not user_ids:
+            return
+        cutoff_time = self.get_max_cutoff_time('m_and_c')
+
+        comments = Post.objects.get_comments().filter(
+            parent__author_id__in=user_ids,
+            added_at__lt=cutoff_time
+        ).exclude(
+            author_id=F('parent__author_id')
+        ).exclude(thread=None)
+        comments = comments.values_list('parent__author_id', 'added_at', 'thread_id')
+        for user_id, added_at, thread_id in comments:
+            if added_at < self.due_feeds[user_id]['m_and_c'][1]:
+                self.commented_threads[user_id].append(thread_id)
+
+        thread_ids = set()
+        for threads in self.commented_threads.values():
+            thread_ids.update(threads)
+        for ids in slice_ids(thread_ids):
+            questions = Post.objects.filter(
+                post_type='question', thread_id__in=ids
+            ).select_related('thread')
+            for question in questions:
+                self.commented_questions[question.thread_id] = question
+
+        post_ct = ContentType.objects.get_for_model(Post)
+        memos = ActivityAuditStatus.objects.filter(
+            user_id__in=user_ids,
+            activity__activity_type=const.TYPE_ACTIVITY_MENTION,
+            activity__is_auditted=False,
+            activity__active_at__lt=cutoff_time,
+            activity__content_type=post_ct
+        ).values_list('user_id', 'activity__active_at', 'activity__object_id')
+
+        mentions = list()
+        for user_id, mentioned_at, post_id in memos:
+            if mentioned_at < self.due_feeds[user_id]['m_and_c'][1]:
+                mentions.append((user_id, post_id))
+
+        post_threads = dict()
+        for ids in slice_ids(set([post_id for user_id, post_id in mentions])):
+            posts = Post.objects.filter(id__in=ids).values_list('id', 'thread_id')
+            post_threads.update(dict(posts))
+
+        for user_id, post_id in mentions:
+            thread_id = post_threads.get(post_id)
+            if thread_id:
+                self.mentioned_threads[user_id].append(thread_id)
+
+    def get_min_content_cutoff_time(self):
+        """returns the earliest cutoff of the old content
+        over the users of the batch, see `split_questions`"""
+        return max(
+            min([user.date_joined for user in self.users.values()]),
+            django_settings.ASKBOT_DELAYED_EMAIL_ALERTS_CUTOFF_TIMESTAMP
+        )
+
+    def load_questions(self):
+        """loads the questions followed, asked or answered
+        by the users with the corresponding subscriptions,
+        and the views of these questions by the users.
+        Threads without activity since the old content
+        cutoff of all users in the batch are not loaded."""
+        sel_ids = self.get_users_with_due_feed('q_sel')
+        ask_ids = self.get_users_with_due_feed('q_ask')
+        ans_ids = self.get_users_with_due_feed('q_ans')
+        if not self.users:
+            return
+        cutoff_time = self.get_min_content_cutoff_time()
+
+        question_filters = list()
+        if sel_ids:
+            follows = Thread.followed_by.through.objects.filter( #pylint: disable=no-member
+                user_id__in=sel_ids, thread__last_activity_at__gte=cutoff_time
+            )
+            for user_id, thread_id in follows.values_list('user_id', 'thread_id'):
+                self.followed_threads[user_id].add(thread_id)
+            question_filters.append(Q(thread_id__in=follows.values('thread_id')))
+
+        if ask_ids:
+            question_filters.append(Q(author_id__in=ask_ids))
+
+        if ans_ids:
+            answers = Post.objects.filter(
+                post_type='answer',
+                author_id__in=ans_ids,
+                thread__last_activity_at__gte=cutoff_time
+            )
+            answers = answers.values_list('author_id', 'thread_id').distinct()
+            for user_id, thread_id in answers:
+                self.answered_threads[user_id].add(thread_id)
+            question_filters.append(Q(thread_id__in=answers.values('thread_id')))
+
+        mentioned_thread_ids = set()
+        for thread_ids in self.mentioned_threads.values():
+            mentioned_thread_ids.update(thread_ids)
+        for ids in slice_ids(mentioned_thread_ids):
+            question_filters.append(Q(thread_id__in=ids))
+
+        base_questions = get_base_questions().filter(
+            thread__last_activity_at__gte=cutoff_time
+        ).select_related('thread')
+        questions = dict()
+        # one query per filter, so that none carries all of the ids
+        for question_filter in question_filters:
+            for question in base_questions.filter(question_filter):
+                questions[question.id] = question
+
+        questions = sorted(
+            questions.values(),
+            key=lambda q: (q.thread.last_activity_at, q.id),
+            reverse=True
+        )
+        self.questions = OrderedDict([(q.id, q) for q in questions])
+
+        # the loaded questions are already past the cutoff
+        for ids in slice_ids(self.questions.keys()):
+            views = QuestionView.objects.filter(
+                who_id__in=self.users.keys(), question_id__in=ids
+            ).values_list('who_id', 'question_id', 'when')
+            for user_id, question_id, when in views:
+                self.views[(user_id, question_id)].append(when)
+
+    def split_questions(self, user, thread_ids):
+        """Returns list of loaded questions in the given threads
+        not seen by the user and list of those seen before the last
+        modification, like the query sets `get_question_sets_for_user`.
+        The questions are ordered by the latest activity first.
+        """
+        old_content_cutoff_timestamp = max(
+            user.date_joined,
+            django_settings.ASKBOT_DELAYED_EMAIL_ALERTS_CUTOFF_TIMESTAMP
+        )
+        not_seen = list()
+        seen_before_last_mod = list()
+        for question in self.questions.values():
+            thread = question.thread
+            if thread.id not in thread_ids:
+                continue
+            if thread.last_activity_by_id == user.id:
+                continue
+            if thread.last_activity_at < old_content_cutoff_timestamp:
+                continue
+            views = self.views.get((user.id, question.id))
+            if not views:
+                not_seen.append(question)
+            elif any([when < thread.last_activity_at for when in views]):
+                seen_before_last_mod.append(question)
+        return not_seen, seen_before_last_mod
+
+    def get_updated_questions_for_user(self, user):
+        """
+        retreive relevant question updates for the user
+        according to their subscriptions and recorded question
+        views
+        """
+        feeds = self.due_feeds[user.id]
+        max_alerts = askbot_settings.MAX_ALERTS_PER_EMAIL
+
+        if askbot.is_multilingual():
+            languages = user.languages.split()
+        else:
+            languages = None
+
+        #build ordered list questions for the email report
+        q_list = OrderedDict()
+
+        if 'q_sel' in feeds:
+            cutoff_time = feeds['q_sel'][1]
+            q_sel_A, q_sel_B = self.split_questions(user, self.followed_threads[user.id])
+            extend_question_list(q_sel_A, q_list, cutoff_time=cutoff_time, languages=languages)
+            extend_question_list(q_sel_B, q_list, cutoff_time=cutoff_time, languages=languages)
+
+        #build list of comment and mention responses here
+        #it is separate because posts are not marked as changed
+        #when people add comments
+        if 'm_and_c' in feeds:
+            cutoff_time = feeds['m_and_c'][1]
+            q_commented = list()
+            for thread_id in self.commented_threads[user.id]:
+                if thread_id in self.commented_questions:
+                    q_commented.append(self.commented_questions[thread_id])
+
+            extend_question_list(
+                q_commented,
+                q_list,
+                cutoff_time=cutoff_time,
+                add_comment=True,
+                languages=languages
+            )
+
+            mentioned_threads = set(self.mentioned_threads[user.id])
+            q_mentions_A, q_mentions_B = self.split_questions(user, mentioned_threads)
+            extend_question_list(
+                q_mentions_A,
+                q_list,
+                cutoff_time=cutoff_time,
+                add_mention=True,
+                languages=languages
+            )
+            extend_question_list(
+                q_mentions_B,
+                q_list,
+                cutoff_time=cutoff_time,
+                add_mention=True,
+                languages=languages
+            )
+
+        q_all_A = None
+        q_all_B = None
+        if 'q_all' in feeds:
+            Q_set_A, Q_set_B = get_question_sets_for_user(user)
+            q_all_A = user.get_tag_filtered_questions(Q_set_A)[:max_alerts]
+            q_all_B = user.get_tag_filtered_questions(Q_set_B)[:max_alerts]
+            q_all_A.cutoff_time = feeds['q_all'][1]
+            q_all_B.cutoff_time = feeds['q_all'][1]
+
+        if user.email_tag_filter_strategy != const.EXCLUDE_IGNORED:
+            extend_question_list(q_all_A, q_list, languages=languages)
+            extend_question_list(q_all_B, q_list, languages=languages)
+
+        if 'q_ask' in feeds:
+            cutoff_time = feeds['q_ask'][1]
+            asked_threads = set([q.thread_id for q in self.questions.values() \
+                                                    if q.author_id == user.id])
+            q_ask_A, q_ask_B = self.split_questions(user, asked_threads)
+            extend_question_list(q_ask_A, q_list, cutoff_time=cutoff_time, limit=True, languages=languages)
+            extend_question_list(q_ask_B, q_list, cutoff_time=cutoff_time, limit=True, languages=languages)
+
+        if 'q_ans' in feeds:
+            cutoff_time = feeds['q_ans'][1]
+            q_ans_A, q_ans_B = self.split_questions(user, self.answered_threads[user.id])
+            extend_question_list(q_ans_A[:max_alerts], q_list, cutoff_time=cutoff_time, limit=True, languages=languages)
+            extend_question_list(q_ans_B[:max_alerts], q_list, cutoff_time=cutoff_time, limit=True, languages=languages)
+
+        if user.email_tag_filter_strategy == const.EXCLUDE_IGNORED:
+            extend_question_list(q_all_A, q_list, limit=True, languages=languages)
+            extend_question_list(q_all_B, q_list, limit=True, languages=languages)
+
+        self.add_question_news(user, q_list)
+        return q_list
+
+    def add_question_news(self, user, q_list):
+        """edits meta_data for each question, so that user will
+        receive counts on new edits new answers, etc
+        and marks questions that need to be skipped
+        because an email about them was sent recently enough
+        """
+        ctype = ContentType.objects.get_for_model(Post)
+        EMAIL_UPDATE_ACTIVITY = const.TYPE_ACTIVITY_EMAIL_UPDATE_SENT
+
+        #up to this point we still don't know if emails about
+        #collected questions were sent recently
+        #the latest email activity per question per user tells that
+        update_infos = dict()
+        for ids in slice_ids([q.id for q in q_list]):
+            activities = Activity.objects.filter(
+                user=user,
+                content_type=ctype,
+                object_id__in=ids,
+                activity_type=EMAIL_UPDATE_ACTIVITY
+            )
+            for activity in activities:
+                if activity.object_id in update_infos:
+                    raise Exception(
+                                'server error - multiple question email activities '
+                                'found per user-question pair'
+                                )
+                update_infos[activity.object_id] = activity
+
+        for q, meta_data in list(q_list.items()):
+            if q.id in update_infos:
+                update_info = update_infos[q.id]
+                emailed_at = update_info.active_at
+            else:
+                update_info = Activity(
+                                    user=user,
+                                    content_object=q,
+                                    activity_type=EMAIL_UPDATE_ACTIVITY
+                                )
+                emailed_at = datetime.datetime(1970, 1, 1)  #long time ago
+                if django_settings.USE_TZ:
+                    emailed_at = timezone.make_aware(emailed_at, timezone.utc)
+
+            cutoff_time = meta_data['cutoff_time']#cutoff time for the question
+
+            #skip question if we need to wait longer because
+            #the delay before the next email has not yet elapsed
+            #or if last email was sent after the most recent modification
+            if emailed_at > cutoff_time or emailed_at > q.thread.last_activity_at:
+                meta_data['skip'] = True
+                continue
+
+            #collect info on all sorts of news that happened after
+            #the most recent emailing to the user about this question
+            q_rev = q.revisions.filter(revised_at__gt=emailed_at)
+            q_rev = q_rev.exclude(author=user)
+
+            #now update all sorts of metadata per question
+            meta_data['q_rev'] = len(q_rev)
+            if len(q_rev) > 0 and q.added_at == q_rev[0].revised_at:
+                meta_data['q_rev'] = 0
+                meta_data['new_q'] = True
+            else:
+                meta_data['new_q'] = False
+
+            new_ans = Post.objects.get_answers(user).filter(
+                thread=q.thread,
+                added_at__gt=emailed_at,
+                deleted=False,
+            )
+            new_ans = new_ans.exclude(author=user)
+            meta_data['new_ans'] = len(new_ans)
+
+            ans_ids = Post.objects.get_answers(user).filter(
+                thread=q.thread,
+                added_at__gt=emailed_at,
+                deleted=False,
+            ).values_list('id', flat=True)
+
+            ans_rev = PostRevision.objects.filter(post__id__in = ans_ids)
+            ans_rev = ans_rev.exclude(author=user).distinct()
+
+            meta_data['ans_rev'] = len(ans_rev)
+
+            comments = meta_data.get('comments', 0)
+            mentions = meta_data.get('mentions', 0)
+
+            #finally skip question if there are no news indeed
+            if len(q_rev) + len(new_ans) + len(ans_rev) + comments + mentions == 0:
+                meta_data['skip'] = True
+            else:
+                meta_data['skip'] = False
+                update_info.active_at = timezone.now()
+                if DEBUG_DELAYED_ALERTS == False:
+                    update_info.save() #save question email update activity
+
+    def send_email_alert(self, user):
+        #todo: q_list is a dictionary, not a list
+        q_list = self.get_updated_questions_for_user(user)
+
+        if len(list(q_list.keys())) == 0:
+            return
+
+        num_q = 0
+
+        for question, meta_data in list(q_list.items()):
+            if meta_data['skip']:
+                del q_list[question]
+            else:
+                num_q += 1
+        if num_q > 0:
+            threads = Thread.objects.filter(id__in=[qq.thread_id for qq in list(q_list.keys())])
+            tag_summary = Thread.objects.get_tag_summary_from_threads(threads)
+
+            question_count = len(list(q_list.keys()))
+
+            items_added = 0
+            items_unreported = 0
+            questions_data = list()
+            for q, meta_data in list(q_list.items()):
+                act_list = []
+                if meta_data['skip']:
+                    continue
+                if items_added >= askbot_settings.MAX_ALERTS_PER_EMAIL:
+                    items_unreported = num_q - items_added #may be inaccurate actually, but it's ok
+                    break
+                else:
+                    items_added += 1
+                    if meta_data['new_q']:
+                        act_list.append(_('new question'))
+                    format_action_count('%(num)d rev', meta_data['q_rev'], act_list)
+                    format_action_count('%(num)d ans', meta_data['new_ans'], act_list)
+                    format_action_count('%(num)d ans rev', meta_data['ans_rev'], act_list)
+                    questions_data.append({
+                        'url': site_url(q.get_absolute_url()),
+                        'info': ', '.join(act_list),
+                        'title': q.thread.title
+                    })
+
+            activate_language(user.primary_language)
+            email = BatchEmailAlert({
+                'questions': questions_data,
+                'question_count': question_count,
+                'tag_summary': tag_summary,
+                'user': user
+            })
+
+            if DEBUG_DELAYED_ALERTS == True:
+                recipient_email = askbot_settings.ADMIN_EMAIL
+            else:
+                recipient_email = user.email
+
+            if recipient_email:
+                email.send([recipient_email])
+
+    def run(self):
+        """sends the alerts to the users of the batch"""
+        self.load_users()
+        self.add_missing_subscriptions()
+        self.load_due_feeds()
+        #shortcircuit - if there is no ripe feed to work on
+        if not self.due_feeds:
+            return
+
+        self.load_comments_and_mentions()
+        self.load_questions()
+
+        for user_id in self.due_feeds:
+            user = self.users[user_id]
+            try:
+                self.send_email_alert(user)
+            except Exception:
+                report_exception(user)
+
+
+def send_delayed_alerts(user_ids):
+    """sends daily and weekly email alerts to the users with given ids"""
+    activate_language(django_settings.LANGUAGE_CODE)
+    try:
+        DelayedAlertBatch(user_ids).run()
+    except Exception:
+        logging.critical(
+            'failed to send email alerts to users %d-%d: %s',
+            min(user_ids), max(user_ids), traceback.format_exc()
+        )
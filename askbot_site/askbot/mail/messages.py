@@ -133,7 +133,8 @@ class BaseEmail(object):
         body = template.render(Context(self.get_context(context)))
         return absolutize_urls(body)
 
-    def send(self, recipient_list, raise_on_failure=False, headers=None, attachments=None):
+    def send(self, recipient_list, raise_on_failure=False, headers=None,
+             attachments=None, connection=None):
         if self.is_enabled():
             from askbot.mail import send_mail
             send_mail(
@@ -143,7 +144,8 @@ class BaseEmail(object):
                 recipient_list=recipient_list,
                 headers=headers or self.get_headers(),
                 raise_on_failure=raise_on_failure,
-                attachments=attachments or self.get_attachments()
+                attachments=attachments or self.get_attachments(),
+                connection=connection
             )
         else:
             LOG.warning(
@@ -335,44 +337,72 @@ class InstantEmailAlert(BaseEmail):
         update_type_map = const.RESPONSE_ACTIVITY_TYPE_MAP_FOR_TEMPLATES
         return update_type_map[activity.activity_type]
 
+    @classmethod
+    def get_shared_context(cls, post, update_activity):
+        """returns part of the context that is the same
+        for all recipients of the alert about the post,
+        it may be calculated once and passed to the
+        alerts in the context under the key `shared_context`
+        """
+        update_type = cls.get_update_type(update_activity)
+        origin_post = post.get_origin_post()
+        if update_type.endswith('update'):
+            post_diff = post.get_latest_revision_diff(
+                ins_start='<b><u style="background-color:#cfc">',
+                ins_end='</u></b>',
+                del_start='<del style="color:#600;background-color:#fcc">',
+                del_end='</del>'
+            )
+            is_anonymous_edit = post.get_latest_revision().is_anonymous
+        else:
+            post_diff = None
+            is_anonymous_edit = False
+
+        return {
+           'admin_email': askbot_settings.ADMIN_EMAIL,
+           'reply_by_email_karma_threshold': askbot_settings.MIN_REP_TO_POST_BY_EMAIL,
+           'update_type': update_type,
+           'update_activity': update_activity,
+           'post': post,
+           'post_url': site_url(post.get_absolute_url()),
+           'post_diff': post_diff,
+           'is_anonymous_edit': is_anonymous_edit,
+           'parent_posts': list(post.get_parent_post_chain()),
+           'origin_post': origin_post,
+           'thread_title': origin_post.thread.title,
+           'alt_reply_subject': urllib.parse.quote(('Re: ' + post.thread.title).encode('utf-8')),
+           'is_multilingual': askbot.is_multilingual(),
+           'reply_sep_tpl': const.SIMPLE_REPLY_SEPARATOR_TEMPLATE
+        }
+
     def process_context(self, context):
         to_user = context.get('to_user')
         from_user = context.get('from_user')
         post = context.get('post')
-        update_activity = context.get('update_activity')
-        update_type = self.get_update_type(update_activity)
 
         #unhandled update_type 'post_shared'
         #user_action = _('%(user)s shared a %(post_link)s.')
 
-        origin_post = post.get_origin_post()
-        post_url = site_url(post.get_absolute_url())
+        shared_context = context.get('shared_context')
+        if shared_context is None:
+            update_activity = context.get('update_activity')
+            shared_context = self.get_shared_context(post, update_activity)
 
         can_reply = to_user.can_post_by_email()
         from askbot.models import get_reply_to_addresses
         reply_address, alt_reply_address = get_reply_to_addresses(to_user, post)
-        alt_reply_subject = urllib.parse.quote(('Re: ' + post.thread.title).encode('utf-8'))
 
-        return {
-           'admin_email': askbot_settings.ADMIN_EMAIL,
+        context = dict(shared_context)
+        context.update({
            'recipient_user': to_user,
            'update_author_name': from_user.username,
            'receiving_user_name': to_user.username,
            'receiving_user_karma': to_user.reputation,
-           'reply_by_email_karma_threshold': askbot_settings.MIN_REP_TO_POST_BY_EMAIL,
            'can_reply': can_reply,
-           'update_type': update_type,
-           'update_activity': update_activity,
-           'post': post,
-           'post_url': post_url,
-           'origin_post': origin_post,
-           'thread_title': origin_post.thread.title,
            'reply_address': reply_address,
            'alt_reply_address': alt_reply_address,
-           'alt_reply_subject': alt_reply_subject,
-           'is_multilingual': askbot.is_multilingual(),
-           'reply_sep_tpl': const.SIMPLE_REPLY_SEPARATOR_TEMPLATE
-        }
+        })
+        return context
 
 
 class ReplyByEmailError(BaseEmail):
@@ -618,7 +648,7 @@ class BatchEmailAlert(BaseEmail):
 
     def get_mock_context(self):
         from askbot.models import Post, Thread
-        from askbot.management.commands.send_email_alerts import format_action_count
+        from askbot.mail.delayed_alerts import format_action_count
 
         qdata = list()
         qq = Post.objects.filter(post_type='question')[:2]
@@ -10,7 +10,7 @@ from askbot.utils.translation import get_language
 
 
 NUM_USERS = 40
-# KEEP NEXT 3 SETTINGS LESS THAN OR EQUAL TO NUM_USERS!
+# defaults of the options, KEEP NEXT 3 LESS THAN OR EQUAL TO NUM_USERS!
 NUM_QUESTIONS = 40
 NUM_ANSWERS = 20
 NUM_COMMENTS = 20
@@ -61,6 +61,23 @@ class Command(BaseCommand):
             '--with-spam', action='store_true', dest='with_spam', default=False,
             help='Add XSS snippets'
         )
+        parser.add_argument(
+            '--users', action='store', type=int, dest='num_users',
+            default=NUM_USERS, help='Number of the test users'
+        )
+        parser.add_argument(
+            '--questions', action='store', type=int, dest='num_questions',
+            default=NUM_QUESTIONS, help='Number of the questions posted twice, '
+                                        'by one user and by all users'
+        )
+        parser.add_argument(
+            '--answers', action='store', type=int, dest='num_answers',
+            default=NUM_ANSWERS, help='Number of the answers to the active question'
+        )
+        parser.add_argument(
+            '--comments', action='store', type=int, dest='num_comments',
+            default=NUM_COMMENTS, help='Number of the comments to the active posts'
+        )
 
     def bad_stuff(self):
         if self.options['with_spam']:
@@ -110,7 +127,7 @@ class Command(BaseCommand):
 
         # Keeping the created users in array - we will iterate over them
         # several times, we don't want querying the model each and every time.
-        for i in range(NUM_USERS):
+        for i in range(self.options['num_users']):
             s_idx = str(i)
             username = self.bad_stuff() + USERNAME_TEMPLATE % s_idx
             user = User.objects.create_user(username,
@@ -132,7 +149,8 @@ class Command(BaseCommand):
         active_question = None
         last_vote = False
         # Each user posts a question
-        for i in range(NUM_QUESTIONS):
+        num_questions = self.options['num_questions']
+        for i in range(num_questions):
             user = users[i % len(users)]#allows to post many questions all by less users
             # Downvote/upvote the questions - It's reproducible, yet
             # gives good randomized data
@@ -151,7 +169,7 @@ class Command(BaseCommand):
 
             # len(TAGS_TEMPLATE) tags per question - each tag is different
             tags = " ".join([(t + self.bad_stuff()) % user.id for t in TAGS_TEMPLATE])
-            if i < NUM_QUESTIONS/2:
+            if i < num_questions/2:
                 tags += ' one-tag'
 
             if i % 2 == 0:
@@ -176,7 +194,7 @@ class Command(BaseCommand):
         active_answer = None
         last_vote = False
         # Now, fill the last added question with answers
-        for i in range(NUM_ANSWERS):
+        for i in range(self.options['num_answers']):
             user = users[i % len(users)]
             # We don't need to test for data validation, so ONLY users
             # that aren't authors can post answer to the question
@@ -226,7 +244,7 @@ class Command(BaseCommand):
         active_question_comment = None
         active_answer_comment = None
 
-        for i in range(NUM_COMMENTS):
+        for i in range(self.options['num_comments']):
             user = users[i % len(users)]
             active_question_comment = user.post_comment(
                                     parent_post = active_question,
@@ -244,7 +262,7 @@ class Command(BaseCommand):
 
         # Upvote active comments
         if active_question_comment and active_answer_comment:
-            num_upvotees = NUM_COMMENTS - 1
+            num_upvotees = self.options['num_comments'] - 1
             for user in users[:num_upvotees]:
                 user.upvote(active_question_comment)
                 user.upvote(active_answer_comment)
@@ -1,38 +1,105 @@
-"""WARNING:
-This command is incomplete, current awards only
-Civic Duty badge
+"""Gives the badges deserved by the users and not given yet.
+
+Eligibility for each badge is computed with aggregate queries
+for chunks of users, see `askbot.models.badges.recompute_awards`,
+the chunks are processed by the current process or by a pool
+of worker processes (option ``--processes``).
+Badges without bulk recomputation are skipped.
 """
+import multiprocessing
 
+from django.conf import settings as django_settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone, translation
 
-from askbot.models import badges
 from askbot.models import User
-from askbot.models import Vote
-from askbot.utils.console import ProgressBar
-from django.core.management import BaseCommand
-from django.utils import timezone
+from askbot.models import badges
+from askbot.utils.console import show_progress
+
+
+def award_badges(badge_keys, user_ids, timestamp):
+    """awards the badges to the users, returns
+    number of the users who got new badges"""
+    awarded_user_ids = set()
+    with transaction.atomic():
+        for key in badge_keys:
+            awarded = badges.recompute_awards(badges.get_badge(key), user_ids, timestamp)
+            awarded_user_ids.update(awarded or ())
+        if awarded_user_ids:
+            badges.recount_badges(list(awarded_user_ids))
+    return len(awarded_user_ids)
+
+
+def award_badges_in_worker_process(args):
+    """awards the badges from a pool process, which
+    must not keep the database connection"""
+    translation.activate(django_settings.LANGUAGE_CODE)
+    count = award_badges(*args)
+    connection.close()
+    return count
+
 
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
-        now = timezone.now()
-        awarded_count = 0
+    help = 'Gives the badges deserved by the users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--badges', action='store', dest='badges', default='',
+            help='Comma separated keys of the badges, by default all enabled badges'
+        )
+        parser.add_argument(
+            '--chunk-size', action='store', type=int, dest='chunk_size',
+            default=1000, help='Number of users whose badges are computed at once'
+        )
+        parser.add_argument(
+            '--processes', action='store', type=int, dest='processes',
+            default=1, help='Number of worker processes'
+        )
 
-        users = User.objects.all()
-        count = users.count()
-        message = 'Awarding badges for each user'
-        for user in ProgressBar(users.iterator(), count, message):
-            try:
-                #get last vote
-                vote = Vote.objects.filter(user=user).order_by('-id')[0]
-            except IndexError:
-                #user did not vote
-                continue
+    def get_badge_keys(self, badge_keys):
+        if badge_keys:
+            badge_keys = [key.strip() for key in badge_keys.split(',') if key.strip()]
+            unknown_keys = set(badge_keys) - set(badges.BADGES)
+            if unknown_keys:
+                raise CommandError('unknown badges: %s' % ', '.join(sorted(unknown_keys)))
+        else:
+            badge_keys = [
+                key for key, badge_class in badges.BADGES.items()
+                if badge_class.is_enabled()
+            ]
+
+        supported_keys = list()
+        for key in sorted(badge_keys):
+            if not badges.BADGES[key].can_recompute_awards():
+                self.stdout.write('Skipping badge %s, it cannot be recomputed' % key)
             else:
-                cd = badges.CivicDuty()
-                awarded = cd.consider_award(
-                            actor=user,
-                            context_object=vote.voted_post,
-                            timestamp=now
-                        )
-                awarded_count += int(awarded)
-
-        print('Awarded %d badges' % awarded_count)
+                supported_keys.append(key)
+        return supported_keys
+
+    def handle(self, **options):
+        translation.activate(django_settings.LANGUAGE_CODE)
+        badge_keys = self.get_badge_keys(options['badges'])
+        timestamp = timezone.now()
+
+        user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+        chunk_size = max(options['chunk_size'], 1)
+        chunks = [
+            (badge_keys, user_ids[pos:pos + chunk_size], timestamp)
+            for pos in range(0, len(user_ids), chunk_size)
+        ]
+        message = 'Awarding badges'
+        awarded_count = 0
+        if options['processes'] > 1:
+            # the worker processes open their own connections
+            connection.close()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(options['processes']) as pool:
+                results = pool.imap_unordered(award_badges_in_worker_process, chunks)
+                for count in show_progress(results, len(chunks), message, options['verbosity']):
+                    awarded_count += count
+        else:
+            for chunk in show_progress(iter(chunks), len(chunks), message, options['verbosity']):
+                awarded_count += award_badges(*chunk)
+
+        self.stdout.write('Awarded badges to %d users' % awarded_count)
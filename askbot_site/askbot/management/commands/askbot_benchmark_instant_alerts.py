@@ -0,0 +1,131 @@
+"""Measures the delivery rate of the instant email alerts.
+
+The alerts about one post are sent to a local SMTP server,
+which accepts and discards the messages, first one connection
+per message, as before the batched delivery, then in the batched
+mode. The existing users are repeated to make up the number of
+recipients given with the option ``--recipients``.
+"""
+import itertools
+import socketserver
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from askbot import const
+from askbot.conf import settings as askbot_settings
+from askbot.models import Activity, PostRevision, User
+from askbot.tasks import send_instant_email_alerts
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialogue, the messages are counted and discarded"""
+
+    def send_reply(self, reply):
+        self.wfile.write(reply.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.send_reply('220 localhost SMTP sink')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b'DATA':
+                self.send_reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.count_message()
+                self.send_reply('250 OK')
+            elif command == b'QUIT':
+                self.send_reply('221 Bye')
+                return
+            else:
+                self.send_reply('250 OK')
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        socketserver.ThreadingTCPServer.__init__(
+            self, ('127.0.0.1', 0), SmtpSinkHandler
+        )
+        self.message_count = 0
+        self.lock = threading.Lock()
+
+    def count_message(self):
+        with self.lock:
+            self.message_count += 1
+
+
+class Command(BaseCommand):
+    help = 'Measures the delivery rate of the instant email alerts, emails per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipients', action='store', type=int, dest='recipients',
+            default=5000, help='Number of the alert recipients'
+        )
+        parser.add_argument(
+            '--activity-id', action='store', type=int, dest='activity_id',
+            default=None, help='Id of the post update activity, latest by default'
+        )
+
+    def get_update_activity(self, activity_id):
+        activities = Activity.objects.filter(
+            activity_type__in=const.RESPONSE_ACTIVITY_TYPES_FOR_INSTANT_NOTIFICATIONS
+        )
+        if activity_id:
+            activities = activities.filter(id=activity_id)
+        activity = activities.order_by('-id').first()
+        if activity is None or not isinstance(activity.content_object, PostRevision):
+            raise CommandError('Post update activity not found')
+        return activity
+
+    def send_alerts(self, sink, post, activity, recipients, batched):
+        sink.message_count = 0
+        start = time.time()
+        send_instant_email_alerts(post, activity, recipients, batched=batched)
+        elapsed = time.time() - start
+        self.stdout.write(
+            '%s: %d emails in %.2fs, %.1f emails/s' % (
+                'batched' if batched else 'one connection per email',
+                sink.message_count, elapsed, sink.message_count / elapsed
+            )
+        )
+
+    def handle(self, **options):
+        if not (askbot_settings.ENABLE_EMAIL_ALERTS \
+                and askbot_settings.INSTANT_EMAIL_ALERT_ENABLED):
+            raise CommandError('Instant email alerts are disabled')
+
+        activity = self.get_update_activity(options['activity_id'])
+        post = activity.content_object.post
+        users = list(User.objects.exclude(askbot_profile__status='b'))
+        if len(users) == 0:
+            raise CommandError('At least one user is needed')
+        recipients = list(itertools.islice(itertools.cycle(users), options['recipients']))
+
+        sink = SmtpSink()
+        thread = threading.Thread(target=sink.serve_forever, daemon=True)
+        thread.start()
+
+        smtp_settings = {
+            'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+            'EMAIL_HOST': '127.0.0.1',
+            'EMAIL_PORT': sink.server_address[1],
+            'EMAIL_HOST_USER': '',
+            'EMAIL_HOST_PASSWORD': '',
+            'EMAIL_USE_TLS': False,
+            'EMAIL_USE_SSL': False
+        }
+        try:
+            with override_settings(**smtp_settings):
+                for batched in (False, True):
+                    self.send_alerts(sink, post, activity, recipients, batched)
+        finally:
+            sink.shutdown()
+            sink.server_close()
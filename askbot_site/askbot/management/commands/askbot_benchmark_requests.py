@@ -0,0 +1,274 @@
+"""Measures the response times and the numbers of SQL queries
+of the main pages and of the API v1, for the anonymous visitor
+and for the logged in user.
+
+For each of the scales given with the option ``--scales``
+a temporary test database is created and filled with the synthetic
+content by the ``askbot_add_test_content`` and ``create_thousand_tags``
+commands, the amount of the content is multiplied by the scale.
+With the option ``--current-data`` the current database is measured
+instead, without changing it.
+
+Each page is requested ``--warmup`` times without measuring, then
+``--repeat`` times, the largest number of queries and the 50th and 95th
+percentiles of the response time are printed. Results are compared
+with the baseline file given with the ``--baseline`` option, by default
+``askbot/tests/benchmarks/baseline.json``: when a page
+makes more queries than in the baseline, or its 95th percentile
+grows more than ``--tolerance`` times, the command fails.
+``--save-baseline`` writes the results into the baseline file.
+
+Results are stored by the database vendor, so that the same baseline
+file is used with SQLite and PostgreSQL: run the command with
+the settings of each database. The shipped baseline has only the SQLite
+results of the default scales, the PostgreSQL ones must be saved locally.
+The response times depend on the machine, compare them with a baseline
+saved on the same machine.
+"""
+import json
+import math
+import os
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+import askbot
+from askbot.models import Post, User
+
+DEFAULT_BASELINE = os.path.join(
+    os.path.dirname(askbot.__file__), 'tests', 'benchmarks', 'baseline.json'
+)
+DEFAULT_SCALES = '1,5'
+ENDPOINTS = (
+    'questions',
+    'question',
+    'users',
+    'tags',
+    'user_profile',
+    'api_v1_questions',
+    'api_v1_question',
+    'api_v1_users',
+)
+
+
+def get_percentile(values, percent):
+    """returns percentile of the values by the nearest rank method"""
+    values = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+def get_endpoint_urls(question, user):
+    """returns dictionary of the urls of the endpoints,
+    the question and the user profile pages are of the given objects"""
+    return {
+        'questions': reverse('questions'),
+        'question': question.get_absolute_url(),
+        'users': reverse('users'),
+        'tags': reverse('tags'),
+        'user_profile': user.get_profile_url(),
+        'api_v1_questions': reverse('api_v1_questions'),
+        'api_v1_question': reverse('api_v1_question', kwargs={'question_id': question.id}),
+        'api_v1_users': reverse('api_v1_users'),
+    }
+
+
+def measure_url(client, url, warmup, repeat):
+    """requests the url, returns dictionary with the response status,
+    the largest number of queries and the percentiles of the time
+    of the measured requests in milliseconds"""
+    for _ in range(warmup):
+        client.get(url)
+
+    times = list()
+    max_queries = 0
+    status_code = None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started_at = time.perf_counter()
+            response = client.get(url)
+            times.append((time.perf_counter() - started_at) * 1000)
+        max_queries = max(max_queries, len(queries))
+        status_code = response.status_code
+    return {
+        'status': status_code,
+        'queries': max_queries,
+        'p50': get_percentile(times, 50),
+        'p95': get_percentile(times, 95),
+    }
+
+
+def find_regressions(results, baseline, tolerance, query_slack=0):
+    """returns list of messages about the results worse
+    than their baseline, results missing in the baseline are skipped"""
+    messages = list()
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        result, expected = results[key], baseline[key]
+        if result['queries'] > expected['queries'] + query_slack:
+            messages.append('%s: %d queries, baseline %d' % (
+                key, result['queries'], expected['queries']
+            ))
+        if result['p95'] > expected['p95'] * tolerance:
+            messages.append('%s: p95 %.1f ms, baseline %.1f ms' % (
+                key, result['p95'], expected['p95']
+            ))
+    return messages
+
+
+class Command(BaseCommand):
+    help = 'Measures the response times and the SQL queries of the main pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', action='store', dest='scales', default=DEFAULT_SCALES,
+            help='Comma separated multipliers of the amount of the test content'
+        )
+        parser.add_argument(
+            '--current-data', action='store_true', dest='current_data',
+            default=False, help='Measure the current database, without the test content'
+        )
+        parser.add_argument(
+            '--endpoints', action='store', dest='endpoints', default=','.join(ENDPOINTS),
+            help='Comma separated names of the measured endpoints'
+        )
+        parser.add_argument(
+            '--warmup', action='store', type=int, dest='warmup', default=1,
+            help='Number of the requests made before measuring'
+        )
+        parser.add_argument(
+            '--repeat', action='store', type=int, dest='repeat', default=20,
+            help='Number of the measured requests per endpoint'
+        )
+        parser.add_argument(
+            '--baseline', action='store', dest='baseline', default=DEFAULT_BASELINE,
+            help='Path to the JSON file with the baseline results'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true', dest='save_baseline',
+            default=False, help='Save the results into the baseline file'
+        )
+        parser.add_argument(
+            '--tolerance', action='store', type=float, dest='tolerance', default=1.5,
+            help='Allowed ratio of the 95th percentile to the baseline'
+        )
+        parser.add_argument(
+            '--query-slack', action='store', type=int, dest='query_slack', default=0,
+            help='Allowed number of the queries above the baseline'
+        )
+
+    def handle(self, **options):
+        endpoints = options['endpoints'].split(',')
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError('Unknown endpoints: %s' % ', '.join(sorted(unknown)))
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        results = dict()
+        if options['current_data']:
+            results.update(self.measure('current', endpoints, options))
+        else:
+            for scale in self.get_scales(options['scales']):
+                results.update(self.measure_scale(scale, endpoints, options))
+
+        baseline_path = options['baseline']
+        baseline = dict()
+        if os.path.exists(baseline_path):
+            with open(baseline_path) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        if options['save_baseline']:
+            baseline.update(results)
+            with open(baseline_path, 'w') as baseline_file:
+                json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+            return
+
+        missing = sorted(set(results) - set(baseline))
+        if missing:
+            self.stdout.write(
+                'No baseline for %d results, save it with --save-baseline' % len(missing)
+            )
+        regressions = find_regressions(
+            results, baseline, options['tolerance'], options['query_slack']
+        )
+        for message in regressions:
+            self.stdout.write('REGRESSION ' + message)
+        if regressions:
+            raise CommandError('%d regressions against the baseline' % len(regressions))
+
+    def get_scales(self, scales):
+        try:
+            scales = [int(scale) for scale in scales.split(',')]
+        except ValueError:
+            raise CommandError('--scales must be comma separated integers')
+        if not scales or min(scales) < 1:
+            raise CommandError('--scales must be positive')
+        return scales
+
+    def measure_scale(self, scale, endpoints, options):
+        """measures the endpoints in a new test database
+        with the test content multiplied by the scale"""
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            call_command(
+                'askbot_add_test_content', interactive=False, verbosity=0,
+                users=40 * scale, questions=40 * scale,
+                answers=20 * scale, comments=20 * scale
+            )
+            call_command('create_thousand_tags', count=1000 * scale)
+            return self.measure('scale=%d' % scale, endpoints, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def get_measured_objects(self):
+        """returns the question with the most answers
+        and the first regular user"""
+        question = Post.objects.get_questions().filter(
+            deleted=False
+        ).order_by('-thread__answer_count', 'id').first()
+        user = User.objects.filter(
+            is_active=True, is_superuser=False
+        ).order_by('id').first()
+        if question is None or user is None:
+            raise CommandError('At least one question and one user are needed')
+        return question, user
+
+    def measure(self, label, endpoints, options):
+        """measures the endpoints for the anonymous visitor
+        and for the logged in user, prints and returns the results
+        by the keys <database vendor> <label> <endpoint> <visitor>"""
+        question, user = self.get_measured_objects()
+        urls = get_endpoint_urls(question, user)
+        results = dict()
+        # the site cache is not used, nor cleared
+        cache_settings = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'askbot-benchmark-%s' % label,
+            }
+        }
+        with override_settings(CACHES=cache_settings, ALLOWED_HOSTS=['testserver']):
+            for visitor in ('anonymous', 'user'):
+                client = Client()
+                if visitor == 'user':
+                    client.force_login(user)
+                for endpoint in endpoints:
+                    key = ' '.join((connection.vendor, label, endpoint, visitor))
+                    results[key] = measure_url(
+                        client, urls[endpoint], options['warmup'], options['repeat']
+                    )
+                    self.stdout.write('%-50s %3d %5d queries %9.1f ms p50 %9.1f ms p95' % (
+                        key,
+                        results[key]['status'],
+                        results[key]['queries'],
+                        results[key]['p50'],
+                        results[key]['p95']
+                    ))
+        return results
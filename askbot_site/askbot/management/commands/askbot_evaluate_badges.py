@@ -0,0 +1,21 @@
+"""Considers the badge awards for the events queued
+when ASKBOT_BADGE_EVALUATION_DEFERRED is on,
+should be run periodically, e.g. from a cron job"""
+from django.core.management.base import BaseCommand
+
+from askbot.models import BadgeEvent
+
+
+class Command(BaseCommand):
+    help = 'Considers the badge awards for the queued events'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', action='store', type=int, dest='batch_size',
+            default=500, help='Number of events processed in one transaction'
+        )
+
+    def handle(self, **options):
+        count = BadgeEvent.objects.evaluate_all(options['batch_size'])
+        if options['verbosity'] > 1:
+            self.stdout.write('Processed %d badge events' % count)
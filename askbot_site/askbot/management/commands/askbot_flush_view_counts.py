@@ -0,0 +1,15 @@
+"""Saves question view counts buffered in the cache
+when ASKBOT_VIEW_COUNT_BUFFER_ENABLED is on,
+should be run periodically, e.g. from a cron job"""
+from django.core.management.base import BaseCommand
+
+from askbot.models import Thread
+
+
+class Command(BaseCommand):
+    help = 'Saves question view counts buffered in the cache'
+
+    def handle(self, **options):
+        count = Thread.objects.flush_view_count_buffer()
+        if options['verbosity'] > 1:
+            self.stdout.write('Updated view counts of %d threads' % count)
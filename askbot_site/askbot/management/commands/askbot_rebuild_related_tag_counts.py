@@ -0,0 +1,46 @@
+"""Rebuilds the precomputed counts of the related tags
+shown in the sidebar of the questions page"""
+import itertools
+import operator
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from askbot.models import Post, RelatedTagCount, Thread
+from askbot.models.tag import get_tag_combinations
+from askbot.utils.console import ProgressBar
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the counts of the related tags'
+
+    @transaction.atomic
+    def handle(self, **options):
+        RelatedTagCount.objects.all().delete()
+
+        deleted_thread_ids = Post.objects.filter(
+            post_type='question', deleted=True
+        ).values('thread_id')
+        thread_tags = Thread.tags.through.objects.exclude(
+            thread_id__in=deleted_thread_ids
+        ).order_by('thread_id').values_list('thread_id', 'tag_id')
+        count = thread_tags.values('thread_id').distinct().count()
+        grouped_tags = itertools.groupby(
+            thread_tags.iterator(), key=operator.itemgetter(0)
+        )
+
+        counts = Counter()
+        message = 'Counting related tags'
+        for _, rows in ProgressBar(grouped_tags, count, message):
+            tag_ids = [tag_id for _, tag_id in rows]
+            counts.update(get_tag_combinations(tag_ids))
+
+        RelatedTagCount.objects.bulk_create(
+            (
+                RelatedTagCount(selected_tag_ids=key, tag_id=tag_id, count=value)
+                for (key, tag_id), value in counts.items()
+            ),
+            batch_size=1000
+        )
+        RelatedTagCount.objects.bump_generation()
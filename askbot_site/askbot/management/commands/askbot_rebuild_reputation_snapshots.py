@@ -0,0 +1,17 @@
+"""Recreates the daily reputation snapshots drawn in the
+reputation graphs when the ASKBOT_REPUTATION_SNAPSHOTS_ENABLED
+setting is on, from the history of the reputation changes"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from askbot.models import ReputationSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily reputation snapshots'
+
+    @transaction.atomic
+    def handle(self, **options):
+        count = ReputationSnapshot.objects.rebuild()
+        if options['verbosity'] > 1:
+            self.stdout.write('Saved %d reputation snapshots' % count)
@@ -0,0 +1,25 @@
+"""Rebuilds the built-in full text search index,
+used when the ASKBOT_SEARCH_INDEX_ENABLED setting is on"""
+from django.core.management.base import BaseCommand
+
+from askbot.models import Thread
+from askbot.search import native as native_search
+from askbot.utils.console import ProgressBar
+from askbot.utils.translation import get_language_codes
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the built-in full text search index'
+
+    def handle(self, **options):
+        language_codes = set(get_language_codes())
+        language_codes.update(
+            Thread.objects.values_list('language_code', flat=True).distinct()
+        )
+        for language_code in language_codes:
+            native_search.get_index(language_code).clear()
+
+        threads = Thread.objects.all()
+        message = 'Rebuilding search index'
+        for thread in ProgressBar(threads.iterator(), threads.count(), message):
+            native_search.update_thread(thread)
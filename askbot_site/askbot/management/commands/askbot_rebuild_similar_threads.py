@@ -0,0 +1,75 @@
+"""Rebuilds the lists of the similar threads
+shown in the question page sidebar"""
+import itertools
+import operator
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from askbot.models import Tag, Thread, ThreadSimilarity
+from askbot.models.question import SIMILAR_THREADS_COUNT
+from askbot.utils.console import ProgressBar
+
+# threads rebuilt in one transaction
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the lists of the similar threads'
+
+    def handle(self, **options):
+        self.tag_counts = dict(Tag.objects.values_list('id', 'used_count'))
+        self.thread_counts = dict()
+
+        thread_ids = list(
+            Thread.objects.filter(deleted=False).order_by('id').values_list('id', flat=True)
+        )
+        chunks = [
+            thread_ids[start:start + CHUNK_SIZE]
+            for start in range(0, len(thread_ids), CHUNK_SIZE)
+        ]
+        message = 'Rebuilding similar threads'
+        for chunk in ProgressBar(iter(chunks), len(chunks), message):
+            self.rebuild_chunk(chunk)
+
+        # lists of the threads deleted or untagged in the meantime
+        ThreadSimilarity.objects.filter(
+            Q(thread__deleted=True) | Q(thread__tags__isnull=True)
+        ).delete()
+
+    def get_thread_count(self, language_code):
+        if language_code not in self.thread_counts:
+            self.thread_counts[language_code] = \
+                ThreadSimilarity.objects.get_thread_count(language_code)
+        return self.thread_counts[language_code]
+
+    @transaction.atomic
+    def rebuild_chunk(self, thread_ids):
+        """replaces the lists of the threads in one transaction,
+        so that the lists are never missing in the question pages"""
+        thread_tags = Thread.tags.through.objects.filter(
+            thread_id__in=thread_ids
+        ).order_by('thread_id').values_list(
+            'thread_id', 'thread__language_code', 'tag_id'
+        )
+        grouped_tags = itertools.groupby(thread_tags, key=operator.itemgetter(0, 1))
+
+        records = list()
+        for (thread_id, language_code), rows in grouped_tags:
+            tag_weights = ThreadSimilarity.objects.get_tag_weights(
+                dict((tag_id, self.tag_counts.get(tag_id, 0)) for _, _, tag_id in rows),
+                self.get_thread_count(language_code)
+            )
+            thread = Thread(id=thread_id, language_code=language_code)
+            scores = ThreadSimilarity.objects.get_scores(
+                thread, tag_weights, SIMILAR_THREADS_COUNT
+            )
+            records.extend(
+                ThreadSimilarity(thread_id=thread_id, other_thread_id=other_id, score=score)
+                for other_id, score in scores
+            )
+
+        ThreadSimilarity.objects.filter(thread_id__in=thread_ids).delete()
+        ThreadSimilarity.objects.bulk_create(records)
+        Thread.objects.filter(id__in=thread_ids).update(similar_threads_computed=True)
@@ -0,0 +1,25 @@
+"""Rebuilds the denormalized thread listing records
+used by the question lists when the
+ASKBOT_THREAD_LISTING_INDEX_ENABLED setting is on"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from askbot.models import Thread, ThreadListing
+from askbot.utils.console import ProgressBar
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the denormalized thread listing records'
+
+    @transaction.atomic
+    def handle(self, **options):
+        # records of the threads without questions are dropped,
+        # the remaining ones are overwritten below
+        ThreadListing.objects.exclude(
+            thread__posts__post_type='question'
+        ).delete()
+
+        threads = Thread.objects.all()
+        message = 'Rebuilding thread listing'
+        for thread in ProgressBar(threads.iterator(), threads.count(), message):
+            ThreadListing.objects.update_for_thread(thread)
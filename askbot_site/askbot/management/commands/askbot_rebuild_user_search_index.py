@@ -0,0 +1,44 @@
+"""Rebuilds the index of the words of the user names
+and profile texts used by the users directory search when the
+ASKBOT_USER_SEARCH_INDEX_ENABLED setting is on"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from askbot.models import LocalizedUserProfile, User, UserSearchTerm
+from askbot.models.user import get_user_search_terms
+from askbot.utils.console import ProgressBar
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the user search index'
+
+    def get_sources(self):
+        """yields triples (user id, source, text)"""
+        users = User.objects.values_list('id', 'username', 'askbot_profile__real_name')
+        for user_id, username, real_name in users.iterator():
+            yield user_id, 'username', username
+            yield user_id, 'real_name', real_name
+        profiles = LocalizedUserProfile.objects.exclude(about='').values_list(
+            'auth_user_id', 'language_code', 'about'
+        )
+        for user_id, language_code, about in profiles.iterator():
+            yield user_id, 'about-' + language_code, about
+
+    @transaction.atomic
+    def handle(self, **options):
+        UserSearchTerm.objects.all().delete()
+
+        count = User.objects.count()
+        count = count * 2 + LocalizedUserProfile.objects.exclude(about='').count()
+        records = list()
+        message = 'Rebuilding user search index'
+        for user_id, source, text in ProgressBar(self.get_sources(), count, message):
+            terms = get_user_search_terms(text or '', limit=UserSearchTerm.MAX_TERMS)
+            records.extend(
+                UserSearchTerm(user_id=user_id, source=source, term=term)
+                for term in terms
+            )
+            if len(records) >= 1000:
+                UserSearchTerm.objects.bulk_create(records)
+                records = list()
+        UserSearchTerm.objects.bulk_create(records)
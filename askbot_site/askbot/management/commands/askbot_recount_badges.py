@@ -1,19 +1,55 @@
-"""Recounts user's badges"""
-from askbot import const
-from askbot.models import User
-from askbot.utils.console import ProgressBar
+"""Recounts user's badges, the awards are counted
+with one aggregate query per chunk of users,
+the chunks are processed by the current process or
+by a pool of worker processes (option ``--processes``)"""
+import multiprocessing
+
 from django.conf import settings as django_settings
 from django.core.management import BaseCommand
-from django.db import transaction
+from django.db import connection
 from django.utils import translation
 
+from askbot.models import User
+from askbot.models.badges import recount_badges
+from askbot.utils.console import show_progress
+
+
+def recount_badges_in_worker_process(user_ids):
+    """recounts the badges from a pool process, which
+    must not keep the database connection"""
+    recount_badges(user_ids)
+    connection.close()
+
+
 class Command(BaseCommand):
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', action='store', type=int, dest='chunk_size',
+            default=1000, help='Number of users whose badges are counted at once'
+        )
+        parser.add_argument(
+            '--processes', action='store', type=int, dest='processes',
+            default=1, help='Number of worker processes'
+        )
+
+    def handle(self, *args, **options):
         translation.activate(django_settings.LANGUAGE_CODE)
-        users = User.objects.all()
-        count = users.count()
+        user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+        chunk_size = max(options['chunk_size'], 1)
+        chunks = [
+            user_ids[pos:pos + chunk_size]
+            for pos in range(0, len(user_ids), chunk_size)
+        ]
         msg = 'Counting user badges'
-        for user in ProgressBar(users.iterator(), count, msg):
-            user.recount_badges()
-            transaction.commit()
+        if options['processes'] > 1:
+            # the worker processes open their own connections
+            connection.close()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(options['processes']) as pool:
+                results = pool.imap_unordered(recount_badges_in_worker_process, chunks)
+                for _ in show_progress(results, len(chunks), msg, options['verbosity']):
+                    pass
+        else:
+            for chunk in show_progress(iter(chunks), len(chunks), msg, options['verbosity']):
+                recount_badges(chunk)
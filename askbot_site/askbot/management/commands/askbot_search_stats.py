@@ -0,0 +1,69 @@
+"""Prints statistics of the question searches profiled
+when ASKBOT_SEARCH_PROFILE_SAMPLE_RATE is above 0,
+see `askbot.search.profiling`"""
+from django.core.management.base import BaseCommand
+
+from askbot.models import SearchShapeStats, SlowSearch
+
+ORDER_BY_CHOICES = {
+    'total': '-total_ms',
+    'max': '-max_ms',
+    'count': '-search_count',
+    'slow': '-slow_count',
+}
+
+
+class Command(BaseCommand):
+    help = 'Prints statistics of the profiled question searches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--order-by', action='store', dest='order_by', default='total',
+            choices=sorted(ORDER_BY_CHOICES),
+            help='Sort the search shapes by the total or maximum time, '
+                 'the number of the searches or of the slow searches'
+        )
+        parser.add_argument(
+            '--slow', action='store', type=int, dest='slow', default=0,
+            help='Also print this many latest slow searches with their SQL'
+        )
+        parser.add_argument(
+            '--reset', action='store_true', dest='reset', default=False,
+            help='Delete the statistics and the slow search log'
+        )
+
+    def handle(self, **options):
+        if options['reset']:
+            SearchShapeStats.objects.all().delete()
+            SlowSearch.objects.all().delete()
+            return
+
+        stats = SearchShapeStats.objects.order_by(ORDER_BY_CHOICES[options['order_by']])
+        line = '%8s %6s %10s %10s %10s %8s  %s'
+        self.stdout.write(line % ('searches', 'slow', 'avg ms', 'max ms',
+                                  'avg found', 'queries', 'shape'))
+        for item in stats:
+            count = max(item.search_count, 1)
+            self.stdout.write(line % (
+                item.search_count,
+                item.slow_count,
+                '%.1f' % item.get_average_ms(),
+                '%.1f' % item.max_ms,
+                '%.1f' % (item.total_found / count),
+                '%.1f' % (item.total_queries / count),
+                item.shape
+            ))
+
+        for slow_search in SlowSearch.objects.order_by('-id')[:options['slow']]:
+            self.stdout.write('')
+            self.stdout.write('%s %.1f ms, found %d, %d queries' % (
+                slow_search.added_at.isoformat(),
+                slow_search.duration_ms,
+                slow_search.found_count,
+                slow_search.query_count
+            ))
+            self.stdout.write(slow_search.search_url)
+            self.stdout.write(slow_search.shape)
+            self.stdout.write(slow_search.sql)
+            if slow_search.plan:
+                self.stdout.write(slow_search.plan)
@@ -0,0 +1,22 @@
+"""Recomputes the PostgreSQL text search vectors of the threads
+queued since the last run, when the
+ASKBOT_POSTGRESQL_DEFERRED_SEARCH_VECTORS setting is on,
+should be run periodically, e.g. from a cron job"""
+from django.core.management.base import BaseCommand
+
+from askbot.models import SearchVectorUpdate
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the text search vectors of the changed threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', action='store', type=int, dest='batch_size',
+            default=500, help='Number of threads updated in one transaction'
+        )
+
+    def handle(self, **options):
+        count = SearchVectorUpdate.objects.update_all(options['batch_size'])
+        if options['verbosity'] > 1:
+            self.stdout.write('Updated search vectors of %d threads' % count)
@@ -6,9 +6,15 @@ import sys
 
 class Command(BaseCommand):
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', action='store', type=int, dest='count',
+            default=1000, help='Number of the tags'
+        )
+
     def handle(self, **options):
         user = models.User.objects.get(id=2)
-        for i in range(1000):
+        for i in range(options['count']):
             name = 'tag' + str(i)
             models.Tag.objects.create(
                                 name=name,
@@ -1,8 +1,36 @@
-from django.core.management import BaseCommand
-from django.db import connection as conn
+"""Sets up the full text search in PostgreSQL.
+
+With the option ``--rebuild`` only recomputes the text search vectors
+of all threads and posts, in chunks of threads processed by a pool
+of worker processes (option ``--processes``). The full text search
+must have been set up before.
+
+When the ASKBOT_POSTGRESQL_DEFERRED_SEARCH_VECTORS setting is on,
+the triggers updating the vectors are dropped and the changed threads
+are queued for the ``askbot_update_search_vectors`` command instead.
+Otherwise the threads changed during the rebuild are queued too, and
+the queue is processed before the triggers are created again."""
+import multiprocessing
 import os.path
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
 import askbot
+from askbot.models import SearchVectorUpdate, Thread
+from askbot.search import postgresql
 from askbot.search.postgresql import setup_full_text_search
+from askbot.utils.console import ProgressBar
+
+
+def update_in_worker_process(thread_ids):
+    """updates the vectors from a pool process, which
+    must not keep the database connection"""
+    postgresql.update_thread_search_vectors(thread_ids)
+    connection.close()
+    return len(thread_ids)
+
 
 class Command(BaseCommand):
 
@@ -13,8 +41,24 @@ class Command(BaseCommand):
                             default=False,
                             help='force the issue'
                            )
+        parser.add_argument(
+            '--rebuild', action='store_true', dest='rebuild', default=False,
+            help='Only recompute the text search vectors of all threads'
+        )
+        parser.add_argument(
+            '--chunk-size', action='store', type=int, dest='chunk_size',
+            default=500, help='Number of threads updated at once'
+        )
+        parser.add_argument(
+            '--processes', action='store', type=int, dest='processes',
+            default=1, help='Number of worker processes'
+        )
 
     def handle(self, **options):
+        if options['rebuild']:
+            self.rebuild(options)
+            return
+
         dir_path = askbot.get_install_directory()
 
         script_path = os.path.join(
@@ -32,3 +76,58 @@ class Command(BaseCommand):
                             'user_profile_search_12202015.plsql'
                         )
         setup_full_text_search(script_path)
+
+        if SearchVectorUpdate.objects.is_enabled():
+            postgresql.drop_search_vector_triggers()
+
+    def rebuild(self, options):
+        deferred = SearchVectorUpdate.objects.is_enabled()
+        if not deferred:
+            SearchVectorUpdate.objects.set_rebuilding(True)
+        try:
+            self.rebuild_vectors(options, deferred)
+        finally:
+            if not deferred:
+                SearchVectorUpdate.objects.set_rebuilding(False)
+
+    def rebuild_vectors(self, options, deferred):
+        started_at = timezone.now()
+        # the posts would be added to the thread vectors twice
+        postgresql.drop_search_vector_triggers()
+
+        thread_ids = list(Thread.objects.order_by('id').values_list('id', flat=True))
+        chunk_size = options['chunk_size']
+        chunks = [
+            thread_ids[pos:pos + chunk_size]
+            for pos in range(0, len(thread_ids), chunk_size)
+        ]
+        message = 'Rebuilding text search vectors'
+        if options['processes'] > 1:
+            # the worker processes open their own connections
+            connection.close()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(options['processes']) as pool:
+                results = pool.imap_unordered(update_in_worker_process, chunks)
+                for _ in ProgressBar(results, len(chunks), message):
+                    pass
+        else:
+            for chunk in ProgressBar(iter(chunks), len(chunks), message):
+                postgresql.update_thread_search_vectors(chunk)
+
+        if deferred:
+            # threads queued before the rebuild are up to date
+            SearchVectorUpdate.objects.filter(marked_at__lt=started_at).delete()
+            return
+
+        # in case the processes writing the threads do not share the cache
+        changed_ids = Thread.objects.filter(
+            last_activity_at__gte=started_at
+        ).values_list('id', flat=True)
+        SearchVectorUpdate.objects.mark_threads(changed_ids)
+        SearchVectorUpdate.objects.update_all(options['chunk_size'])
+        with transaction.atomic():
+            # threads changed until the triggers are created
+            # are updated with the writes blocked
+            postgresql.lock_search_vector_tables()
+            SearchVectorUpdate.objects.update_all(options['chunk_size'])
+            postgresql.create_search_vector_triggers()
@@ -305,7 +305,9 @@ TagEditor.prototype.decorate = function (element) {
     this.saveHeight();
 
     var tagsAc = new AutoCompleter({
-        url: askbot.urls.get_tag_list,
+        url: askbot.urls.complete_tags,
+        matchSubset: false,
+        sortResults: false,
         onItemSelect: function (item) {
             if (me.isSelectedTagName(item.value) === false) {
                 me.completeTagInput();
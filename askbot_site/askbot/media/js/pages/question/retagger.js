@@ -21,7 +21,9 @@
 
   RetagForm.prototype.initAutoCompleter = function () {
     var tagAc = new AutoCompleter({
-      url: askbot.urls.get_tag_list,
+      url: askbot.urls.complete_tags,
+      matchSubset: false,
+      sortResults: false,
       minChars: 1,
       useCache: true,
       matchInside: true,
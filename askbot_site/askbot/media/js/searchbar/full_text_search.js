@@ -99,7 +99,9 @@ FullTextSearch.prototype.hydrateTagSearchInput = function () {
   }
   var me = this;
   var ac = new AutoCompleter({
-    url: askbot.urls.get_tag_list,
+    url: askbot.urls.complete_tags,
+    matchSubset: false,
+    sortResults: false,
     minChars: 1,
     useCache: true,
     matchInside: true,
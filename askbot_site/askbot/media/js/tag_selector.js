@@ -414,7 +414,9 @@ function pickedTags() {
             setupTagFilterControl('display');
             setupTagFilterControl('email');
             var ac = new AutoCompleter({
-                url: askbot.urls.get_tag_list,
+                url: askbot.urls.complete_tags,
+                matchSubset: false,
+                sortResults: false,
                 minChars: 1,
                 useCache: true,
                 matchInside: true,
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:56
+
+import askbot.models.fields
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('askbot', '0017_auto_20220711_0155'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThreadListing',
+            fields=[
+                ('thread', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='askbot.thread')),
+                ('language_code', askbot.models.fields.LanguageCodeField(choices=[('en', 'English')], default='en', max_length=16)),
+                ('deleted', models.BooleanField(db_index=True, default=False)),
+                ('approved', models.BooleanField(default=True)),
+                ('closed', models.BooleanField(default=False)),
+                ('has_accepted_answer', models.BooleanField(default=False)),
+                ('answer_count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('points', models.IntegerField(db_index=True, default=0)),
+                ('added_at', models.DateTimeField(db_index=True)),
+                ('last_activity_at', models.DateTimeField(db_index=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
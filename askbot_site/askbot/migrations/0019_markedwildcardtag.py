@@ -0,0 +1,52 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+WILDCARD_FIELDS = (
+    ('good', 'interesting_tags'),
+    ('bad', 'ignored_tags'),
+    ('subscribed', 'subscribed_tags'),
+)
+
+def populate_marked_wildcard_tags(apps, schema_editor):
+    """copies wildcard tag selections from the user profiles"""
+    MarkedWildcardTag = apps.get_model('askbot', 'MarkedWildcardTag')
+    UserProfile = apps.get_model('askbot', 'UserProfile')
+    profiles = UserProfile.objects.exclude(
+        interesting_tags='', ignored_tags='', subscribed_tags=''
+    )
+    records = list()
+    for profile in profiles.iterator():
+        for reason, field_name in WILDCARD_FIELDS:
+            for wildcard in set(getattr(profile, field_name).split()):
+                records.append(
+                    MarkedWildcardTag(
+                        user_id=profile.auth_user_ptr_id,
+                        reason=reason,
+                        prefix=wildcard[:-1]
+                    )
+                )
+    MarkedWildcardTag.objects.bulk_create(records, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('askbot', '0018_threadlisting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarkedWildcardTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('good', 'interesting'), ('bad', 'ignored'), ('subscribed', 'subscribed')], max_length=16)),
+                ('prefix', models.CharField(db_index=True, max_length=255)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wildcard_tag_selections', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(populate_marked_wildcard_tags, migrations.RunPython.noop),
+    ]
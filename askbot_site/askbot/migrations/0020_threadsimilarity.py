@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 22:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('askbot', '0019_markedwildcardtag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThreadSimilarity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('other_thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reverse_similarities', to='askbot.thread')),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='askbot.thread')),
+            ],
+            options={
+                'unique_together': {('thread', 'other_thread')},
+            },
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='similar_threads_computed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-18 22:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('askbot', '0020_threadsimilarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedTagCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('selected_tag_ids', models.CharField(max_length=64)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='askbot.tag')),
+            ],
+            options={
+                'unique_together': {('selected_tag_ids', 'tag')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('askbot', '0022_usersearchterm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchVectorUpdate',
+            fields=[
+                ('thread_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('marked_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
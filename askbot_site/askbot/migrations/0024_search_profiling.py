@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('askbot', '0023_searchvectorupdate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchShapeStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shape', models.CharField(max_length=255, unique=True)),
+                ('search_count', models.PositiveIntegerField(default=0)),
+                ('slow_count', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('total_found', models.PositiveIntegerField(default=0)),
+                ('total_queries', models.PositiveIntegerField(default=0)),
+                ('last_search_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SlowSearch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shape', models.CharField(max_length=255)),
+                ('search_url', models.TextField()),
+                ('duration_ms', models.FloatField()),
+                ('found_count', models.PositiveIntegerField()),
+                ('query_count', models.PositiveIntegerField()),
+                ('sql', models.TextField()),
+                ('plan', models.TextField(blank=True)),
+                ('added_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
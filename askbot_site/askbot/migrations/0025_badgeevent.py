@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('askbot', '0024_search_profiling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BadgeEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(max_length=64)),
+                ('object_id', models.PositiveIntegerField()),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('event', 'actor', 'content_type', 'object_id')},
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='badgeevent',
+            constraint=models.UniqueConstraint(condition=models.Q(('actor__isnull', True)), fields=('event', 'content_type', 'object_id'), name='askbot_badgeevent_unique_without_actor'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:41
+
+import askbot.models.fields
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('askbot', '0025_badgeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReputationSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language_code', askbot.models.fields.LanguageCodeField(choices=[('en', 'English')], default='en', max_length=16)),
+                ('date', models.DateField()),
+                ('reputed_at', models.DateTimeField()),
+                ('reputation', models.IntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'language_code', 'date')},
+            },
+        ),
+    ]
@@ -14,7 +14,7 @@ import urllib.request, urllib.parse, urllib.error
 from functools import partial
 from django.urls import reverse, NoReverseMatch
 from django.core.paginator import Paginator
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.db.models import signals as django_signals
 from django.utils import timezone
 from django.utils import translation
@@ -25,7 +25,8 @@ from django.utils.html import escape
 from django.utils.text import format_lazy
 from django.apps import apps
 from django.db import models
-from django.db.models import Count, Q
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
 from django.conf import settings as django_settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
@@ -36,7 +37,10 @@ from askbot import exceptions as askbot_exceptions
 from askbot import const
 from askbot.const import message_keys
 from askbot.conf import settings as askbot_settings
-from askbot.models.question import Thread
+from askbot.models.question import Thread, ThreadToGroup, ThreadListing
+from askbot.models.question import SearchVectorUpdate
+from askbot.models.question import SearchShapeStats, SlowSearch
+from askbot.models.question import ThreadSimilarity
 from askbot.skins import utils as skin_utils
 from askbot.mail.messages import (WelcomeEmail,
                                   WelcomeEmailRespondable,
@@ -45,11 +49,15 @@ from askbot.models.question import QuestionView, AnonymousQuestion
 from askbot.models.question import DraftQuestion
 from askbot.models.question import FavoriteQuestion
 from askbot.models.message import Message
-from askbot.models.tag import Tag, MarkedTag, TagSynonym
+from askbot.models.tag import Tag, MarkedTag, MarkedWildcardTag, TagSynonym
+from askbot.models.tag import RelatedTagCount
 from askbot.models.tag import format_personal_group_name
 from askbot.models.user import EmailFeedSetting, ActivityAuditStatus, Activity
 from askbot.models.user import GroupMembership
-from askbot.models.user import Group
+from askbot.models.user import Group, GROUP_LIST_CACHE_KEY
+from askbot.models.user import get_moderation_items_cache_key
+from askbot.models.user import get_users_count_cache_key
+from askbot.models.user import UserSearchTerm
 from askbot.models.user import BulkTagSubscription
 from askbot.models.post import Post, PostRevision
 from askbot.models.post import PostFlagReason, AnonymousAnswer
@@ -59,11 +67,13 @@ from askbot.models.user_profile import (
                                 add_profile_properties,
                                 UserProfile,
                                 LocalizedUserProfile,
-                                get_localized_profile_cache_key
+                                get_localized_profile_cache_key,
+                                get_profile
                             )
 from askbot.models.reply_by_email import ReplyAddress
 from askbot.models.badges import award_badges_signal, get_badge
 from askbot.models.repute import Award, Repute, Vote, BadgeData
+from askbot.models.repute import BadgeEvent, ReputationSnapshot
 from askbot.models.widgets import AskWidget, QuestionWidget
 from askbot.models.meta import ImportRun, ImportedObjectInfo
 from askbot.models.role import Role, get_role_set
@@ -74,11 +84,13 @@ from askbot.utils.decorators import reject_forbidden_phrases
 from askbot.utils.markup import URL_RE
 from askbot.utils.slug import slugify, ascii_slugify
 from askbot.utils.celery_utils import defer_celery_task
-from askbot.utils.translation import get_language
+from askbot.utils.translation import get_language, get_language_codes
 from askbot.utils.html import replace_links_with_text
 from askbot.utils import functions
 from askbot import mail
 from askbot import signals
+from askbot.search import tag_trie
+from askbot.search import title_index
 
 from jsonfield import JSONField
 
@@ -135,6 +147,8 @@ def get_users_by_text_query(search_query, users_query_set = None):
         import askbot
         if users_query_set is None:
             users_query_set = User.objects.all()
+        if UserSearchTerm.objects.is_enabled():
+            return UserSearchTerm.objects.filter_users(users_query_set, search_query)
         if 'postgresql_psycopg2' in askbot.get_database_engine_name():
             from askbot.search import postgresql
             return postgresql.run_user_search(users_query_set, search_query)
@@ -150,6 +164,17 @@ def get_users_by_text_query(search_query, users_query_set = None):
         #        models.Q(localized_user_profiles__about__search = search_query)
         #    )
 
+def get_cached_users_count(users_query_set, group_id=None):
+    """returns number of users listed on the users page,
+    cached per group and language for `ASKBOT_USERS_COUNT_CACHE_TIMEOUT`
+    seconds, or until the group members change"""
+    cache_key = get_users_count_cache_key(group_id or 0, get_language())
+    count = cache.get(cache_key)
+    if count is None:
+        count = users_query_set.count()
+        cache.set(cache_key, count, django_settings.ASKBOT_USERS_COUNT_CACHE_TIMEOUT)
+    return count
+
 class RelatedObjectSimulator(object):
     '''Objects that simulates the "messages_set" related field
     somehow django does not creates it automatically in django1.4.1'''
@@ -1484,6 +1509,7 @@ def user_anonymize(self):
     self.save()
     self.askbot_profile.anonymize()
     self.askbot_profile.save()
+    MarkedWildcardTag.objects.filter(user=self).delete()
     self.posts.update(is_anonymous=True)
     revs = PostRevision.objects.filter(author=self)
     revs.update(is_anonymous=True)
@@ -1515,6 +1541,10 @@ def user_update_localized_profile(self, **kwargs):
     profile.update_cache()
     lp = LocalizedUserProfile.objects.filter(pk=profile.pk)
     lp.update(**kwargs)
+    # update() does not send the post_save signal
+    if 'about' in kwargs and UserSearchTerm.objects.is_enabled():
+        source = 'about-' + profile.language_code
+        UserSearchTerm.objects.update_for_user(self.id, source, kwargs['about'])
 
 
 def user_get_unused_votes_today(self):
@@ -2512,11 +2542,13 @@ def user_visit_question(self, question = None, timestamp = None):
     #finally, mark admin memo objects if applicable
     #the admin response counts are not denormalized b/c they are easy to obtain
     if self.is_moderator() or self.is_administrator():
-        audit_records.filter(
+        seen_flag_count = audit_records.filter(
             activity__activity_type=const.TYPE_ACTIVITY_MARK_OFFENSIVE
         ).update(
             status=ActivityAuditStatus.STATUS_SEEN
         )
+        if seen_flag_count:
+            cache.delete(get_moderation_items_cache_key(self.id))
 
 
 def user_is_administrator(self):
@@ -3231,12 +3263,8 @@ def _process_vote(user, post, timestamp=None, cancel=False, vote_type=None):
         else:
             auth.onDownVoted(vote, post, user, timestamp)
 
-    post.thread.reset_cached_data()
-
-    if post.post_type == 'question':
-        #denormalize the question post score on the thread
-        post.thread.points = post.points
-        post.thread.save()
+    #the vote counts are updated in place by the askbot.auth functions
+    post.thread.invalidate_cached_vote_data(post)
 
     if cancel:
         return None
@@ -3447,24 +3475,33 @@ def user_update_response_counts(user):
 
 
 def user_receive_reputation(self, num_points, language_code=None):
+    """changes the total and the localized reputation of the user
+    with the atomic updates, so that the concurrent changes
+    are not lost, the user does not need to be saved after"""
     language_code = language_code or get_language()
-    old_points = self.reputation
-    new_points = old_points + num_points
-    self.reputation = max(const.MIN_REPUTATION, new_points)
+    profiles = UserProfile.objects.filter(pk=self.pk)
+    with transaction.atomic():
+        # the row stays locked until the update, the new value may be
+        # clamped, so the previous one cannot be derived from it
+        old_points = profiles.select_for_update().values_list('reputation', flat=True).get()
+        profiles.update(reputation=Greatest(F('reputation') + num_points, const.MIN_REPUTATION))
+    profile = get_profile(self)
+    profile.reputation = max(old_points + num_points, const.MIN_REPUTATION)
+    profile.update_cache()
 
     #record localized user reputation - this starts with 0
-    try:
-        profile = LocalizedUserProfile.objects.get(
+    localized_profiles = LocalizedUserProfile.objects.filter(
                                             auth_user=self,
                                             language_code=language_code
                                         )
-    except LocalizedUserProfile.DoesNotExist:
-        profile = LocalizedUserProfile(
+    if localized_profiles.update(reputation=Greatest(F('reputation') + num_points, 0)):
+        cache.delete(get_localized_profile_cache_key(self, language_code))
+    else:
+        LocalizedUserProfile.objects.create(
                                     auth_user=self,
-                                    language_code=language_code
+                                    language_code=language_code,
+                                    reputation=max(0, num_points)
                                 )
-    profile.reputation = max(0, profile.reputation + num_points)
-    profile.save()
 
     signals.reputation_received.send(None, user=self, reputation_before=old_points)
 
@@ -3512,6 +3549,7 @@ def user_update_wildcard_tag_selections(
     self.ignored_tags = ' '.join(ignored)
     self.subscribed_tags = ' '.join(subscribed)
     self.save()
+    MarkedWildcardTag.objects.update_for_user(self)
     return new_tags
 
 
@@ -4036,6 +4074,14 @@ def record_question_visit(request, question, **kwargs):
                 update_view_count = True
 
         request.session['question_view_times'][question.id] = timezone.now()
+
+        if update_view_count and django_settings.ASKBOT_VIEW_COUNT_BUFFER_ENABLED:
+            Thread.objects.buffer_view_count(question.thread_id)
+            update_view_count = False
+            if request.user.is_anonymous:
+                # nothing else to record for the anonymous visitors
+                return
+
         #2) run the slower jobs in a celery task
         from askbot import tasks
         defer_celery_task(
@@ -4156,6 +4202,192 @@ def record_update_tags(thread, tags, user, timestamp, **kwargs):
                 )
     activity.save()
 
+def update_thread_listing(sender, instance, raw=False, **kwargs):
+    """updates the denormalized listing record
+    when the thread or its question is saved"""
+    if raw or not ThreadListing.objects.is_enabled():
+        return
+    if sender is Post:
+        if instance.post_type != 'question':
+            return
+        thread = instance.thread
+    else:
+        thread = instance
+    ThreadListing.objects.update_for_thread(thread)
+
+def update_thread_search_index(
+    sender=None, post=None, instance=None, revision=None, thread=None, **kwargs
+):
+    """updates the built-in search index when the posts
+    are edited, deleted or restored and when the thread is retagged"""
+    from askbot.search import native as native_search
+    if not native_search.is_enabled():
+        return
+    if thread is None:
+        post = post or instance or revision.post
+        thread_id = post.thread_id
+    else:
+        thread_id = thread.id
+    from askbot.tasks import update_thread_search_index as update_task
+    defer_celery_task(update_task, args=(thread_id,))
+
+def remove_thread_from_search_index(instance, **kwargs):
+    """removes the deleted thread from the built-in search index"""
+    from askbot.search import native as native_search
+    if native_search.is_enabled():
+        native_search.remove_thread(instance.id, instance.language_code)
+
+def update_tag_autocomplete(instance, created=False, raw=False, **kwargs):
+    """updates the tag name trie used by the tag autocomplete"""
+    if not raw:
+        tag_trie.update_tag(instance, created=created)
+
+def remove_tag_from_autocomplete(instance, **kwargs):
+    tag_trie.remove_tag(instance)
+
+def update_similar_threads(thread, **kwargs):
+    """updates the lists of the similar threads
+    when the thread is retagged"""
+    from askbot.tasks import update_similar_threads as update_task
+    defer_celery_task(update_task, args=(thread.id,))
+
+def is_counted_in_related_tags(thread):
+    """threads with the deleted questions
+    are not counted in the related tags"""
+    return not thread.posts.filter(post_type='question', deleted=True).exists()
+
+def update_related_tag_counts(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """updates the precomputed related tag counts
+    when tags are added to or removed from the thread"""
+    if reverse or action not in ('pre_remove', 'pre_clear', 'post_add'):
+        return
+    if not is_counted_in_related_tags(instance):
+        return
+    tag_ids = set(instance.tags.values_list('id', flat=True))
+    if action == 'post_add':
+        old_tag_ids, new_tag_ids = tag_ids - set(pk_set), tag_ids
+    elif action == 'pre_remove':
+        old_tag_ids, new_tag_ids = tag_ids, tag_ids - set(pk_set)
+    else:
+        old_tag_ids, new_tag_ids = tag_ids, set()
+    RelatedTagCount.objects.update_for_tags(old_tag_ids, new_tag_ids)
+
+def update_related_tag_counts_on_post_change(instance, **kwargs):
+    """removes the thread from the related tag counts
+    when the question is deleted and adds it back on restore"""
+    if instance.post_type != 'question':
+        return
+    tag_ids = instance.thread.tags.values_list('id', flat=True)
+    if instance.deleted:
+        RelatedTagCount.objects.update_for_tags(tag_ids, ())
+    else:
+        RelatedTagCount.objects.update_for_tags((), tag_ids)
+
+def remove_thread_from_related_tag_counts(instance, **kwargs):
+    if is_counted_in_related_tags(instance):
+        tag_ids = instance.tags.values_list('id', flat=True)
+        RelatedTagCount.objects.update_for_tags(tag_ids, ())
+
+def update_title_index(sender, instance, created=False, raw=False, **kwargs):
+    """records the change of the thread for the title
+    suggestions index, when the thread or its question is deleted
+    or saved with the changed title, tags, answer count or deleted flag"""
+    if raw or not django_settings.ASKBOT_TITLE_INDEX_ENABLED:
+        return
+    if sender is Post and instance.post_type != 'question':
+        return
+    is_deleted = kwargs.get('signal') is django_signals.post_delete
+    if not is_deleted and not title_index.is_changed(instance, created=created):
+        return
+    if sender is Post:
+        title_index.update_thread(instance.thread_id)
+    else:
+        title_index.update_thread(instance.id)
+
+def update_user_search_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    """updates the words of the user names and of the
+    profile texts in the user search index"""
+    if raw or not UserSearchTerm.objects.is_enabled():
+        return
+    if sender is User:
+        if update_fields and 'username' not in update_fields:
+            return
+        user_id, source, text = instance.id, 'username', instance.username
+    elif sender is UserProfile:
+        user_id, source, text = instance.auth_user_ptr_id, 'real_name', instance.real_name
+    else:
+        user_id, text = instance.auth_user_id, instance.about
+        source = 'about-' + instance.language_code
+    UserSearchTerm.objects.update_for_user(user_id, source, text)
+
+def clear_users_count_cache(sender, instance, created=True, **kwargs):
+    """drops the cached numbers of users on the users page
+    when the group members change or a new user joins"""
+    if sender is User:
+        if not created:
+            return
+        group_id = 0
+    else:
+        group_id = instance.group_id
+    language_codes = set(get_language_codes()) | set([django_settings.LANGUAGE_CODE])
+    cache.delete_many([
+        get_users_count_cache_key(group_id, language_code)
+        for language_code in language_codes
+    ])
+
+def invalidate_cached_search_results(sender, instance, raw=False, **kwargs):
+    """marks as stale the cached results of the searches
+    by the tags of the thread, when the thread, its question
+    or its groups are changed"""
+    if raw or not django_settings.ASKBOT_SEARCH_RESULTS_CACHE_TIMEOUT:
+        return
+    if sender is Post:
+        if instance.post_type != 'question':
+            return
+        thread = instance.thread
+    elif sender is ThreadToGroup:
+        thread = instance.thread
+    else:
+        thread = instance
+    Thread.objects.invalidate_cached_search_results(thread.get_tag_names())
+
+def invalidate_cached_search_results_on_retag(
+    sender, instance, action, reverse, pk_set=None, **kwargs
+):
+    """marks as stale the cached results of the searches by the tags
+    added to or removed from the thread"""
+    if not django_settings.ASKBOT_SEARCH_RESULTS_CACHE_TIMEOUT:
+        return
+    if reverse or action not in ('pre_remove', 'pre_clear', 'post_add'):
+        return
+    if action == 'pre_clear':
+        tags = instance.tags.all()
+    else:
+        tags = Tag.objects.filter(id__in=pk_set)
+    tag_names = tags.values_list('name', flat=True)
+    Thread.objects.invalidate_cached_search_results(tag_names)
+
+def queue_search_vector_update(sender, instance, raw=False, **kwargs):
+    """queues the thread for the ``askbot_update_search_vectors``
+    command when its text search vector is not maintained by the triggers"""
+    if raw or not SearchVectorUpdate.objects.is_queueing():
+        return
+    if sender is Post:
+        thread_id = instance.thread_id
+    else:
+        thread_id = instance.id
+    if thread_id:
+        SearchVectorUpdate.objects.mark_threads([thread_id])
+
+def clear_group_list_cache(instance, **kwargs):
+    """drops the cached list of groups shown in the group dropdown"""
+    if not instance.is_personal():
+        cache.delete(GROUP_LIST_CACHE_KEY)
+
+def clear_moderation_items_cache(instance, **kwargs):
+    """drops the cached counts of moderation items of the memo recipient"""
+    cache.delete(get_moderation_items_cache_key(instance.user_id))
+
 def record_favorite_question(instance, created, **kwargs):
     """
     when user add the question in him favorite questions list.
@@ -4501,6 +4733,126 @@ django_signals.post_save.connect(
     sender=Post,
     dispatch_uid='record_answer_accepted_on_answer_save'
 )
+django_signals.post_save.connect(
+    update_thread_listing,
+    sender=Thread,
+    dispatch_uid='update_thread_listing_on_thread_save'
+)
+django_signals.post_save.connect(
+    update_thread_listing,
+    sender=Post,
+    dispatch_uid='update_thread_listing_on_post_save'
+)
+django_signals.m2m_changed.connect(
+    update_related_tag_counts,
+    sender=Thread.tags.through, #pylint: disable=no-member
+    dispatch_uid='update_related_tag_counts_on_tags_change'
+)
+django_signals.post_save.connect(
+    invalidate_cached_search_results,
+    sender=Thread,
+    dispatch_uid='invalidate_cached_search_results_on_thread_save'
+)
+django_signals.post_save.connect(
+    invalidate_cached_search_results,
+    sender=Post,
+    dispatch_uid='invalidate_cached_search_results_on_post_save'
+)
+django_signals.post_save.connect(
+    invalidate_cached_search_results,
+    sender=ThreadToGroup,
+    dispatch_uid='invalidate_cached_search_results_on_thread_group_save'
+)
+django_signals.post_delete.connect(
+    invalidate_cached_search_results,
+    sender=Thread,
+    dispatch_uid='invalidate_cached_search_results_on_thread_delete'
+)
+django_signals.post_delete.connect(
+    invalidate_cached_search_results,
+    sender=ThreadToGroup,
+    dispatch_uid='invalidate_cached_search_results_on_thread_group_delete'
+)
+django_signals.m2m_changed.connect(
+    invalidate_cached_search_results_on_retag,
+    sender=Thread.tags.through, #pylint: disable=no-member
+    dispatch_uid='invalidate_cached_search_results_on_tags_change'
+)
+django_signals.post_save.connect(
+    queue_search_vector_update,
+    sender=Thread,
+    dispatch_uid='queue_search_vector_update_on_thread_save'
+)
+django_signals.post_save.connect(
+    queue_search_vector_update,
+    sender=Post,
+    dispatch_uid='queue_search_vector_update_on_post_save'
+)
+django_signals.post_delete.connect(
+    queue_search_vector_update,
+    sender=Post,
+    dispatch_uid='queue_search_vector_update_on_post_delete'
+)
+django_signals.post_save.connect(
+    update_title_index,
+    sender=Thread,
+    dispatch_uid='update_title_index_on_thread_save'
+)
+django_signals.post_save.connect(
+    update_title_index,
+    sender=Post,
+    dispatch_uid='update_title_index_on_post_save'
+)
+django_signals.post_delete.connect(
+    update_title_index,
+    sender=Thread,
+    dispatch_uid='update_title_index_on_thread_delete'
+)
+django_signals.post_save.connect(
+    update_user_search_index,
+    sender=User,
+    dispatch_uid='update_user_search_index_on_user_save'
+)
+django_signals.post_save.connect(
+    update_user_search_index,
+    sender=UserProfile,
+    dispatch_uid='update_user_search_index_on_profile_save'
+)
+django_signals.post_save.connect(
+    update_user_search_index,
+    sender=LocalizedUserProfile,
+    dispatch_uid='update_user_search_index_on_localized_profile_save'
+)
+django_signals.post_save.connect(
+    clear_users_count_cache,
+    sender=User,
+    dispatch_uid='clear_users_count_cache_on_user_save'
+)
+django_signals.post_save.connect(
+    clear_users_count_cache,
+    sender=GroupMembership,
+    dispatch_uid='clear_users_count_cache_on_membership_save'
+)
+django_signals.post_delete.connect(
+    clear_users_count_cache,
+    sender=GroupMembership,
+    dispatch_uid='clear_users_count_cache_on_membership_delete'
+)
+django_signals.post_save.connect(
+    update_tag_autocomplete,
+    sender=Tag,
+    dispatch_uid='update_tag_autocomplete_on_tag_save'
+)
+django_signals.post_save.connect(
+    clear_group_list_cache,
+    sender=Group,
+    dispatch_uid='clear_group_list_cache_on_group_save'
+)
+django_signals.post_save.connect(
+    clear_moderation_items_cache,
+    sender=ActivityAuditStatus,
+    dispatch_uid='clear_moderation_items_cache_on_memo_save'
+)
 django_signals.post_save.connect(
     record_vote,
     sender=Vote,
@@ -4528,6 +4880,36 @@ django_signals.post_delete.connect(
     dispatch_uid='record_cancel_vote_on_vote_delete'
 )
 
+django_signals.post_delete.connect(
+    remove_thread_from_search_index,
+    sender=Thread,
+    dispatch_uid='remove_thread_from_search_index_on_thread_delete'
+)
+
+django_signals.post_delete.connect(
+    remove_tag_from_autocomplete,
+    sender=Tag,
+    dispatch_uid='remove_tag_from_autocomplete_on_tag_delete'
+)
+
+django_signals.post_delete.connect(
+    clear_group_list_cache,
+    sender=Group,
+    dispatch_uid='clear_group_list_cache_on_group_delete'
+)
+
+django_signals.post_delete.connect(
+    clear_moderation_items_cache,
+    sender=ActivityAuditStatus,
+    dispatch_uid='clear_moderation_items_cache_on_memo_delete'
+)
+
+django_signals.pre_delete.connect(
+    remove_thread_from_related_tag_counts,
+    sender=Thread,
+    dispatch_uid='remove_thread_from_related_tag_counts_on_thread_delete'
+)
+
 django_signals.pre_delete.connect(
     delete_post_activities,
     sender=Post,
@@ -4604,6 +4986,41 @@ signals.spam_rejected.connect(
     dispatch_uid='record_spam_rejection'
 )
 
+signals.post_updated.connect(
+    update_thread_search_index,
+    dispatch_uid='update_thread_search_index_on_post_update'
+)
+signals.after_post_removed.connect(
+    update_thread_search_index,
+    dispatch_uid='update_thread_search_index_on_post_remove'
+)
+signals.after_post_restored.connect(
+    update_thread_search_index,
+    dispatch_uid='update_thread_search_index_on_post_restore'
+)
+signals.post_revision_published.connect(
+    update_thread_search_index,
+    dispatch_uid='update_thread_search_index_on_revision_publish'
+)
+signals.tags_updated.connect(
+    update_thread_search_index,
+    dispatch_uid='update_thread_search_index_on_tags_update'
+)
+
+signals.after_post_removed.connect(
+    update_related_tag_counts_on_post_change,
+    dispatch_uid='update_related_tag_counts_on_post_remove'
+)
+signals.after_post_restored.connect(
+    update_related_tag_counts_on_post_change,
+    dispatch_uid='update_related_tag_counts_on_post_restore'
+)
+
+signals.tags_updated.connect(
+    update_similar_threads,
+    dispatch_uid='update_similar_threads_on_tags_update'
+)
+
 #probably we cannot use post-save here the point of this is
 #to tell when the revision becomes publicly visible, not when it is saved
 signals.post_revision_published.connect(
@@ -4630,6 +5047,11 @@ signals.question_visited.connect(
 __all__ = [
         'signals',
         'Thread',
+        'ThreadListing',
+        'SearchVectorUpdate',
+        'SearchShapeStats',
+        'SlowSearch',
+        'ThreadSimilarity',
 
         'QuestionView',
         'FavoriteQuestion',
@@ -4647,11 +5069,15 @@ __all__ = [
         'Vote',
         'PostFlagReason',
         'MarkedTag',
+        'MarkedWildcardTag',
         'TagSynonym',
+        'RelatedTagCount',
 
         'BadgeData',
+        'BadgeEvent',
         'Award',
         'Repute',
+        'ReputationSnapshot',
 
         'Activity',
         'ActivityAuditStatus',
@@ -4661,6 +5087,7 @@ __all__ = [
 
         'User',
         'UserProfile',
+        'UserSearchTerm',
 
         'ReplyAddress',
 
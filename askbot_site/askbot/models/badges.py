@@ -17,11 +17,14 @@ and make sure that a signal `award_badges_signal` is sent with the
 corresponding event name, actor (user object), context_object and optionally
 - timestamp
 """
+import collections
 import datetime
 
+from django.core.cache import cache
 from django.template.defaultfilters import slugify
 from django.conf import settings as django_settings
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, F, Max, OuterRef, Subquery
 from django.utils.translation import ugettext as _
 from django.utils.translation import ungettext
 from django.utils import timezone
@@ -29,6 +32,7 @@ from django.dispatch import Signal
 
 from askbot import const
 from askbot.conf import settings as askbot_settings
+from askbot.models.user_profile import get_profile_cache_key
 from askbot.utils.decorators import auto_now_timestamp
 from askbot.utils.functions import format_setting_name
 from askbot.utils.loading import load_module
@@ -46,6 +50,10 @@ class Badge(object):
     the caller to try awarding badges at appropriate times
     """
     key = 'base-badge'  # override this
+    # what the award depends on besides the stored data, when the
+    # queued events are evaluated, the badge is considered once per
+    # 'actor' or per context 'object', or, if `None`, per both
+    coalesce_by = None
 
     def __init__(self, name='', level=None, description=None, multiple=False):
         # key - must be an ASCII only word
@@ -56,8 +64,13 @@ class Badge(object):
         self.css_class = const.BADGE_CSS_CLASSES[self.level]
 
     def get_stored_data(self):
+        """returns the `BadgeData` record of the badge,
+        it is loaded once per badge instance"""
         from askbot.models.repute import BadgeData
-        data, created = BadgeData.objects.get_or_create(slug=self.key)
+        data = getattr(self, '_stored_data', None)
+        if data is None:
+            data, created = BadgeData.objects.get_or_create(slug=self.key)
+            self._stored_data = data
         return data
 
     @property
@@ -125,6 +138,37 @@ class Badge(object):
         """
         return self.award(actor, context_object, timestamp)
 
+    def get_award_candidates(self, user_ids):
+        """returns a tuple (model, list of pairs (recipient id,
+        context object id)) of the awards deserved by the users
+        with the ``user_ids``, already given or not,
+        the context objects are of the model.
+
+        Used by the `recompute_awards`, `None` means
+        that the badge cannot be recomputed in bulk.
+        """
+        return None
+
+    @classmethod
+    def can_recompute_awards(cls):
+        return cls.get_award_candidates is not Badge.get_award_candidates
+
+
+def get_post_candidates(posts, user_ids, recipient_field='author'):
+    """returns pairs (recipient id, post id) for
+    the `Badge.get_award_candidates`"""
+    from askbot.models import Post
+    posts = posts.filter(**{recipient_field + '_id__in': user_ids})
+    return Post, list(posts.order_by('id').values_list(recipient_field + '_id', 'id'))
+
+
+def get_question_of_thread(field):
+    """returns subquery of the ``field`` of the question post
+    in the thread of the post in the outer query"""
+    from askbot.models import Post
+    questions = Post.objects.filter(thread=OuterRef('thread'), post_type='question')
+    return Subquery(questions.values(field)[:1])
+
 
 class Disciplined(Badge):
     key = 'disciplined'
@@ -144,6 +188,14 @@ class Disciplined(Badge):
                 askbot_settings.DISCIPLINED_BADGE_MIN_UPVOTES:
             return self.award(actor, context_object, timestamp)
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post
+        posts = Post.objects.filter(
+            deleted=True, deleted_by=F('author'),
+            points__gte=askbot_settings.DISCIPLINED_BADGE_MIN_UPVOTES
+        )
+        return get_post_candidates(posts, user_ids)
+
 
 class PeerPressure(Badge):
     key = 'peer-pressure'
@@ -164,9 +216,18 @@ class PeerPressure(Badge):
             return self.award(actor, context_object, timestamp)
         return False
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post
+        posts = Post.objects.filter(
+            deleted=True, deleted_by=F('author'),
+            points__lte=-1 * askbot_settings.PEER_PRESSURE_BADGE_MIN_DOWNVOTES
+        )
+        return get_post_candidates(posts, user_ids)
+
 
 class Teacher(Badge):
     key = 'teacher'
+    coalesce_by = 'object'
 
     def __init__(self):
         description = _(
@@ -187,6 +248,14 @@ class Teacher(Badge):
             return self.award(context_object.author, context_object, timestamp)
         return False
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post
+        posts = Post.objects.filter(
+            post_type='answer', deleted=False,
+            points__gte=askbot_settings.TEACHER_BADGE_MIN_UPVOTES
+        )
+        return get_post_candidates(posts, user_ids)
+
 
 class FirstVote(Badge):
     """this badge is not awarded directly, but through
@@ -205,10 +274,19 @@ class FirstVote(Badge):
             return False
         return self.award(actor, context_object, timestamp)
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post, Vote
+        votes = Vote.objects.filter(
+            user_id__in=user_ids, vote=self.vote_type,
+            voted_post__post_type__in=('question', 'answer')
+        )
+        return Post, list(votes.order_by('id').values_list('user_id', 'voted_post_id'))
+
 
 class Supporter(FirstVote):
     """first upvote"""
     key = 'supporter'
+    vote_type = 1
 
     def __new__(cls):
         self = super(Supporter, cls).__new__(cls)
@@ -220,6 +298,7 @@ class Supporter(FirstVote):
 class Critic(FirstVote):
     """like supporter, but for downvote"""
     key = 'critic'
+    vote_type = -1
 
     def __new__(cls):
         self = super(Critic, cls).__new__(cls)
@@ -231,6 +310,7 @@ class Critic(FirstVote):
 class CivicDuty(Badge):
     """awarded once after a certain number of votes"""
     key = 'civic-duty'
+    coalesce_by = 'actor'
 
     def __init__(self):
         min_votes = askbot_settings.CIVIC_DUTY_BADGE_MIN_VOTES
@@ -247,6 +327,13 @@ class CivicDuty(Badge):
             return self.award(actor, obj, timestamp)
         return False
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post, Vote
+        voters = Vote.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+            vote_count=Count('id'), last_post_id=Max('voted_post_id')
+        ).filter(vote_count__gte=askbot_settings.CIVIC_DUTY_BADGE_MIN_VOTES)
+        return Post, list(voters.values_list('user_id', 'last_post_id'))
+
 
 class SelfLearner(Badge):
     key = 'self-learner'
@@ -271,6 +358,17 @@ class SelfLearner(Badge):
         if question.author_id == answer.author_id and answer.points >= min_upvotes:
             self.award(context_object.author, context_object, timestamp)
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post
+        posts = Post.objects.annotate(
+            question_author_id=get_question_of_thread('author_id')
+        ).filter(
+            post_type='answer', deleted=False,
+            points__gte=askbot_settings.SELF_LEARNER_BADGE_MIN_UPVOTES,
+            author_id=F('question_author_id')
+        )
+        return get_post_candidates(posts, user_ids)
+
 
 class QualityPost(Badge):
     """Generic Badge for Nice/Good/Great Question or Answer
@@ -283,6 +381,7 @@ class QualityPost(Badge):
     * key, name, description, level and multiple - as intended in the Badge
     """
     key = 'quality-post'
+    coalesce_by = 'object'
 
     def __init__(self):
         super(QualityPost, self).__init__(
@@ -296,6 +395,13 @@ class QualityPost(Badge):
             return self.award(context_object.author, context_object, timestamp)
         return False
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post
+        posts = Post.objects.filter(
+            post_type=self.post_type, deleted=False, points__gte=self.min_votes
+        )
+        return get_post_candidates(posts, user_ids)
+
 
 class NiceAnswer(QualityPost):
     key = 'nice-answer'
@@ -425,6 +531,7 @@ class FrequentedQuestion(Badge):
     * key, name, description and level and multiple - as intended in the Badge
     """
     key = 'frequented-question'
+    coalesce_by = 'object'
 
     def __init__(self):
         super(FrequentedQuestion, self).__init__(
@@ -438,6 +545,14 @@ class FrequentedQuestion(Badge):
             return self.award(context_object.author, context_object, timestamp)
         return False
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post
+        posts = Post.objects.filter(
+            post_type='question', deleted=False,
+            thread__view_count__gte=self.min_views
+        )
+        return get_post_candidates(posts, user_ids)
+
 
 class PopularQuestion(FrequentedQuestion):
     key = 'popular-question'
@@ -508,6 +623,16 @@ class Scholar(Badge):
             return False
         return self.award(actor, context_object, timestamp)
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post
+        posts = Post.objects.annotate(
+            question_author_id=get_question_of_thread('author_id')
+        ).filter(
+            post_type='answer', endorsed=True,
+            endorsed_by_id=F('question_author_id')
+        )
+        return get_post_candidates(posts, user_ids, recipient_field='endorsed_by')
+
 
 class VotedAcceptedAnswer(Badge):
     """superclass for Enlightened and Guru badges
@@ -516,6 +641,7 @@ class VotedAcceptedAnswer(Badge):
     Subclasses must define __new__ function
     """
     key = 'voted-accepted-answer'
+    coalesce_by = 'object'
 
     def __init__(self):
         super(VotedAcceptedAnswer, self).__init__(
@@ -529,6 +655,14 @@ class VotedAcceptedAnswer(Badge):
         if answer.points >= self.min_votes and answer.endorsed:
             return self.award(answer.author, answer, timestamp)
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post
+        posts = Post.objects.filter(
+            post_type='answer', deleted=False,
+            endorsed=True, points__gte=self.min_votes
+        )
+        return get_post_candidates(posts, user_ids)
+
 
 class Enlightened(VotedAcceptedAnswer):
     key = 'enlightened'
@@ -566,6 +700,7 @@ class Guru(VotedAcceptedAnswer):
 
 class Necromancer(Badge):
     key = 'necromancer'
+    coalesce_by = 'object'
 
     def __init__(self):
         days = askbot_settings.NECROMANCER_BADGE_MIN_DELAY
@@ -594,6 +729,18 @@ class Necromancer(Badge):
             return self.award(answer.author, answer, timestamp)
         return False
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post
+        delta = datetime.timedelta(askbot_settings.NECROMANCER_BADGE_MIN_DELAY)
+        posts = Post.objects.annotate(
+            question_added_at=get_question_of_thread('added_at')
+        ).filter(
+            post_type='answer', deleted=False,
+            points__gte=askbot_settings.NECROMANCER_BADGE_MIN_UPVOTES,
+            added_at__gte=F('question_added_at') + delta
+        )
+        return get_post_candidates(posts, user_ids)
+
 
 class CitizenPatrol(Badge):
     key = 'citizen-patrol'
@@ -637,6 +784,7 @@ class EditorTypeBadge(Badge):
     via __new__ function
     """
     key = 'editor-type-badge'
+    coalesce_by = 'actor'
 
     def __init__(self):
         super(EditorTypeBadge, self).__init__(
@@ -651,7 +799,7 @@ class EditorTypeBadge(Badge):
         )
         filters = {'user': actor, 'activity_type__in': atypes}
         from askbot.models.user import Activity
-        if Activity.objects.filter(**filters).count() == self.min_edits:
+        if Activity.objects.filter(**filters).count() >= self.min_edits:
             return self.award(actor, context_object, timestamp)
 
 
@@ -692,6 +840,7 @@ class Organizer(Badge):
 
 class Autobiographer(Badge):
     key = 'autobiographer'
+    coalesce_by = 'object'
 
     def __init__(self):
         super(Autobiographer, self).__init__(
@@ -711,6 +860,7 @@ class FavoriteTypeBadge(Badge):
     must provide min_stars property for the badge
     """
     key = 'favorite-type-badge'
+    coalesce_by = 'object'
 
     def __init__(self):
         description = _(
@@ -730,10 +880,25 @@ class FavoriteTypeBadge(Badge):
         count = Fave.objects.filter(thread=question.thread)\
             .exclude(user=question.author)\
             .count()
-        if count == self.min_stars:
+        if count >= self.min_stars:
             return self.award(question.author, question, timestamp)
         return False
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post
+        from askbot.models.question import FavoriteQuestion as Fave  # name collision
+        faves = Fave.objects.filter(
+            thread=OuterRef('thread')
+        ).exclude(
+            user=OuterRef('author')
+        ).values('thread').annotate(count=Count('id')).values('count')
+        posts = Post.objects.annotate(
+            fave_count=Subquery(faves[:1])
+        ).filter(
+            post_type='question', deleted=False, fave_count__gte=self.min_stars
+        )
+        return get_post_candidates(posts, user_ids)
+
 
 class StellarQuestion(FavoriteTypeBadge):
     key = 'stellar-question'
@@ -762,6 +927,7 @@ class Enthusiast(Badge):
     for a certain number of days in a row
     """
     key = 'enthusiast'
+    coalesce_by = 'actor'
 
     def __init__(self):
         super(Enthusiast, self).__init__(
@@ -775,16 +941,25 @@ class Enthusiast(Badge):
 
     def consider_award(self, actor=None, context_object=None, timestamp=None):
         min_days = askbot_settings.ENTHUSIAST_BADGE_MIN_DAYS
-        if actor.consecutive_days_visit_count == min_days:
+        if actor.consecutive_days_visit_count >= min_days:
             return self.award(actor, context_object, timestamp)
         return False
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import User
+        users = User.objects.filter(
+            id__in=user_ids,
+            askbot_profile__consecutive_days_visit_count__gte=askbot_settings.ENTHUSIAST_BADGE_MIN_DAYS
+        )
+        return User, list(users.order_by('id').values_list('id', 'id'))
+
 
 class Commentator(Badge):
     """Commentator is a bronze badge that is
     awarded once when user posts a certain number of
     comments"""
     key = 'commentator'
+    coalesce_by = 'actor'
 
     def __init__(self):
         super(Commentator, self).__init__(
@@ -801,9 +976,19 @@ class Commentator(Badge):
             return self.award(actor, context_object, timestamp)
         return False
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Post
+        authors = Post.objects.get_comments().filter(
+            author_id__in=user_ids
+        ).values('author_id').annotate(
+            comment_count=Count('id'), last_comment_id=Max('id')
+        ).filter(comment_count__gte=askbot_settings.COMMENTATOR_BADGE_MIN_COMMENTS)
+        return Post, list(authors.values_list('author_id', 'last_comment_id'))
+
 
 class Taxonomist(Badge):
     key = 'taxonomist'
+    coalesce_by = 'object'
 
     def __init__(self):
         super(Taxonomist, self).__init__(
@@ -817,13 +1002,22 @@ class Taxonomist(Badge):
     def consider_award(self, actor=None, context_object=None, timestamp=None):
         tag = context_object
         taxonomist_threshold = askbot_settings.TAXONOMIST_BADGE_MIN_USE_COUNT
-        if tag.used_count == taxonomist_threshold:
+        if tag.used_count >= taxonomist_threshold:
             return self.award(tag.created_by, tag, timestamp)
         return False
 
+    def get_award_candidates(self, user_ids):
+        from askbot.models import Tag
+        tags = Tag.objects.filter(
+            created_by_id__in=user_ids,
+            used_count__gte=askbot_settings.TAXONOMIST_BADGE_MIN_USE_COUNT
+        )
+        return Tag, list(tags.order_by('id').values_list('created_by_id', 'id'))
+
 
 class RapidResponder(Badge):
     key = 'rapid-responder'
+    coalesce_by = 'object'
 
     def __init__(self):
         description = _('Responded to question within %(max_delay)s hours') % {
@@ -992,15 +1186,168 @@ award_badges_signal = Signal(providing_args=[
 def award_badges(event=None, actor=None,
                  context_object=None, timestamp=None, **kwargs):
     """function that is called when signal `award_badges_signal` is sent
+
+    When the `ASKBOT_BADGE_EVALUATION_DEFERRED` setting is on,
+    the event is only queued, see `evaluate_badge_events`
     """
     try:
         consider_badges = EVENTS_TO_BADGES[event]
     except KeyError:
         raise NotImplementedError('event "%s" is not implemented' % event)
 
+    if not consider_badges:
+        return
+
+    if django_settings.ASKBOT_BADGE_EVALUATION_DEFERRED:
+        from askbot.models.repute import BadgeEvent
+        BadgeEvent.objects.record(event, actor, context_object, timestamp)
+        return
+
     for badge in consider_badges:
         badge_instance = badge()
         if badge_instance.is_enabled():
             badge_instance.consider_award(actor, context_object, timestamp)
 
 award_badges_signal.connect(award_badges)
+
+
+def get_coalescing_key(badge, event):
+    if badge.coalesce_by == 'actor':
+        return (badge.key, event.actor_id)
+    if badge.coalesce_by == 'object':
+        return (badge.key, event.content_type_id, event.object_id)
+    return (badge.key, event.actor_id, event.content_type_id, event.object_id)
+
+
+def evaluate_badge_events(events):
+    """considers the awards for the queued `BadgeEvent` records,
+    each badge is considered once for the events
+    with the same coalescing key, see `Badge.coalesce_by`.
+    Badge instances, their settings and stored data are
+    reused for all events.
+
+    Returns number of the considered awards.
+    """
+    badges = dict()  # badge key -> instance or None if disabled
+    considered = set()
+    for event in events:
+        for badge_class in EVENTS_TO_BADGES.get(event.event, ()):
+            if badge_class.key not in badges:
+                if badge_class.is_enabled():
+                    badges[badge_class.key] = badge_class()
+                else:
+                    badges[badge_class.key] = None
+            badge = badges[badge_class.key]
+            if badge is None:
+                continue
+            key = get_coalescing_key(badge, event)
+            if key in considered:
+                continue
+            considered.add(key)
+            badge.consider_award(event.actor, event.content_object, event.timestamp)
+    return len(considered)
+
+
+def recompute_awards(badge, user_ids, timestamp=None):
+    """gives the awards of the badge deserved by the users with
+    the ``user_ids`` and not given yet, see `Badge.get_award_candidates`.
+    Awards and their activities are inserted in bulk,
+    the users are not notified with messages.
+
+    Returns set of ids of the awarded users or `None`,
+    if the badge cannot be recomputed in bulk.
+    Badge counts of the users must be updated
+    with `recount_badges` afterwards.
+    """
+    from askbot.models import Activity, ActivityAuditStatus, Award, BadgeData
+    from askbot.models.user import get_moderation_items_cache_key
+    result = badge.get_award_candidates(user_ids)
+    if result is None:
+        return None
+    model, candidates = result
+    content_type = ContentType.objects.get_for_model(model)
+    timestamp = timestamp or timezone.now()
+
+    data = badge.get_stored_data()
+    awards = Award.objects.filter(badge=data, user_id__in=user_ids)
+    new_awards = list()
+    if badge.multiple:
+        given = set(awards.filter(content_type=content_type).values_list('user_id', 'object_id'))
+        for candidate in candidates:
+            if candidate not in given:
+                given.add(candidate)
+                new_awards.append(candidate)
+    else:
+        awarded_user_ids = set(awards.values_list('user_id', flat=True))
+        for user_id, object_id in candidates:
+            if user_id not in awarded_user_ids:
+                awarded_user_ids.add(user_id)
+                new_awards.append((user_id, object_id))
+
+    if not new_awards:
+        return set()
+
+    Award.objects.bulk_create([
+        Award(user_id=user_id, badge=data, content_type=content_type,
+              object_id=object_id, awarded_at=timestamp)
+        for user_id, object_id in new_awards
+    ], batch_size=500)
+    BadgeData.objects.filter(id=data.id).update(
+        awarded_count=F('awarded_count') + len(new_awards)
+    )
+
+    # primary keys are not set by the bulk_create on all databases
+    awarded_user_ids = set(user_id for user_id, _ in new_awards)
+    award_ids = Award.objects.filter(
+        badge=data, awarded_at=timestamp, user_id__in=awarded_user_ids
+    ).values_list('id', 'user_id')
+    award_content_type = ContentType.objects.get_for_model(Award)
+    Activity.objects.bulk_create([
+        Activity(user_id=user_id, active_at=timestamp,
+                 content_type=award_content_type, object_id=award_id,
+                 activity_type=const.TYPE_ACTIVITY_PRIZE)
+        for award_id, user_id in award_ids
+    ], batch_size=500)
+    activities = Activity.objects.filter(
+        activity_type=const.TYPE_ACTIVITY_PRIZE,
+        content_type=award_content_type,
+        object_id__in=[award_id for award_id, _ in award_ids]
+    ).values_list('id', 'user_id')
+    ActivityAuditStatus.objects.bulk_create([
+        ActivityAuditStatus(activity_id=activity_id, user_id=user_id)
+        for activity_id, user_id in activities
+    ], batch_size=500)
+    cache.delete_many([
+        get_moderation_items_cache_key(user_id) for user_id in awarded_user_ids
+    ])
+    return awarded_user_ids
+
+
+def recount_badges(user_ids):
+    """sets the numbers of the gold, silver and bronze
+    badges of the users with the ``user_ids`` from
+    the counts of their awards of the enabled badges"""
+    from askbot.models import Award
+    from askbot.models.user_profile import UserProfile
+    levels = dict()  # badge key -> level or None if disabled
+    for key, badge_class in BADGES.items():
+        levels[key] = badge_class().level if badge_class.is_enabled() else None
+
+    counts = dict((user_id, collections.Counter()) for user_id in user_ids)
+    awards = Award.objects.filter(user_id__in=user_ids).values_list(
+        'user_id', 'badge__slug'
+    ).annotate(count=Count('id'))
+    for user_id, badge_key, count in awards:
+        level = levels.get(badge_key)
+        if level is not None:
+            counts[user_id][level] += count
+
+    profiles = list(UserProfile.objects.filter(auth_user_ptr_id__in=user_ids))
+    for profile in profiles:
+        level_counts = counts[profile.pk]
+        profile.gold = level_counts[const.GOLD_BADGE]
+        profile.silver = level_counts[const.SILVER_BADGE]
+        profile.bronze = level_counts[const.BRONZE_BADGE]
+    UserProfile.objects.bulk_update(profiles, ['gold', 'silver', 'bronze'], batch_size=500)
+
+    cache.delete_many([get_profile_cache_key(profile) for profile in profiles])
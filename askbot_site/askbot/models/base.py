@@ -5,6 +5,14 @@ from django.utils.html import strip_tags
 from askbot.conf import settings as askbot_settings
 from askbot.utils.markup import convert_text
 
+
+def format_id_list(ids):
+    """returns ids as a comma-separated string
+    with the leading and trailing commas, e.g. ",3,14,15,"
+    """
+    return ',' + ''.join('%d,' % item_id for item_id in sorted(ids))
+
+
 class BaseQuerySetManager(models.Manager):
     """Base class for chainable custom filters on the query sets.
 
@@ -1,3 +1,5 @@
+import bisect
+import hashlib
 from collections import defaultdict
 import operator
 import logging
@@ -6,6 +8,7 @@ from django.contrib.sitemaps import ping_google
 from django.conf import settings as django_settings
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models.functions import Greatest
 from django.utils import html as html_utils
 from django.utils import timezone
 from django.utils.text import Truncator
@@ -25,9 +28,9 @@ from askbot import signals
 from askbot.utils.loading import load_plugin, load_function
 from askbot.utils.slug import slugify
 from askbot import const
-from askbot.models.tag import MarkedTag
-from askbot.models.tag import tags_match_some_wildcard
+from askbot.models.tag import MarkedTag, MarkedWildcardTag
 from askbot.models.fields import LanguageCodeField
+from askbot.search import title_index
 from askbot.conf import settings as askbot_settings
 from askbot import exceptions
 from askbot.utils import markup
@@ -341,6 +344,139 @@ class PostManager(BaseQuerySetManager):
         #            return comments
 
 
+    def precache_revisions(self, for_posts):
+        """
+        Fetches the earliest and the latest published revisions
+        of the given posts in two queries and caches them on the posts,
+        so that calls to `Post.get_earliest_revision` and
+        `Post.get_latest_revision` without the visitor do not hit the database.
+        """
+        post_map = dict((post.id, post) for post in for_posts)
+        rev_ids = PostRevision.objects\
+            .filter(post__id__in=list(post_map.keys()))\
+            .exclude(revision=0)\
+            .values('post_id')\
+            .annotate(first_id=models.Min('id'), last_id=models.Max('id'))
+        rev_ids = list(rev_ids)
+
+        revision_ids = set()
+        for item in rev_ids:
+            revision_ids.update((item['first_id'], item['last_id']))
+        revisions = PostRevision.objects.select_related('author')\
+                                        .in_bulk(list(revision_ids))
+
+        for item in rev_ids:
+            post = post_map[item['post_id']]
+            first_rev = revisions[item['first_id']]
+            last_rev = revisions[item['last_id']]
+            first_rev.post = post
+            last_rev.post = post
+            post._first_rev_cache = first_rev
+            post.cache_latest_revision(last_rev)
+
+
+class PostSearchResults(object):
+    """Posts matching the moderator search, browsed by id.
+
+    Ids of up to `MAX_CACHED_IDS` matching posts are cached,
+    so that the ordinals and the neighbours of the posts are looked up
+    in memory. Larger result sets are browsed with the keyset
+    queries, the total count and the ordinals of the neighbours
+    of the visited posts are cached.
+    """
+    MAX_CACHED_IDS = 20000
+    POST_TYPES = ('question', 'answer', 'comment')
+
+    def __init__(self, query_string):
+        self.query_string = query_string
+        posts = Post.objects.filter(post_type__in=self.POST_TYPES)
+        if query_string:
+            if 'postgresql_psycopg2' in askbot.get_database_engine_name():
+                from askbot.search import postgresql
+                posts = postgresql.run_post_search(posts, query_string)
+            else:
+                posts = posts.filter(text__icontains=query_string)
+        self.posts = posts.order_by('id')
+        # PostgreSQL matches the text with the configuration of the language
+        key = '%s-%s' % (get_language(), query_string)
+        query_hash = hashlib.md5(key.encode('utf-8')).hexdigest()
+        self.cache_key = 'askbot-post-search-' + query_hash
+        self.timeout = django_settings.ASKBOT_SEARCH_POSTS_CACHE_TIMEOUT
+        self.ids, self.count = self.get_ids_and_count()
+
+    def get_ids_and_count(self):
+        """returns the cached list of ids of the matching posts,
+        or ``None`` if there are too many, and the number of posts"""
+        data = cache.cache.get(self.cache_key)
+        if data is None:
+            ids = list(
+                self.posts.values_list('id', flat=True)[:self.MAX_CACHED_IDS + 1]
+            )
+            if len(ids) > self.MAX_CACHED_IDS:
+                data = (None, self.posts.count())
+            else:
+                data = (ids, len(ids))
+            cache.cache.set(self.cache_key, data, self.timeout)
+        return data
+
+    def get_ordinal_cache_key(self, post_id):
+        return '%s-%d' % (self.cache_key, post_id)
+
+    def get_ordinal(self, post_id):
+        """returns position of the post among the matching
+        posts, starting from 1, ``None`` if the post does not match"""
+        if self.ids is not None:
+            idx = bisect.bisect_left(self.ids, post_id)
+            if idx < len(self.ids) and self.ids[idx] == post_id:
+                return idx + 1
+            return None
+        ordinal = cache.cache.get(self.get_ordinal_cache_key(post_id))
+        if ordinal is None:
+            ordinal = self.posts.filter(id__lt=post_id).count() + 1
+        return ordinal
+
+    def set_ordinal(self, post_id, ordinal):
+        if self.ids is None:
+            cache.cache.set(self.get_ordinal_cache_key(post_id), ordinal, self.timeout)
+
+    def get_post_id(self, ordinal):
+        """returns id of the post at the position, or ``None``"""
+        if ordinal < 1 or ordinal > self.count:
+            return None
+        if self.ids is not None:
+            return self.ids[ordinal - 1]
+        post_ids = self.posts.values_list('id', flat=True)[ordinal - 1:ordinal]
+        return post_ids[0] if post_ids else None
+
+    def get_post(self, post_id=None, ordinal=None):
+        """returns post by id or by the ordinal, or the first
+        matching post, ``None`` if there is no such matching post"""
+        if post_id is None:
+            post_id = self.get_post_id(ordinal or 1)
+        elif self.ids is not None and self.get_ordinal(post_id) is None:
+            return None
+        if post_id is None:
+            return None
+        return self.posts.filter(id=post_id).first()
+
+    def get_neighbour_ids(self, post_id, ordinal):
+        """returns ids of the previous and the next matching
+        posts, ``None`` in place of the missing ones"""
+        if self.ids is not None:
+            prev_id = self.ids[ordinal - 2] if ordinal > 1 else None
+            next_id = self.ids[ordinal] if ordinal < len(self.ids) else None
+            return prev_id, next_id
+
+        prev_id = self.posts.filter(id__lt=post_id).order_by('-id').values_list('id', flat=True).first()
+        next_id = self.posts.filter(id__gt=post_id).values_list('id', flat=True).first()
+        # ordinals of the posts the moderator will likely visit next
+        if prev_id is not None:
+            self.set_ordinal(prev_id, ordinal - 1)
+        if next_id is not None:
+            self.set_ordinal(next_id, ordinal + 1)
+        return prev_id, next_id
+
+
 class MockPost(object):
     """Used for special purposes, e.g. to fill
     out the js templates for the posts made via ajax
@@ -466,6 +602,17 @@ class Post(models.Model):
         app_label = 'askbot'
         db_table = 'askbot_post'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super(Post, cls).from_db(db, field_names, values)
+        if not django_settings.ASKBOT_TITLE_INDEX_ENABLED:
+            return post
+        # remember the loaded values, to tell if the
+        # title index must be updated when the question is saved
+        if post.__dict__.get('post_type') == 'question':
+            post._loaded_title_index_key = title_index.get_indexed_key(post)
+        return post
+
     # property to support legacy themes in case there are.
     @property
     def score(self):
@@ -643,6 +790,35 @@ class Post(models.Model):
         number of comments in the database"""
         self.comment_count = self.comments.filter(deleted=False, approved=True).count()
 
+    def change_vote_counts(self, up_votes=0, down_votes=0):
+        """adds the votes to the denormalized vote counts and the points
+        with the atomic updates, so that the concurrent votes are not lost,
+        and reloads the values into the instance. The post is not saved,
+        the points of the question are copied to the thread
+        and to its listing record.
+
+        Upvotes of the comments only change the points.
+        """
+        from askbot.models.question import Thread, ThreadListing
+        updates = {'points': models.F('points') + up_votes - down_votes}
+        if up_votes and not self.is_comment():
+            updates['vote_up_count'] = Greatest(models.F('vote_up_count') + up_votes, 0)
+        if down_votes:
+            updates['vote_down_count'] = Greatest(models.F('vote_down_count') + down_votes, 0)
+
+        posts = Post.objects.filter(pk=self.pk)
+        posts.update(**updates)
+        counts = posts.values('points', 'vote_up_count', 'vote_down_count').get()
+        for name, value in counts.items():
+            setattr(self, name, value)
+
+        if self.is_question():
+            points = models.Subquery(posts.values('points'))
+            Thread.objects.filter(pk=self.thread_id).update(points=points)
+            if ThreadListing.objects.is_enabled():
+                ThreadListing.objects.filter(thread_id=self.thread_id).update(points=points)
+            self.thread.points = self.points
+
     def is_question(self):
         return self.post_type == 'question'
 
@@ -851,17 +1027,16 @@ class Post(models.Model):
         update_activity.add_recipients(notify_sets['for_inbox'])
 
         # create new mentions (barring the double-adds)
-        from askbot.models import Activity
-        for u in notify_sets['for_mentions'] - notify_sets['for_inbox']:
-            Activity.objects.create_new_mention(
-                                    mentioned_whom=u,
-                                    mentioned_in=self,
-                                    mentioned_by=updated_by,
-                                    mentioned_at=timestamp
-                                )
+        Activity.objects.create_new_mentions(
+                                mentioned_whom=notify_sets['for_mentions'] - notify_sets['for_inbox'],
+                                mentioned_in=self,
+                                mentioned_by=updated_by,
+                                mentioned_at=timestamp
+                            )
 
-        for user in (notify_sets['for_inbox'] | notify_sets['for_mentions']):
-            user.update_response_counts()
+        from askbot.models.user import update_response_counts
+        recipients = notify_sets['for_inbox'] | notify_sets['for_mentions']
+        update_response_counts([user.id for user in recipients])
 
         # shortcircuit if the email alerts are disabled
         if suppress_email or not askbot_settings.ENABLE_EMAIL_ALERTS:
@@ -1302,40 +1477,25 @@ class Post(models.Model):
         )
 
         # part 2 - find users who follow or not ignore tags via wildcard selections
-        # inside there is a potentially time consuming loop
+        # the users are looked up by prefixes of the tag names
+        # in the index of the wildcards, see MarkedWildcardTag
         if askbot_settings.USE_WILDCARD_TAGS:
-            # TODO: fix this
-            # this branch will not scale well
-            # because we have to loop through the list of users
-            # in python
-            if tag_mark_reason == 'good':
-                empty_wildcard_filter = {'askbot_profile__interesting_tags__exact': ''}
-                wildcard_tags_attribute = 'interesting_tags'
-                update_subscribers = lambda the_set, item: the_set.add(item)
-            elif tag_mark_reason == 'bad':
-                empty_wildcard_filter = {'askbot_profile__ignored_tags__exact': ''}
-                wildcard_tags_attribute = 'ignored_tags'
+            if tag_mark_reason == 'bad':
                 update_subscribers = lambda the_set, item: the_set.discard(item)
-            elif tag_mark_reason == 'subscribed':
-                empty_wildcard_filter = {'askbot_profile__subscribed_tags__exact': ''}
-                wildcard_tags_attribute = 'subscribed_tags'
+            else:
                 update_subscribers = lambda the_set, item: the_set.add(item)
 
-            potential_wildcard_subscribers = User.objects.filter(
+            wildcard_user_ids = MarkedWildcardTag.objects.get_user_ids_for_tag_names(
+                tag_names, reason=tag_mark_reason
+            )
+            wildcard_subscribers = User.objects.filter(
                 notification_subscriptions__in=subscription_records
             ).filter(
-                askbot_profile__email_tag_filter_strategy=email_tag_filter_strategy
-            ).exclude(
-                **empty_wildcard_filter  # need this to limit size of the loop
+                askbot_profile__email_tag_filter_strategy=email_tag_filter_strategy,
+                id__in=wildcard_user_ids
             )
-            for potential_subscriber in potential_wildcard_subscribers:
-                wildcard_tags = getattr(
-                    potential_subscriber,
-                    wildcard_tags_attribute
-                ).split(' ')
-
-                if tags_match_some_wildcard(tag_names, wildcard_tags):
-                    update_subscribers(subscribers, potential_subscriber)
+            for wildcard_subscriber in wildcard_subscribers:
+                update_subscribers(subscribers, wildcard_subscriber)
 
         return subscribers
 
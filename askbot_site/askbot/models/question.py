@@ -1,17 +1,22 @@
 import collections
 import datetime
+import hashlib
 import logging
+import math
 import operator
 import regex as re
+import time
 
 from copy import copy
 from django.conf import settings as django_settings
-from django.db import models
+from django.db import models, transaction
 from django.db.models import F, Q
+from django.db.models import Case, FloatField, Sum, Value, When
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.core import cache  # import cache, not from cache import cache, to be able to monkey-patch cache.cache in test cases
 from django.core import exceptions as django_exceptions
+from django.core.paginator import Page, Paginator
 from django.template.loader import get_template
 from django.template import Context
 from django.utils.translation import ugettext as _
@@ -20,27 +25,44 @@ from django.utils import timezone
 
 import askbot
 from askbot.conf import settings as askbot_settings
+from askbot.conf.settings_wrapper import get_settings_generation
 from askbot import mail
 from askbot.mail import messages
-from askbot.models.tag import Tag, TagSynonym
+from askbot.models.tag import Tag, TagSynonym, RelatedTagCount
+from askbot.models.tag import RELATED_TAGS_MAX_SELECTED
 from askbot.models.tag import get_tags_by_names
 from askbot.models.tag import filter_accepted_tags, filter_suggested_tags
 from askbot.models.tag import separate_unused_tags
 from askbot.models.base import BaseQuerySetManager
 from askbot.models.base import DraftContent, AnonymousContent
+from askbot.models.base import format_id_list
 from askbot.models.user import Activity, Group, PERSONAL_GROUP_NAME_PREFIX
 from askbot.models.fields import LanguageCodeField
 from askbot import signals
 from askbot import const
+from askbot.utils.celery_utils import defer_celery_task
 from askbot.utils.lists import LazyList
 from askbot.utils.loading import load_plugin
 from askbot.search import mysql
+from askbot.search import profiling
+from askbot.search import title_index
 from askbot.utils.slug import slugify
 from askbot.utils import translation as translation_utils
 from askbot.search.state_manager import DummySearchState
 
 LOG = logging.getLogger(__name__)
 
+SIMILAR_THREADS_COUNT = 10
+RELATED_TAGS_COUNT = 50
+# related tags kept before dropping the ignored ones
+RELATED_TAG_CANDIDATES = 100
+# most similar threads, whose lists may include the retagged thread
+SIMILAR_THREAD_CANDIDATES = 100
+# ids of the found threads cached per search, later pages are not cached
+SEARCH_RESULTS_MAX_IDS = 500
+SEARCH_GENERATION_CACHE_KEY = 'askbot-search-generation'
+SEARCH_VECTORS_REBUILD_CACHE_KEY = 'askbot-search-vectors-rebuild'
+
 
 def clean_tagnames(tagnames):
     """Cleans tagnames string so that the field fits the constraint of the
@@ -80,6 +102,52 @@ def default_title_renderer(thread):
         return thread.title
 
 
+QUESTION_ORDER_BY_MAP = {
+    'age-desc': '-added_at',
+    'age-asc': 'added_at',
+    'activity-desc': '-last_activity_at',
+    'activity-asc': 'last_activity_at',
+    'answers-desc': '-answer_count',
+    'answers-asc': 'answer_count',
+    'votes-desc': '-points',
+    'votes-asc': 'points',
+
+    'relevance-desc': '-relevance', # special Postgresql-specific ordering, 'relevance' quaso-column is added by get_for_query()
+}
+
+
+def get_tag_filter(tag_ids):
+    """returns filter matching threads with any of the tags,
+    a subquery of the thread-tag table, served by its tag index"""
+    thread_tags = Thread.tags.through.objects.filter(tag_id__in=tag_ids) #pylint: disable=no-member
+    return Q(id__in=thread_tags.values('thread_id'))
+
+
+def get_group_filter(group_ids):
+    """returns filter matching threads shared with
+    any of the groups, a subquery of the thread-group table"""
+    thread_groups = ThreadToGroup.objects.filter(group_id__in=group_ids)
+    return Q(id__in=thread_groups.values('thread_id'))
+
+
+def get_summary_cache_key(thread_id, lang=None):
+    """returns cache key of the thread summary html"""
+    lang = lang or get_language()
+    return 'thread-question-summary-%d-%s' % (thread_id, lang)
+
+
+def get_similar_threads_cache_key(thread_id):
+    return 'similar-threads-%s' % thread_id
+
+def get_epoch():
+    """returns beginning of the unix epoch,
+    timezone aware if the `USE_TZ` setting is on"""
+    epoch = datetime.datetime(1970, 1, 1)
+    if django_settings.USE_TZ:
+        return timezone.make_aware(epoch, datetime.timezone.utc)
+    return epoch
+
+
 class ThreadQuerySet(models.query.QuerySet):
 
     def get_visible(self, user):
@@ -252,7 +320,10 @@ class ThreadManager(BaseQuerySetManager):
     #            matching_questions = Question.sphinx_search.query(search_query)
     #            question_ids = [q.id for q in matching_questions]
     #            return qs.filter(posts__post_type='question', posts__deleted=False, posts__self_question_id__in=question_ids)
-            if askbot.get_database_engine_name().endswith('mysql') \
+            from askbot.search import native as native_search
+            if native_search.is_enabled():
+                return native_search.run_thread_search(qs, search_query)
+            elif askbot.get_database_engine_name().endswith('mysql') \
                 and mysql.supports_full_text_search():
                 return qs.filter(
                     models.Q(title__search=search_query) |
@@ -269,30 +340,257 @@ class ThreadManager(BaseQuerySetManager):
                     models.Q(posts__deleted=False, posts__text__icontains=search_query)
                 )
 
-    # TODO: !! review, fix, and write tests for this
+    def get_search_tag_names(self, search_state, meta_data):
+        """returns names of the tags by which the threads must be
+        filtered, names of the tags missing in the database
+        are saved in the ``meta_data['non_existing_tags']``
+
+        unified tags - is list of tags taken from the tag selection
+        plus any tags added to the query string with #tag or [tag:something]
+        syntax.
+        """
+        from askbot.conf import settings as askbot_settings  # Avoid circular import
+
+        tags = search_state.unified_tags()
+        meta_data['non_existing_tags'] = list()
+        if len(tags) == 0 or not askbot_settings.TAG_SEARCH_INPUT_ENABLED:
+            return tags
+
+        # TODO: this may be gone or disabled per option
+        # "tag_search_box_enabled"
+        existing_tags = set()
+        non_existing_tags = set()
+        # we're using a one-by-one tag retreival, b/c
+        # we want to take advantage of case-insensitive search indexes
+        # in postgresql, plus it is most likely that there will be
+        # only one or two search tags anyway
+        for tag in tags:
+            try:
+                tag_record = Tag.objects.get(
+                    name__iexact=tag, language_code=get_language())
+                existing_tags.add(tag_record.name)
+            except Tag.DoesNotExist:
+                non_existing_tags.add(tag)
+
+        meta_data['non_existing_tags'] = list(non_existing_tags)
+        return existing_tags
+
+    def get_user_tag_selections(self, request_user, meta_data):
+        """returns a tuple of query sets of tags
+        (interesting, ignored, subscribed) selected by the user
+        and saves names of these tags in the ``meta_data``
+        """
+        from askbot.conf import settings as askbot_settings  # Avoid circular import
+
+        # mark questions tagged with interesting tags
+        # a kind of fancy annotation, would be nice to avoid it
+        lang = get_language()
+        interesting_tags = Tag.objects.filter(
+            user_selections__user=request_user,
+            user_selections__reason='good',
+            language_code=lang)
+        ignored_tags = Tag.objects.filter(
+            user_selections__user=request_user,
+            user_selections__reason='bad',
+            language_code=lang)
+        subscribed_tags = Tag.objects.none()
+        if askbot_settings.SUBSCRIBED_TAG_SELECTOR_ENABLED:
+            subscribed_tags = Tag.objects.filter(
+                user_selections__user=request_user,
+                user_selections__reason='subscribed',
+                language_code=lang)
+            meta_data['subscribed_tag_names'] = [tag.name for tag in subscribed_tags]
+
+        meta_data['interesting_tag_names'] = [tag.name for tag in interesting_tags]
+        meta_data['ignored_tag_names'] = [tag.name for tag in ignored_tags]
+
+        if askbot_settings.USE_WILDCARD_TAGS:
+            meta_data['interesting_tag_names'].extend(request_user.interesting_tags.split())
+            meta_data['ignored_tag_names'].extend(request_user.ignored_tags.split())
+
+        return interesting_tags, ignored_tags, subscribed_tags
+
+    def get_language_filter(self, request_user, prefix=''):
+        """returns filter of the threads by the language mode,
+        the fields of the `ThreadListing` are used with ``prefix='listing__'``"""
+        lang_mode = askbot.get_lang_mode()
+        if lang_mode == 'url-lang':
+            return {prefix + 'language_code': get_language()}
+        if lang_mode == 'user-lang':
+            if request_user.is_authenticated:
+                language_codes = request_user.get_languages()
+            else:
+                language_codes = list(dict(django_settings.LANGUAGES).keys())
+            return {prefix + 'language_code__in': language_codes}
+        return {}
+
+    def get_unanswered_filter(self, prefix=''):
+        """returns filter of the threads in the "unanswered" scope,
+        the fields of the `ThreadListing` are used with ``prefix='listing__'``"""
+        from askbot.conf import settings as askbot_settings  # Avoid circular import
+        # Do not show closed questions in unanswered section
+        unanswered_filter = Q(**{prefix + 'closed': False})
+        meaning = askbot_settings.UNANSWERED_QUESTION_MEANING
+        if meaning == 'NO_ANSWERS':
+            # TODO: this will introduce a problem if there are private answers
+            # which are counted here
+            return unanswered_filter & Q(**{prefix + 'answer_count': 0})
+        elif meaning == 'NO_ACCEPTED_ANSWERS':
+            if prefix:
+                return unanswered_filter & Q(**{prefix + 'has_accepted_answer': False})
+            return unanswered_filter & Q(accepted_answer__isnull=True)
+        elif meaning == 'NO_UPVOTED_ANSWERS':
+            raise NotImplementedError()
+        else:
+            raise Exception('UNANSWERED_QUESTION_MEANING setting is wrong')
+
+    def get_search_author(self, search_state, meta_data):
+        """returns the author selected in the search state or `None`,
+        saves the author name in the ``meta_data``"""
+        if not search_state.author:
+            return None
+        try:
+            # TODO: maybe support selection by multiple authors
+            author = User.objects.get(id=int(search_state.author))
+        except User.DoesNotExist:
+            meta_data['author_name'] = None
+            return None
+        meta_data['author_name'] = author.username
+        return author
+
+    def run_listing_search(self, request_user, search_state):
+        """same as `run_advanced_search`, but filters and sorts
+        by the denormalized `ThreadListing` records - one per thread,
+        so posts, tags and groups are not joined and
+        the query does not need `DISTINCT`.
+
+        Full text queries and the "followed" scope are not
+        supported, see `ThreadListingManager.can_run_search`
+        """
+        from askbot.conf import settings as askbot_settings  # Avoid circular import
+
+        primary_filter = {'listing__deleted': False}
+        primary_filter.update(self.get_language_filter(request_user, 'listing__'))
+        qs = self.filter(**primary_filter)
+
+        if askbot_settings.CONTENT_MODERATION_MODE == 'premoderation':
+            if request_user.is_authenticated:
+                qs = qs.filter(Q(listing__approved=True) | Q(listing__author_id=request_user.pk))
+            else:
+                qs = qs.filter(listing__approved=True)
+
+        if askbot_settings.GROUPS_ENABLED:
+            if request_user.is_authenticated:
+                group_ids = request_user.get_groups().values_list('id', flat=True)
+            else:
+                group_ids = [Group.objects.get_global_group().id]
+            qs = qs.filter(get_group_filter(group_ids))
+
+        if search_state.query_title:
+            qs = qs.filter(title__icontains=search_state.query_title)
+
+        if search_state.query_users:
+            query_user_ids = User.objects.filter(
+                username__in=search_state.query_users
+            ).values_list('id', flat=True)
+            query_user_ids = list(query_user_ids)
+            if query_user_ids:
+                qs = qs.filter(listing__author_id__in=query_user_ids)
+
+        meta_data = {}
+        tags = self.get_search_tag_names(search_state, meta_data)
+        if tags:
+            tag_ids = collections.defaultdict(list)
+            tag_records = Tag.objects.filter(name__in=tags).values_list('id', 'name')
+            for tag_id, tag_name in tag_records:
+                tag_ids[tag_name].append(tag_id)
+            for tag in tags:
+                # Tags or AND-ed here, not OR-ed (i.e. we fetch only threads with all tags)
+                qs = qs.filter(get_tag_filter(tag_ids[tag]))
+
+        if search_state.scope == 'unanswered':
+            qs = qs.filter(self.get_unanswered_filter('listing__'))
+
+        author = self.get_search_author(search_state, meta_data)
+        if author:
+            qs = qs.filter(listing__author_id=author.id)
+
+        if request_user and request_user.is_authenticated:
+            interesting_tags, ignored_tags, subscribed_tags = \
+                self.get_user_tag_selections(request_user, meta_data)
+
+            strategy = request_user.display_tag_filter_strategy
+            if strategy == const.INCLUDE_INTERESTING and (interesting_tags or request_user.has_interesting_wildcard_tags()):
+                tag_ids = list(interesting_tags.values_list('id', flat=True))
+                if request_user.has_interesting_wildcard_tags():
+                    interesting_wildcards = request_user.interesting_tags.split()
+                    extra_interesting_tags = Tag.objects.get_by_wildcards(interesting_wildcards)
+                    tag_ids.extend(extra_interesting_tags.values_list('id', flat=True))
+                qs = qs.filter(get_tag_filter(tag_ids))
+
+            if strategy == const.EXCLUDE_IGNORED and (ignored_tags or request_user.has_ignored_wildcard_tags()):
+                tag_ids = list(ignored_tags.values_list('id', flat=True))
+                if request_user.has_ignored_wildcard_tags():
+                    ignored_wildcards = request_user.ignored_tags.split()
+                    extra_ignored_tags = Tag.objects.get_by_wildcards(ignored_wildcards)
+                    tag_ids.extend(extra_ignored_tags.values_list('id', flat=True))
+                if tag_ids:
+                    qs = qs.exclude(get_tag_filter(tag_ids))
+
+            if strategy == const.INCLUDE_SUBSCRIBED and subscribed_tags:
+                tag_ids = subscribed_tags.values_list('id', flat=True)
+                qs = qs.filter(get_tag_filter(tag_ids))
+
+        orderby = QUESTION_ORDER_BY_MAP[search_state.sort]
+        if orderby.startswith('-'):
+            qs = qs.order_by('-listing__' + orderby[1:], '-id')
+        else:
+            qs = qs.order_by('listing__' + orderby, 'id')
+
+        qs = qs.only(
+            'id', 'title', 'view_count', 'answer_count', 'last_activity_at',
+            'last_activity_by', 'closed', 'tagnames', 'accepted_answer',
+            'added_at', 'points'
+        )
+        return qs, meta_data
+
     def run_advanced_search(self, request_user, search_state):
         """
         all parameters are guaranteed to be clean
         however may not relate to database - in that case
         a relvant filter will be silently dropped
 
+        Returns a tuple (query set, meta data). If the search
+        is sampled for profiling, the meta data contains the
+        `askbot.search.profiling.SearchProfile` of the search,
+        which is recorded by the `get_questions_page`.
         """
+        uses_listing = ThreadListing.objects.can_run_search(search_state)
+        if uses_listing:
+            run_search = self.run_listing_search
+        else:
+            run_search = self.run_thread_search
+
+        profile = profiling.start_profile(search_state, request_user, uses_listing)
+        if profile is None:
+            return run_search(request_user, search_state)
+
+        with profile.capture_queries():
+            qs, meta_data = run_search(request_user, search_state)
+        meta_data['search_profile'] = profile
+        return qs, meta_data
+
+    # TODO: !! review, fix, and write tests for this
+    def run_thread_search(self, request_user, search_state):
+        """same as `run_advanced_search`, but filters
+        the threads by their posts, tags and groups"""
         from askbot.conf import settings as askbot_settings  # Avoid circular import
 
         primary_filter = {
             'posts__post_type': 'question',
             'posts__deleted': False
         }
-
-        lang_mode = askbot.get_lang_mode()
-        if lang_mode == 'url-lang':
-            primary_filter['language_code'] = get_language()
-        elif lang_mode == 'user-lang':
-            if request_user.is_authenticated:
-                language_codes = request_user.get_languages()
-            else:
-                language_codes = list(dict(django_settings.LANGUAGES).keys())
-            primary_filter['language_code__in'] = language_codes
+        primary_filter.update(self.get_language_filter(request_user))
 
         # TODO: add a possibility to see deleted questions
         qs = self.filter(**primary_filter)
@@ -330,56 +628,15 @@ class ThreadManager(BaseQuerySetManager):
                 qs = qs.filter(posts__post_type='question',
                                posts__author__in=query_users)
 
-        # unified tags - is list of tags taken from the tag selection
-        # plus any tags added to the query string with #tag or [tag:something]
-        # syntax.
-        # run tag search in addition to these unified tags
         meta_data = {}
-        tags = search_state.unified_tags()
-        if len(tags) > 0:
-            if askbot_settings.TAG_SEARCH_INPUT_ENABLED:
-                # TODO: this may be gone or disabled per option
-                # "tag_search_box_enabled"
-                existing_tags = set()
-                non_existing_tags = set()
-                # we're using a one-by-one tag retreival, b/c
-                # we want to take advantage of case-insensitive search indexes
-                # in postgresql, plus it is most likely that there will be
-                # only one or two search tags anyway
-                for tag in tags:
-                    try:
-                        tag_record = Tag.objects.get(
-                            name__iexact=tag, language_code=get_language())
-                        existing_tags.add(tag_record.name)
-                    except Tag.DoesNotExist:
-                        non_existing_tags.add(tag)
-
-                meta_data['non_existing_tags'] = list(non_existing_tags)
-                tags = existing_tags
-            else:
-                meta_data['non_existing_tags'] = list()
-
-            # construct filter for the tag search
-            for tag in tags:
-                # Tags or AND-ed here, not OR-ed (i.e. we fetch only threads with all tags)
-                qs = qs.filter(tags__name=tag)
-        else:
-            meta_data['non_existing_tags'] = list()
+        tags = self.get_search_tag_names(search_state, meta_data)
+        # construct filter for the tag search
+        for tag in tags:
+            # Tags or AND-ed here, not OR-ed (i.e. we fetch only threads with all tags)
+            qs = qs.filter(tags__name=tag)
 
         if search_state.scope == 'unanswered':
-            # Do not show closed questions in unanswered section
-            qs = qs.filter(closed=False)
-            if askbot_settings.UNANSWERED_QUESTION_MEANING == 'NO_ANSWERS':
-                # TODO: this will introduce a problem if there are private answers
-                # which are counted here
-                # TODO: expand for different meanings of this
-                qs = qs.filter(answer_count=0)
-            elif askbot_settings.UNANSWERED_QUESTION_MEANING == 'NO_ACCEPTED_ANSWERS':
-                qs = qs.filter(accepted_answer__isnull=True)
-            elif askbot_settings.UNANSWERED_QUESTION_MEANING == 'NO_UPVOTED_ANSWERS':
-                raise NotImplementedError()
-            else:
-                raise Exception('UNANSWERED_QUESTION_MEANING setting is wrong')
+            qs = qs.filter(self.get_unanswered_filter())
 
         elif search_state.scope == 'followed':
             followed_filter = models.Q(favorited_by=request_user)
@@ -401,40 +658,15 @@ class ThreadManager(BaseQuerySetManager):
             qs = qs.filter(followed_filter)
 
         # user contributed questions & answers
-        if search_state.author:
-            try:
-                # TODO: maybe support selection by multiple authors
-                u = User.objects.get(id=int(search_state.author))
-            except User.DoesNotExist:
-                meta_data['author_name'] = None
-            else:
-                qs = qs.filter(posts__post_type='question', posts__author=u,
-                               posts__deleted=False)
-                meta_data['author_name'] = u.username
+        author = self.get_search_author(search_state, meta_data)
+        if author:
+            qs = qs.filter(posts__post_type='question', posts__author=author,
+                           posts__deleted=False)
 
         # get users tag filters
         if request_user and request_user.is_authenticated:
-            # mark questions tagged with interesting tags
-            # a kind of fancy annotation, would be nice to avoid it
-            lang = get_language()
-            interesting_tags = Tag.objects.filter(
-                user_selections__user=request_user,
-                user_selections__reason='good',
-                language_code=lang)
-            ignored_tags = Tag.objects.filter(
-                user_selections__user=request_user,
-                user_selections__reason='bad',
-                language_code=lang)
-            subscribed_tags = Tag.objects.none()
-            if askbot_settings.SUBSCRIBED_TAG_SELECTOR_ENABLED:
-                subscribed_tags = Tag.objects.filter(
-                    user_selections__user=request_user,
-                    user_selections__reason='subscribed',
-                    language_code=lang)
-                meta_data['subscribed_tag_names'] = [tag.name for tag in subscribed_tags]
-
-            meta_data['interesting_tag_names'] = [tag.name for tag in interesting_tags]
-            meta_data['ignored_tag_names'] = [tag.name for tag in ignored_tags]
+            interesting_tags, ignored_tags, subscribed_tags = \
+                self.get_user_tag_selections(request_user, meta_data)
 
             if request_user.display_tag_filter_strategy == const.INCLUDE_INTERESTING and (interesting_tags or request_user.has_interesting_wildcard_tags()):
                 # filter by interesting tags only
@@ -458,29 +690,14 @@ class ThreadManager(BaseQuerySetManager):
                     and subscribed_tags:
                 qs = qs.filter(tags__in=subscribed_tags)
 
-            if askbot_settings.USE_WILDCARD_TAGS:
-                meta_data['interesting_tag_names'].extend(request_user.interesting_tags.split())
-                meta_data['ignored_tag_names'].extend(request_user.ignored_tags.split())
-
-        QUESTION_ORDER_BY_MAP = {
-            'age-desc': '-added_at',
-            'age-asc': 'added_at',
-            'activity-desc': '-last_activity_at',
-            'activity-asc': 'last_activity_at',
-            'answers-desc': '-answer_count',
-            'answers-asc': 'answer_count',
-            'votes-desc': '-points',
-            'votes-asc': 'points',
-
-            'relevance-desc': '-relevance', # special Postgresql-specific ordering, 'relevance' quaso-column is added by get_for_query()
-        }
-
         orderby = QUESTION_ORDER_BY_MAP[search_state.sort]
 
         if not (getattr(django_settings, 'ENABLE_HAYSTACK_SEARCH', False) \
                 and orderby == '-relevance'):
             # FIXME: this does not produces the very same results as postgres.
-            qs = qs.extra(order_by=[orderby])
+            # thread id makes the order stable for the cursor pagination
+            tiebreak = '-id' if orderby.startswith('-') else 'id'
+            qs = qs.extra(order_by=[orderby, tiebreak])
         # HACK: We add 'ordering_key' column as an alias and order by it, because when distict() is used,
         #       qs.extra(order_by=[orderby,]) is lost if only `orderby` column is from askbot_post!
         #       Removing distinct() from the queryset fixes the problem, but we have to use it here.
@@ -489,7 +706,8 @@ class ThreadManager(BaseQuerySetManager):
         # qs = qs.distinct()
         qs = qs.only(
             'id', 'title', 'view_count', 'answer_count', 'last_activity_at',
-            'last_activity_by', 'closed', 'tagnames', 'accepted_answer'
+            'last_activity_by', 'closed', 'tagnames', 'accepted_answer',
+            'added_at', 'points'
         )
         return qs.distinct(), meta_data
 
@@ -523,6 +741,437 @@ class ThreadManager(BaseQuerySetManager):
         for thread in threads:
             thread._last_activity_by_cache = user_map[thread.last_activity_by_id]
 
+    def get_cached_count(self, qs):
+        """returns number of threads in the query set,
+        cached for `ASKBOT_QUESTIONS_COUNT_CACHE_TIMEOUT` seconds,
+        the SQL of the query is used as the cache key"""
+        try:
+            sql, params = qs.query.sql_with_params()
+        except django_exceptions.EmptyResultSet:
+            return 0
+        query_hash = hashlib.md5(str((sql, params)).encode('utf-8')).hexdigest()
+        cache_key = 'askbot-thread-count-' + query_hash
+        count = cache.cache.get(cache_key)
+        if count is None:
+            count = qs.count()
+            timeout = django_settings.ASKBOT_QUESTIONS_COUNT_CACHE_TIMEOUT
+            cache.cache.set(cache_key, count, timeout)
+        return count
+
+    def can_use_related_tag_counts(self, search_state, request_user):
+        """True if the related tags of the search are
+        the precomputed `RelatedTagCount` records"""
+        from askbot.conf import settings as askbot_settings  # Avoid circular import
+        if search_state.scope != 'all':
+            return False
+        if search_state.stripped_query or search_state.query_title:
+            return False
+        if search_state.query_users or search_state.author:
+            return False
+        if len(search_state.unified_tags()) > RELATED_TAGS_MAX_SELECTED:
+            return False
+        if askbot.get_lang_mode() == 'user-lang':
+            return False
+        if askbot_settings.GROUPS_ENABLED:
+            return False
+        if askbot_settings.CONTENT_MODERATION_MODE == 'premoderation':
+            return False
+        if request_user.is_authenticated:
+            return request_user.display_tag_filter_strategy == const.INCLUDE_ALL
+        return True
+
+    def get_related_tags_cache_key(self, search_state, request_user):
+        """returns cache key of the related tags of the search,
+        the key changes when the tags of any thread are changed"""
+        from askbot.conf import settings as askbot_settings  # Avoid circular import
+        is_personal = request_user.is_authenticated and (
+            search_state.scope == 'followed'
+            or askbot.get_lang_mode() == 'user-lang'
+            or askbot_settings.GROUPS_ENABLED
+            or askbot_settings.CONTENT_MODERATION_MODE == 'premoderation'
+            or request_user.display_tag_filter_strategy != const.INCLUDE_ALL
+        )
+        key = (
+            search_state.scope,
+            sorted(search_state.unified_tags()),
+            search_state.stripped_query,
+            search_state.query_title,
+            search_state.query_users,
+            search_state.author,
+            get_language(),
+            request_user.pk if is_personal else None,
+            RelatedTagCount.objects.get_generations(search_state.unified_tags())
+        )
+        key_hash = hashlib.md5(str(key).encode('utf-8')).hexdigest()
+        return 'askbot-related-tags-' + key_hash
+
+    def get_related_tags(self, qs, search_state, request_user, meta_data):
+        """returns most used tags of the threads found by the
+        `run_advanced_search`, use counts within the found threads
+        are stored as ``local_used_count``.
+
+        Related tags of the simple searches are read from
+        the `RelatedTagCount` records, of the other searches
+        counted over up to `SEARCH_RESULTS_MAX_IDS` first found
+        threads and cached.
+        """
+        from askbot.conf import settings as askbot_settings  # Avoid circular import
+        if self.can_use_related_tag_counts(search_state, request_user):
+            tag_names = set(search_state.unified_tags())
+            tag_ids = Tag.objects.filter(
+                name__in=tag_names, language_code=get_language()
+            ).values_list('id', flat=True)
+            tag_ids = set(tag_ids)
+            if len(tag_ids) < len(tag_names):
+                tags = list()
+            else:
+                tags = RelatedTagCount.objects.get_related_tags(
+                    tag_ids, get_language(), RELATED_TAG_CANDIDATES
+                )
+        else:
+            cache_key = self.get_related_tags_cache_key(search_state, request_user)
+            tags = cache.cache.get(cache_key)
+            if tags is None:
+                thread_ids = list(qs.values_list('id', flat=True)[:SEARCH_RESULTS_MAX_IDS])
+                tags = Tag.objects.filter(
+                    threads__id__in=thread_ids, deleted=False
+                ).annotate(
+                    local_used_count=models.Count('id')
+                ).order_by('-local_used_count', 'name')
+                tags = list(tags[:RELATED_TAG_CANDIDATES])
+                timeout = django_settings.ASKBOT_RELATED_TAGS_CACHE_TIMEOUT
+                cache.cache.set(cache_key, tags, timeout)
+
+        ignored_tag_names = set(meta_data.get('ignored_tag_names', []))
+        tags = [tag for tag in tags if tag.name not in ignored_tag_names]
+        tags = tags[:RELATED_TAGS_COUNT]
+        if askbot_settings.TAG_LIST_FORMAT == 'cloud':
+            tags.sort(key=operator.attrgetter('name'))
+        return tags
+
+    def get_title_suggestions(self, query, user, tag_name=None):
+        """returns list of the `title_index.TitleEntry` objects
+        of the threads with the titles best matching the query
+        typed in the ask form. Answer counts of the entries
+        are those visible to the user. Returns ``None``
+        if the title index is not built yet."""
+        from askbot.conf import settings as askbot_settings  # Avoid circular import
+        if not askbot_settings.GROUPS_ENABLED:
+            return title_index.search(query, tag_name=tag_name)
+
+        # some of the matching threads may be hidden from the user
+        entries = title_index.search(
+            query, tag_name=tag_name, limit=title_index.MAX_RESULTS * 3
+        )
+        if entries is None:
+            return None
+        thread_ids = [entry.thread_id for entry in entries]
+        visible_ids = set(
+            self.get_visible(user).filter(id__in=thread_ids).values_list('id', flat=True)
+        )
+        entries = [entry for entry in entries if entry.thread_id in visible_ids]
+        entries = entries[:title_index.MAX_RESULTS]
+
+        from askbot.models.post import Post
+        answer_counts = dict(
+            Post.objects.get_answers(user).filter(
+                thread_id__in=[entry.thread_id for entry in entries], deleted=False
+            ).values_list('thread_id').annotate(models.Count('id')).order_by()
+        )
+        entries = [copy(entry) for entry in entries]
+        for entry in entries:
+            entry.answer_count = answer_counts.get(entry.thread_id, 0)
+        return entries
+
+    def get_thread_cursor(self, thread, sort):
+        """returns cursor pointing to the position after
+        the ``thread`` in the list sorted by the ``sort`` method,
+        see `SearchState.CURSOR_SORT_METHODS`"""
+        value = getattr(thread, QUESTION_ORDER_BY_MAP[sort].lstrip('-'))
+        if isinstance(value, datetime.datetime):
+            value = (value - get_epoch()) // datetime.timedelta(microseconds=1)
+        return '%d_%d' % (value, thread.id)
+
+    def filter_after_cursor(self, qs, search_state):
+        """returns threads following the cursor of the search state,
+        ``qs`` must be the result of the `run_advanced_search`
+        for the same search state"""
+        field_name = QUESTION_ORDER_BY_MAP[search_state.sort].lstrip('-')
+        value, thread_id = search_state.get_cursor_value()
+        field = self.model._meta.get_field(field_name)
+        if isinstance(field, models.DateTimeField):
+            value = get_epoch() + datetime.timedelta(microseconds=value)
+
+        if ThreadListing.objects.can_run_search(search_state):
+            field_name = 'listing__' + field_name
+
+        # all cursor sort methods are descending
+        return qs.filter(
+            Q(**{field_name + '__lt': value}) |
+            Q(**{field_name: value, 'id__lt': thread_id})
+        )
+
+    def get_questions_page(self, qs, search_state, request_user=None, meta_data=None):
+        """returns a tuple (paginator, page, next page cursor)
+        for the query set returned by the `run_advanced_search`.
+
+        If the cursor pagination is enabled, the total count
+        is taken from the cache and, given the cursor,
+        the page is retrieved without the offset scan.
+        Otherwise the cursor of the next page is `None`.
+        Page number of the search state is reset to 1,
+        if it is out of range.
+
+        If the ``request_user`` and the ``meta_data`` of the search
+        are given, the page is loaded by the cached ids of the found
+        threads, see `get_cached_questions_page`. The search profile
+        in the ``meta_data`` is recorded, see `run_advanced_search`.
+        """
+        profile = meta_data.get('search_profile') if meta_data else None
+        if profile is None:
+            return self.load_questions_page(qs, search_state, request_user, meta_data)
+
+        with profile.capture_queries():
+            paginator, page, next_cursor = self.load_questions_page(
+                qs, search_state, request_user, meta_data
+            )
+        profile.record(qs, paginator.count)
+        return paginator, page, next_cursor
+
+    def load_questions_page(self, qs, search_state, request_user=None, meta_data=None):
+        """loads the page for the `get_questions_page`"""
+        if request_user is not None and meta_data is not None \
+                and django_settings.ASKBOT_SEARCH_RESULTS_CACHE_TIMEOUT:
+            result = self.get_cached_questions_page(
+                qs, search_state, request_user, meta_data
+            )
+            if result is not None:
+                return result
+
+        paginator = Paginator(qs, search_state.page_size)
+        if not search_state.supports_cursor():
+            if paginator.num_pages < search_state.page:
+                search_state.page = 1
+            page = paginator.page(search_state.page)
+            page.object_list = list(page.object_list) # evaluate the queryset
+            return paginator, page, None
+
+        paginator.count = self.get_cached_count(qs)
+        if search_state.cursor:
+            qs = self.filter_after_cursor(qs, search_state)
+            # the page number is shown in the paginator only
+            # and may be out of range with the cached count
+            number = min(search_state.page, paginator.num_pages)
+        else:
+            if paginator.num_pages < search_state.page:
+                search_state.page = 1
+            number = search_state.page
+            qs = qs[(number - 1) * search_state.page_size:]
+
+        # one extra thread tells whether there is a next page
+        threads = list(qs[:search_state.page_size + 1])
+        next_cursor = None
+        if len(threads) > search_state.page_size:
+            threads = threads[:search_state.page_size]
+            next_cursor = self.get_thread_cursor(threads[-1], search_state.sort)
+        return paginator, Page(threads, number, paginator), next_cursor
+
+    def get_search_generation_key(self, tag_name=None):
+        """returns cache key of the generation number of the searches
+        by the tag, or of all searches, if the tag is not given"""
+        if tag_name is None:
+            return SEARCH_GENERATION_CACHE_KEY
+        tag_hash = hashlib.md5(tag_name.lower().encode('utf-8')).hexdigest()
+        return SEARCH_GENERATION_CACHE_KEY + '-' + tag_hash
+
+    def get_search_generations(self, tag_names):
+        """returns list of the generation numbers of the searches
+        by the tags, or of all searches if there are no tags"""
+        keys = [self.get_search_generation_key(name) for name in sorted(tag_names)]
+        keys = keys or [self.get_search_generation_key()]
+        generations = cache.cache.get_many(keys)
+        for key in keys:
+            if key not in generations:
+                # start from the timestamp so that the results cached
+                # before the number was lost are not mistaken as current
+                cache.cache.add(key, int(time.time() * 1000), None)
+                generations[key] = cache.cache.get(key)
+        return [generations[key] for key in keys]
+
+    def invalidate_cached_search_results(self, tag_names):
+        """marks as stale the cached results of the searches,
+        which could find a thread with the tags"""
+        keys = [self.get_search_generation_key()]
+        keys.extend(self.get_search_generation_key(name) for name in tag_names)
+        for key in keys:
+            try:
+                cache.cache.incr(key)
+            except ValueError:
+                pass # the number will start from the current timestamp
+
+    def get_search_visitor_key(self, search_state, request_user, meta_data):
+        """returns string identifying the visitors who find
+        the same threads with the search"""
+        from askbot.conf import settings as askbot_settings  # Avoid circular import
+        if not request_user.is_authenticated:
+            return 'public'
+        lang_mode = askbot.get_lang_mode()
+        if search_state.scope == 'followed' \
+                or lang_mode == 'user-lang' \
+                or askbot_settings.CONTENT_MODERATION_MODE == 'premoderation' \
+                or request_user.display_tag_filter_strategy != const.INCLUDE_ALL:
+            # tag selections are in the key, so that the results
+            # are not taken from the cache after the tags are marked
+            return repr((
+                request_user.pk,
+                request_user.display_tag_filter_strategy,
+                request_user.get_languages() if lang_mode == 'user-lang' else None,
+                sorted(meta_data.get('interesting_tag_names', [])),
+                sorted(meta_data.get('ignored_tag_names', [])),
+                sorted(meta_data.get('subscribed_tag_names', []))
+            ))
+        if askbot_settings.GROUPS_ENABLED:
+            group_ids = request_user.get_groups().values_list('id', flat=True)
+            return 'groups' + format_id_list(group_ids)
+        return 'public'
+
+    def get_cached_search_ids(self, qs, search_state, request_user, meta_data):
+        """returns a tuple (list of ids, count) of the threads
+        found by the `run_advanced_search`, ids of up to
+        `SEARCH_RESULTS_MAX_IDS` first threads are listed.
+
+        The tuple is cached for `ASKBOT_SEARCH_RESULTS_CACHE_TIMEOUT`
+        seconds, the key is made of the canonical search state,
+        the language, the visitor key and the generation numbers
+        of the searched tags, which change when any thread with
+        the tags is changed.
+        """
+        non_existing_tags = meta_data.get('non_existing_tags', [])
+        tag_names = set(search_state.unified_tags()) - set(non_existing_tags)
+        key = (
+            search_state.canonical_key(),
+            get_language(),
+            self.get_search_visitor_key(search_state, request_user, meta_data),
+            get_settings_generation(),
+            self.get_search_generations(tag_names)
+        )
+        key_hash = hashlib.md5(str(key).encode('utf-8')).hexdigest()
+        cache_key = 'askbot-search-results-' + key_hash
+        data = cache.cache.get(cache_key)
+        if data is None:
+            ids = list(qs.values_list('id', flat=True)[:SEARCH_RESULTS_MAX_IDS + 1])
+            if len(ids) > SEARCH_RESULTS_MAX_IDS:
+                data = (ids[:SEARCH_RESULTS_MAX_IDS], qs.count())
+            else:
+                data = (ids, len(ids))
+            timeout = django_settings.ASKBOT_SEARCH_RESULTS_CACHE_TIMEOUT
+            cache.cache.set(cache_key, data, timeout)
+        return data
+
+    def get_cached_questions_page(self, qs, search_state, request_user, meta_data):
+        """same as `get_questions_page`, but only the threads shown
+        on the page are loaded, by the ids from `get_cached_search_ids`.
+        Returns `None` if the page is beyond the cached ids.
+        """
+        ids, count = self.get_cached_search_ids(qs, search_state, request_user, meta_data)
+        paginator = Paginator(qs, search_state.page_size)
+        paginator.count = count
+
+        if search_state.cursor:
+            _, cursor_thread_id = search_state.get_cursor_value()
+            try:
+                start = ids.index(cursor_thread_id) + 1
+            except ValueError:
+                return None
+            number = min(search_state.page, paginator.num_pages)
+        else:
+            if paginator.num_pages < search_state.page:
+                search_state.page = 1
+            number = search_state.page
+            start = (number - 1) * search_state.page_size
+
+        end = start + search_state.page_size
+        if end > len(ids) and count > len(ids):
+            return None
+
+        page_ids = ids[start:end]
+        threads = list()
+        if page_ids:
+            # threads no longer found since the ids were cached are dropped
+            positions = dict((thread_id, pos) for pos, thread_id in enumerate(page_ids))
+            threads = sorted(
+                qs.filter(id__in=page_ids),
+                key=lambda thread: positions[thread.id]
+            )
+
+        next_cursor = None
+        if threads and end < count and search_state.supports_cursor():
+            next_cursor = self.get_thread_cursor(threads[-1], search_state.sort)
+        return paginator, Page(threads, number, paginator), next_cursor
+
+    # Buffered view counts. Each thread with pending views has a counter
+    # in the cache and is registered in a numbered slot when its counter
+    # goes from 0 to 1, so that the flush can find the pending threads
+    # without scanning the cache.
+    VIEW_COUNT_KEY = 'askbot-thread-views-%d'
+    VIEW_COUNT_SLOT_KEY = 'askbot-thread-views-slot-%d'
+    VIEW_COUNT_SEQ_KEY = 'askbot-thread-views-seq'
+    VIEW_COUNT_FLUSHED_SEQ_KEY = 'askbot-thread-views-flushed-seq'
+
+    def _register_buffered_views(self, thread_id):
+        cache.cache.add(self.VIEW_COUNT_SEQ_KEY, 0, const.LONG_TIME)
+        slot = cache.cache.incr(self.VIEW_COUNT_SEQ_KEY)
+        cache.cache.set(self.VIEW_COUNT_SLOT_KEY % slot, thread_id, const.LONG_TIME)
+
+    def buffer_view_count(self, thread_id, increment=1):
+        """adds views of the thread to the buffer in the cache,
+        they are saved by the `flush_view_count_buffer`
+        """
+        key = self.VIEW_COUNT_KEY % thread_id
+        cache.cache.add(key, 0, const.LONG_TIME)
+        if cache.cache.incr(key, increment) == increment:
+            self._register_buffered_views(thread_id)
+
+    def flush_view_count_buffer(self):
+        """saves the buffered view counts with one UPDATE
+        per distinct increment and invalidates summary html
+        of the updated threads, the html is re-rendered
+        when the thread is next shown in the question list.
+        Returns the number of updated threads.
+        """
+        last_slot = cache.cache.get(self.VIEW_COUNT_SEQ_KEY, 0)
+        first_slot = cache.cache.get(self.VIEW_COUNT_FLUSHED_SEQ_KEY, 0) + 1
+        if first_slot > last_slot:
+            return 0
+
+        slot_keys = [self.VIEW_COUNT_SLOT_KEY % slot for slot in range(first_slot, last_slot + 1)]
+        thread_ids = set(cache.cache.get_many(slot_keys).values())
+        cache.cache.set(self.VIEW_COUNT_FLUSHED_SEQ_KEY, last_slot, const.LONG_TIME)
+        cache.cache.delete_many(slot_keys)
+
+        increments = collections.defaultdict(list)
+        for thread_id in thread_ids:
+            key = self.VIEW_COUNT_KEY % thread_id
+            count = cache.cache.get(key, 0)
+            if count == 0:
+                continue
+            if cache.cache.decr(key, count) > 0:
+                # views added since the read will be saved by the next flush
+                self._register_buffered_views(thread_id)
+            increments[count].append(thread_id)
+
+        for increment, ids in increments.items():
+            self.filter(id__in=ids).update(view_count=F('view_count') + increment)
+
+        langs = translation_utils.get_language_codes()
+        summary_keys = list()
+        for ids in increments.values():
+            for thread_id in ids:
+                summary_keys.extend([get_summary_cache_key(thread_id, lang) for lang in langs])
+        cache.cache.delete_many(summary_keys)
+
+        return sum(len(ids) for ids in increments.values())
+
     # TODO: this function is similar to get_response_receivers - profile this function against the other one
     def get_thread_contributors(self, thread_list):
         """Returns query set of Thread contributors"""
@@ -627,12 +1276,25 @@ class Thread(models.Model):
 
     # db_column will be removed later
     points = models.IntegerField(default=0, db_column='score')
+    # True when the list of the similar threads was computed,
+    # even if it is empty, see `ThreadSimilarityManager`
+    similar_threads_computed = models.BooleanField(default=False)
 
     objects = ThreadManager()
 
     class Meta:
         app_label = 'askbot'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        thread = super(Thread, cls).from_db(db, field_names, values)
+        if not django_settings.ASKBOT_TITLE_INDEX_ENABLED:
+            return thread
+        # remember the loaded values, to tell if the
+        # title index must be updated when the thread is saved
+        thread._loaded_title_index_key = title_index.get_indexed_key(thread)
+        return thread
+
     # property to support legacy themes in case there are.
     @property
     def score(self):
@@ -1042,8 +1704,7 @@ class Thread(models.Model):
         cache.cache.delete_many(keys)
 
     def get_summary_cache_key(self, lang=None):
-        lang = lang or get_language()
-        return 'thread-question-summary-%d-%s' % (self.id, lang)
+        return get_summary_cache_key(self.id, lang)
 
     def get_post_data_cache_key(self, sort_method=None, groups=None): #pylint: disable=missing-docstring
         key = f'thread-data-{self.id}-{sort_method}'
@@ -1068,6 +1729,18 @@ class Thread(models.Model):
         self.invalidate_cached_post_data()
         self.invalidate_cached_summary_html()
 
+    def invalidate_cached_vote_data(self, post):
+        """invalidates only the cached data showing the score
+        of the voted post: the post data of the thread and,
+        for the question, the summary html, rendered again
+        when requested, and the search results sorted by votes"""
+        self.invalidate_cached_post_data()
+        if not post.is_question():
+            return
+        self.invalidate_cached_summary_html()
+        if django_settings.ASKBOT_SEARCH_RESULTS_CACHE_TIMEOUT:
+            Thread.objects.invalidate_cached_search_results(self.get_tag_names())
+
     def get_public_posts(self):
         kwargs = {
             'deleted': False,
@@ -1252,7 +1925,12 @@ class Thread(models.Model):
         else:
             order_by = (order_by,)
 
-        posts = posts.order_by(*order_by)
+        posts = posts.order_by(*order_by).select_related('author')
+        posts = [post for post in posts if post.post_type in ('question', 'answer', 'comment')]
+        # precache revision data, for all posts at once
+        from askbot.models.post import Post
+        Post.objects.precache_revisions(posts)
+
         # 1) collect question, answer and comment posts and list of post id's
         answers = list()
         post_map = dict()
@@ -1262,15 +1940,6 @@ class Thread(models.Model):
 
         for post in posts:
 
-            if post.post_type not in ('question', 'answer', 'comment'):
-                continue
-
-            # precache some revision data
-            first_rev = post.get_earliest_revision()
-            last_rev = post.get_latest_revision()
-            first_rev.post = post
-            last_rev.post = post
-
             # pass through only deleted question posts
             if post.deleted and post.post_type != 'question':
                 continue
@@ -1350,67 +2019,46 @@ class Thread(models.Model):
 
     def get_similar_threads(self):
         """
-        Get 10 similar threads for given one.
-        Threads with the individual tags will be added to list if above questions are not full.
-
-        This function has a limitation that it will
-        retrieve only 100 records then select 10 most similar
-        from that list as querying entire database may
-        be very expensive - this function will benefit from
-        some sort of optimization
+        Get 10 similar threads for given one, with the most
+        rarely used tags in common, see :class:`ThreadSimilarityManager`
         """
 
-        def get_data():
-            # TODO: code in this function would be simpler if
-            # we had question post id denormalized on the thread
-            tags_list = self.get_tag_names()
-            similar_threads = Thread.objects\
-                .filter(tags__name__in=tags_list, language_code=self.language_code)\
-                .exclude(id=self.id)\
-                .exclude(posts__post_type='question', posts__deleted=True)\
-                .distinct()[:100]
-            similar_threads = list(similar_threads)
-
-            for thread in similar_threads:
-                thread.similarity = self.get_similarity(other_thread=thread)
-
-            similar_threads.sort(key=operator.attrgetter('similarity'), reverse=True)
-            similar_threads = similar_threads[:10]
-
-            # Denormalize questions to speed up template rendering
-            # TODO: just denormalize question_post_id on the thread!
-            thread_map = dict([(thread.id, thread) for thread in similar_threads])
+        def get_questions():
             from askbot.models.post import Post
-            questions = Post.objects.get_questions()
-            questions = questions.select_related('thread').filter(thread__in=similar_threads)
-            for q in questions:
-                thread_map[q.thread_id].question_denorm = q
-
-            # Postprocess data for the final output
-            result = list()
-            for thread in similar_threads:
-                question_post = getattr(thread, 'question_denorm', None)
-                # unfortunately the if statement below is necessary due to
-                # a possible bug
-                # all this proves that it's wrong to reference threads by
-                # the question post id in the question page urls!!!
-                # this is a "legacy" problem inherited from the old models
-                if question_post:
-                    url = question_post.get_absolute_url()
-                    title = thread.get_title()
-                    result.append({'url': url, 'title': title})
-
-            return result
+            return Post.objects.filter(
+                post_type='question',
+                deleted=False,
+                thread__deleted=False,
+                thread__reverse_similarities__thread=self
+            ).select_related('thread').order_by(
+                '-thread__reverse_similarities__score', '-thread_id'
+            )
+
+        def get_data(questions):
+            return [
+                {'url': question.get_absolute_url(), 'title': question.thread.get_title()}
+                for question in questions
+            ]
 
         def get_cached_data():
             """similar thread data will expire
             with the default expiration delay
             """
-            key = 'similar-threads-%s' % self.id
+            key = get_similar_threads_cache_key(self.id)
             data = cache.cache.get(key)
-            if data is None:
-                data = get_data()
-                cache.cache.set(key, data)
+            if data is not None:
+                return data
+
+            questions = list(get_questions())
+            if len(questions) == 0 and not self.similar_threads_computed:
+                # the thread was not indexed yet, the list is computed
+                # in the background and not cached until then
+                from askbot.tasks import update_similar_threads as update_task
+                defer_celery_task(update_task, args=(self.id,), kwargs={'update_others': False})
+                return get_data(get_questions())
+
+            data = get_data(questions)
+            cache.cache.set(key, data)
             return data
 
         return LazyList(get_cached_data)
@@ -1773,6 +2421,327 @@ class Thread(models.Model):
         return self.get_summary_cache_key() in cache.cache
 
 
+class ThreadListingManager(BaseQuerySetManager):
+
+    def is_enabled(self):
+        return django_settings.ASKBOT_THREAD_LISTING_INDEX_ENABLED
+
+    def can_run_search(self, search_state):
+        """True if the search can be done with
+        `ThreadManager.run_listing_search`"""
+        if not self.is_enabled():
+            return False
+        if search_state.stripped_query:
+            return False
+        if search_state.sort == 'relevance-desc':
+            return False
+        return search_state.scope != 'followed'
+
+    def update_for_thread(self, thread):
+        """creates or updates the listing record of the thread,
+        returns `None` if the thread does not have the question yet
+        """
+        from askbot.models.post import Post
+        question = Post.objects.filter(
+            thread_id=thread.id, post_type='question'
+        ).values('author_id', 'deleted').first()
+        if question is None:
+            return None
+
+        listing, created = self.update_or_create(
+            thread_id=thread.id,
+            defaults={
+                'author_id': question['author_id'],
+                'deleted': question['deleted'],
+                'language_code': thread.language_code,
+                'approved': thread.approved,
+                'closed': thread.closed,
+                'has_accepted_answer': thread.accepted_answer_id is not None,
+                'answer_count': thread.answer_count,
+                'points': thread.points,
+                'added_at': thread.added_at,
+                'last_activity_at': thread.last_activity_at
+            }
+        )
+        return listing
+
+
+class ThreadListing(models.Model):
+    """Denormalized copy of the thread data used to filter
+    and sort the question lists, with one record per thread.
+    Records are maintained by the signal handlers when
+    the `ASKBOT_THREAD_LISTING_INDEX_ENABLED` setting is on
+    and rebuilt with the `askbot_rebuild_thread_listing` command.
+
+    Tags and groups are not copied, the threads are filtered
+    by them with the subqueries of the indexed thread-tag and
+    thread-group tables, see `get_tag_filter` and `get_group_filter`.
+    """
+    thread = models.OneToOneField(
+        Thread, primary_key=True, related_name='listing',
+        on_delete=models.CASCADE)
+    # author of the question
+    author = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    language_code = LanguageCodeField()
+    # the question is deleted
+    deleted = models.BooleanField(default=False, db_index=True)
+    approved = models.BooleanField(default=True)
+    closed = models.BooleanField(default=False)
+    has_accepted_answer = models.BooleanField(default=False)
+    answer_count = models.PositiveIntegerField(default=0, db_index=True)
+    points = models.IntegerField(default=0, db_index=True)
+    added_at = models.DateTimeField(db_index=True)
+    last_activity_at = models.DateTimeField(db_index=True)
+
+    objects = ThreadListingManager()
+
+    class Meta:
+        app_label = 'askbot'
+
+
+class SearchVectorUpdateManager(BaseQuerySetManager):
+
+    def is_enabled(self):
+        return django_settings.ASKBOT_POSTGRESQL_DEFERRED_SEARCH_VECTORS
+
+    def is_queueing(self):
+        """True if the changed threads must be queued, also while
+        the vectors are rebuilt with the triggers dropped"""
+        return self.is_enabled() or bool(cache.cache.get(SEARCH_VECTORS_REBUILD_CACHE_KEY))
+
+    def set_rebuilding(self, rebuilding):
+        """marks the start or the end of the rebuild of the vectors,
+        while it lasts the changed threads are queued in all processes"""
+        if rebuilding:
+            cache.cache.set(SEARCH_VECTORS_REBUILD_CACHE_KEY, True, const.LONG_TIME)
+        else:
+            cache.cache.delete(SEARCH_VECTORS_REBUILD_CACHE_KEY)
+
+    def mark_threads(self, thread_ids):
+        """adds the threads to the queue,
+        the threads already in the queue are skipped"""
+        self.bulk_create(
+            [self.model(thread_id=thread_id) for thread_id in thread_ids],
+            ignore_conflicts=True
+        )
+
+    def update_batch(self, batch_size):
+        """recomputes the search vectors of the first threads
+        in the queue and removes them from the queue,
+        returns the number of the updated threads.
+
+        Queue records of the batch are locked until the vectors
+        are saved, threads changed in the meantime are queued again
+        after the commit. Concurrent updates skip the locked records.
+        """
+        from askbot.search import postgresql
+        with transaction.atomic():
+            thread_ids = list(
+                self.select_for_update(skip_locked=True).order_by(
+                    'marked_at'
+                ).values_list('thread_id', flat=True)[:batch_size]
+            )
+            if thread_ids:
+                self.filter(thread_id__in=thread_ids).delete()
+                postgresql.update_thread_search_vectors(thread_ids)
+        return len(thread_ids)
+
+    def update_all(self, batch_size=500):
+        """empties the queue, returns the number of the updated threads"""
+        count = 0
+        while True:
+            batch_count = self.update_batch(batch_size)
+            if batch_count == 0:
+                return count
+            count += batch_count
+
+
+class SearchVectorUpdate(models.Model):
+    """Queue of the threads whose PostgreSQL text search vectors
+    must be recomputed, used instead of the triggers when the
+    `ASKBOT_POSTGRESQL_DEFERRED_SEARCH_VECTORS` setting is on,
+    or while the vectors are rebuilt with the triggers dropped.
+    Records are added by the signal handlers when the threads
+    and the posts are saved or deleted, and processed by the
+    `askbot_update_search_vectors` command or the periodic task.
+    """
+    # not a foreign key, so that the deleted threads
+    # can be queued without the database constraints
+    thread_id = models.PositiveIntegerField(primary_key=True)
+    marked_at = models.DateTimeField(auto_now_add=True)
+
+    objects = SearchVectorUpdateManager()
+
+    class Meta:
+        app_label = 'askbot'
+
+
+class SearchShapeStats(models.Model):
+    """Totals of the profiled searches of one shape, see
+    `askbot.search.profiling`, times are in milliseconds"""
+    shape = models.CharField(max_length=255, unique=True)
+    search_count = models.PositiveIntegerField(default=0)
+    slow_count = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    total_found = models.PositiveIntegerField(default=0)
+    total_queries = models.PositiveIntegerField(default=0)
+    last_search_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        app_label = 'askbot'
+
+    def get_average_ms(self):
+        return self.total_ms / max(self.search_count, 1)
+
+
+class SlowSearch(models.Model):
+    """Log of the profiled searches slower than the
+    `ASKBOT_SEARCH_SLOW_LOG_THRESHOLD`, only the last
+    `ASKBOT_SEARCH_SLOW_LOG_SIZE` records are kept"""
+    shape = models.CharField(max_length=255)
+    search_url = models.TextField()
+    duration_ms = models.FloatField()
+    found_count = models.PositiveIntegerField()
+    query_count = models.PositiveIntegerField()
+    sql = models.TextField()
+    plan = models.TextField(blank=True)
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'askbot'
+
+
+class ThreadSimilarityManager(BaseQuerySetManager):
+    """Maintains the lists of the similar threads.
+
+    Similarity of two threads is the sum of the inverse document
+    frequencies (idf) of their common tags, so the rarely used tags
+    weigh more than the popular ones. The lists are updated when
+    a thread is retagged and rebuilt with the command
+    `askbot_rebuild_similar_threads`. Threads, which were not
+    indexed yet, are computed in a celery task on their first view,
+    then `Thread.similar_threads_computed` is set.
+    """
+
+    def get_thread_count(self, language_code):
+        return Thread.objects.filter(
+            language_code=language_code, deleted=False
+        ).count()
+
+    def get_tag_weights(self, tag_counts, thread_count):
+        """returns dictionary tag id -> idf of the tag,
+        ``tag_counts`` is a dictionary tag id -> used count"""
+        return dict(
+            (tag_id, math.log(1 + thread_count / max(used_count, 1)))
+            for tag_id, used_count in tag_counts.items()
+        )
+
+    def get_scores(self, thread, tag_weights, limit):
+        """returns list of pairs (thread id, similarity)
+        of the most similar threads, best first"""
+        if not tag_weights:
+            return list()
+        weights = [
+            When(tag_id=tag_id, then=Value(weight))
+            for tag_id, weight in tag_weights.items()
+        ]
+        score = Sum(Case(*weights, default=Value(0.0), output_field=FloatField()))
+        records = Thread.tags.through.objects.filter(
+            tag_id__in=list(tag_weights.keys()),
+            thread__language_code=thread.language_code,
+            thread__deleted=False
+        ).exclude(
+            thread_id=thread.id
+        ).values('thread_id').annotate(
+            score=score
+        ).order_by('-score', '-thread_id')[:limit]
+        return [(record['thread_id'], record['score']) for record in records]
+
+    def set_similar_threads(self, thread_id, scores):
+        """replaces the list of the similar threads"""
+        self.filter(thread_id=thread_id).delete()
+        self.bulk_create([
+            self.model(thread_id=thread_id, other_thread_id=other_id, score=score)
+            for other_id, score in scores
+        ])
+
+    def update_for_thread(self, thread, thread_count=None, update_others=True):
+        """updates the list of the threads similar to the thread,
+        if ``update_others`` is True, the thread is also added to or
+        removed from the lists of the other threads, where necessary
+        """
+        if thread_count is None:
+            thread_count = self.get_thread_count(thread.language_code)
+        tag_counts = dict(thread.tags.values_list('id', 'used_count'))
+        tag_weights = self.get_tag_weights(tag_counts, thread_count)
+        scores = self.get_scores(thread, tag_weights, SIMILAR_THREAD_CANDIDATES)
+        self.set_similar_threads(thread.id, scores[:SIMILAR_THREADS_COUNT])
+        Thread.objects.filter(id=thread.id).update(similar_threads_computed=True)
+        changed_ids = set([thread.id])
+
+        if update_others:
+            # the lists with this thread are recalculated,
+            # because the similarity may have changed
+            listing_ids = set(
+                self.filter(other_thread_id=thread.id).values_list('thread_id', flat=True)
+            )
+            for other_thread in Thread.objects.filter(id__in=listing_ids):
+                self.update_for_thread(
+                    other_thread, thread_count=thread_count, update_others=False
+                )
+            changed_ids.update(listing_ids)
+
+            # among the best candidates, this thread is added
+            # to the lists, which are not full or have less similar threads
+            candidate_scores = dict(
+                (other_id, score) for other_id, score in scores
+                if other_id not in listing_ids
+            )
+            other_lists = collections.defaultdict(list)
+            for other_id, score in self.filter(
+                thread_id__in=list(candidate_scores.keys())
+            ).values_list('thread_id', 'score'):
+                other_lists[other_id].append(score)
+
+            new_records = list()
+            full_list_ids = list()
+            for other_id, score in candidate_scores.items():
+                other_scores = other_lists[other_id]
+                if len(other_scores) >= SIMILAR_THREADS_COUNT:
+                    if score <= min(other_scores):
+                        continue
+                    full_list_ids.append(other_id)
+                new_records.append(
+                    self.model(thread_id=other_id, other_thread_id=thread.id, score=score)
+                )
+            self.bulk_create(new_records, ignore_conflicts=True)
+            for other_id in full_list_ids:
+                extra_ids = self.filter(thread_id=other_id).order_by(
+                    '-score', '-other_thread_id'
+                ).values_list('id', flat=True)[SIMILAR_THREADS_COUNT:]
+                self.filter(id__in=list(extra_ids)).delete()
+            changed_ids.update(record.thread_id for record in new_records)
+
+        cache.cache.delete_many([get_similar_threads_cache_key(thread_id) for thread_id in changed_ids])
+
+
+class ThreadSimilarity(models.Model):
+    """Record of the list of the most similar threads,
+    maintained by the :class:`ThreadSimilarityManager`"""
+    thread = models.ForeignKey(
+        Thread, related_name='similarities', on_delete=models.CASCADE)
+    other_thread = models.ForeignKey(
+        Thread, related_name='reverse_similarities', on_delete=models.CASCADE)
+    score = models.FloatField()
+
+    objects = ThreadSimilarityManager()
+
+    class Meta:
+        app_label = 'askbot'
+        unique_together = ('thread', 'other_thread')
+
+
 class QuestionView(models.Model):
     question = models.ForeignKey('Post', related_name='viewed', on_delete=models.CASCADE)
     who = models.ForeignKey(User, related_name='question_views', on_delete=models.CASCADE)
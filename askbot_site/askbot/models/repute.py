@@ -1,9 +1,12 @@
 import datetime
+import math
 
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import fields
 from django.contrib.auth.models import User
-from django.db import models
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, models, transaction
 from django.utils.translation import ugettext as _
 from django.utils.html import escape
 from django.utils import timezone
@@ -172,7 +175,105 @@ class Award(models.Model):
         verbose_name_plural = _("awards")
 
 
+class BadgeEventManager(models.Manager):
+
+    def is_enabled(self):
+        return django_settings.ASKBOT_BADGE_EVALUATION_DEFERRED
+
+    def record(self, event, actor, context_object, timestamp):
+        """queues the event, if the same event of the actor
+        for the same object is already queued, it is not added"""
+        badge_event = self.model(
+            event=event, actor=actor,
+            content_object=context_object, timestamp=timestamp
+        )
+        if actor is None and not connection.features.supports_partial_indexes:
+            # the events without the actor are unique
+            # only with the conditional constraint
+            queued = self.filter(
+                event=event, actor=None,
+                content_type=badge_event.content_type,
+                object_id=badge_event.object_id
+            )
+            if queued.exists():
+                return
+        self.bulk_create([badge_event], ignore_conflicts=True)
+
+    def evaluate_batch(self, batch_size):
+        """considers the badge awards for the first events
+        in the queue and removes them from the queue,
+        returns the number of the processed events.
+
+        Queue records of the batch are locked until the
+        awards are saved, concurrent workers skip them.
+        """
+        from askbot.models.badges import evaluate_badge_events
+        with transaction.atomic():
+            locked = self.select_for_update(skip_locked=True).order_by('id')
+            ids = list(locked.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return 0
+            events = self.filter(id__in=ids).order_by('id')
+            events = list(events.select_related('actor').prefetch_related('content_object'))
+            self.filter(id__in=ids).delete()
+            # objects deleted since the events were queued are skipped
+            events = [event for event in events if event.content_object is not None]
+            evaluate_badge_events(events)
+        return len(ids)
+
+    def evaluate_all(self, batch_size=500):
+        """processes the queue until it is empty,
+        returns the number of the processed events"""
+        count = 0
+        while True:
+            batch_count = self.evaluate_batch(batch_size)
+            if batch_count == 0:
+                return count
+            count += batch_count
+
+
+class BadgeEvent(models.Model):
+    """Queue of the events considered for the badge awards,
+    used when the `ASKBOT_BADGE_EVALUATION_DEFERRED` setting is on.
+    Records are added by the `askbot.models.badges.award_badges`
+    and processed by the `askbot_evaluate_badges` command
+    or the periodic task.
+    """
+    event = models.CharField(max_length=64)
+    actor = models.ForeignKey(User, null=True, on_delete=models.CASCADE)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = fields.GenericForeignKey('content_type', 'object_id')
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    objects = BadgeEventManager()
+
+    class Meta:
+        app_label = 'askbot'
+        unique_together = ('event', 'actor', 'content_type', 'object_id')
+        constraints = [
+            # NULL actors are distinct in the unique_together
+            models.UniqueConstraint(
+                fields=('event', 'content_type', 'object_id'),
+                condition=models.Q(actor__isnull=True),
+                name='askbot_badgeevent_unique_without_actor'
+            ),
+        ]
+
+
 class ReputeManager(models.Manager):
+
+    # reputation changes limited by the
+    # MAX_REP_GAIN_PER_USER_PER_DAY setting
+    UPVOTED_REPUTATION_TYPES = (1, -8)
+
+    def get_today_range(self):
+        """returns start and end of the current day"""
+        today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+        if django_settings.USE_TZ:
+            today = timezone.make_aware(today)
+        return today, today + datetime.timedelta(1)
+
     def get_reputation_by_upvoted_today(self, user):
         """
         For one user in one day, he can only earn rep till certain score
@@ -183,12 +284,9 @@ class ReputeManager(models.Manager):
         if user is None:
             return 0
         else:
-            today = datetime.date.today()
-            tomorrow = today + datetime.timedelta(1)
-            rep_types = (1, -8)
-            sums = self.filter(models.Q(reputation_type__in=rep_types),
+            sums = self.filter(models.Q(reputation_type__in=self.UPVOTED_REPUTATION_TYPES),
                                user=user,
-                               reputed_at__range=(today, tomorrow))\
+                               reputed_at__range=self.get_today_range())\
                 .aggregate(models.Sum('positive'), models.Sum('negative'))
             if sums:
                 pos = sums['positive__sum']
@@ -201,6 +299,60 @@ class ReputeManager(models.Manager):
             else:
                 return 0
 
+    def get_upvoted_today_cache_key(self, user_id):
+        return 'askbot-reputation-by-upvoted-%d-%s' % (user_id, datetime.date.today())
+
+    def get_cached_reputation_by_upvoted_today(self, user):
+        """same as `get_reputation_by_upvoted_today`, but the
+        sum is cached for the day and kept up to date
+        by the `Repute.save`"""
+        cache_key = self.get_upvoted_today_cache_key(user.id)
+        reputation = cache.get(cache_key)
+        if reputation is None:
+            reputation = self.get_reputation_by_upvoted_today(user)
+            cache.add(cache_key, reputation, 24 * 60 * 60)
+        return reputation
+
+    def add_reputation_by_upvoted_today(self, repute):
+        """adds the saved repute to the cached sum of the day,
+        if the sum is not cached it is counted when requested"""
+        cache_key = self.get_upvoted_today_cache_key(repute.user_id)
+        start, end = self.get_today_range()
+        if not start <= repute.reputed_at <= end:
+            return
+        try:
+            cache.incr(cache_key, repute.positive + repute.negative)
+        except ValueError:
+            pass
+
+    def get_graph_points(self, user, language_code, sample_size):
+        """returns list of up to ``sample_size`` pairs
+        (time, reputation), newest first, evenly sampled from
+        the reputes of the user. Only the sampled rows are read,
+        numbered with ROW_NUMBER in the query."""
+        reputes = self.filter(user=user, language_code=language_code)
+        rep_length = reputes.count()
+        if rep_length <= sample_size:
+            reputes = reputes.order_by('-reputed_at', '-id')
+            return list(reputes.values_list('reputed_at', 'reputation'))
+
+        step = rep_length / float(sample_size)
+        positions = sorted(set(
+            int(math.ceil(idx * step)) + 1 for idx in range(sample_size)
+        ))
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        sql = """
+            SELECT id, reputed_at, reputation FROM (
+                SELECT id, reputed_at, reputation, ROW_NUMBER() OVER (
+                    ORDER BY reputed_at DESC, id DESC
+                ) AS position
+                FROM %s WHERE user_id = %%s AND language_code = %%s
+            ) AS ranked
+            WHERE position IN (%s) ORDER BY position
+        """ % (table, ', '.join(['%s'] * len(positions)))
+        reputes = self.raw(sql, [user.id, language_code] + positions)
+        return [(repute.reputed_at, repute.reputation) for repute in reputes]
+
 
 class Repute(models.Model):
     """The reputation histories for user"""
@@ -236,7 +388,12 @@ class Repute(models.Model):
             self.language_code = self.question.language_code
         else:
             self.language_code = get_language()
+        adding = self._state.adding
         super(Repute, self).save(*args, **kwargs)
+        if adding and self.reputation_type in Repute.objects.UPVOTED_REPUTATION_TYPES:
+            Repute.objects.add_reputation_by_upvoted_today(self)
+        if ReputationSnapshot.objects.is_enabled():
+            ReputationSnapshot.objects.record(self)
 
     def get_explanation_snippet(self):
         """returns HTML snippet with a link to related question
@@ -262,3 +419,124 @@ class Repute(models.Model):
                'url': self.question.get_absolute_url(),
                'question_title': escape(self.question.thread.title),
             }
+
+
+class ReputationSnapshotManager(models.Manager):
+
+    def is_enabled(self):
+        return django_settings.ASKBOT_REPUTATION_SNAPSHOTS_ENABLED
+
+    def get_graph_cache_key(self, user_id, language_code):
+        return 'askbot-reputation-graph-%d-%s' % (user_id, language_code)
+
+    def record(self, repute):
+        """makes the reputation after the change the
+        snapshot of its day, unless a later change
+        of the same day is already recorded"""
+        filters = {
+            'user_id': repute.user_id,
+            'language_code': repute.language_code,
+            'date': repute.reputed_at.date()
+        }
+        values = {
+            'reputation': repute.reputation,
+            'reputed_at': repute.reputed_at
+        }
+        snapshots = self.filter(reputed_at__lte=repute.reputed_at, **filters)
+        if not snapshots.update(**values):
+            try:
+                with transaction.atomic():
+                    self.create(**dict(filters, **values))
+            except IntegrityError:
+                # a snapshot of the day exists
+                snapshots.update(**values)
+        cache.delete(self.get_graph_cache_key(repute.user_id, repute.language_code))
+
+    def rebuild(self, user_ids=None):
+        """recreates the snapshots from the `Repute` records,
+        of the users with the ``user_ids`` or of all users,
+        returns the number of the snapshots"""
+        reputes = Repute.objects.order_by('user_id', 'language_code', 'reputed_at', 'id')
+        snapshots = self.all()
+        if user_ids is not None:
+            reputes = reputes.filter(user_id__in=user_ids)
+            snapshots = snapshots.filter(user_id__in=user_ids)
+        snapshots.delete()
+
+        count = 0
+        graph_keys = set()
+        records = list()
+        reputes = reputes.values_list('user_id', 'language_code', 'reputed_at', 'reputation')
+        for user_id, language_code, reputed_at, reputation in reputes.iterator():
+            snapshot = self.model(
+                user_id=user_id, language_code=language_code,
+                date=reputed_at.date(), reputed_at=reputed_at,
+                reputation=reputation
+            )
+            # reputes are ordered by time, so the last one of the day is kept
+            if records and (records[-1].user_id, records[-1].language_code, records[-1].date) \
+                    == (user_id, language_code, snapshot.date):
+                records[-1] = snapshot
+                continue
+            graph_keys.add(self.get_graph_cache_key(user_id, language_code))
+            if len(records) >= 1000:
+                self.bulk_create(records[:-1])
+                count += len(records) - 1
+                records = records[-1:]
+            records.append(snapshot)
+        self.bulk_create(records)
+        cache.delete_many(list(graph_keys))
+        return count + len(records)
+
+    def get_graph_points(self, user, language_code, sample_size):
+        """returns list of up to ``sample_size`` pairs
+        (time, reputation), newest first, sampled from the daily
+        snapshots with one query: the snapshots are split into
+        the ``sample_size`` buckets and the last snapshot
+        of each bucket is taken.
+
+        The lists are cached by the sample size
+        until the reputation changes.
+        """
+        cache_key = self.get_graph_cache_key(user.id, language_code)
+        samples = cache.get(cache_key) or dict()
+        if sample_size in samples:
+            return samples[sample_size]
+
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        sql = """
+            SELECT id, reputed_at, reputation FROM (
+                SELECT id, reputed_at, reputation, ROW_NUMBER() OVER (
+                    PARTITION BY bucket ORDER BY reputed_at DESC
+                ) AS position
+                FROM (
+                    SELECT id, reputed_at, reputation,
+                        NTILE(%%s) OVER (ORDER BY reputed_at) AS bucket
+                    FROM %s WHERE user_id = %%s AND language_code = %%s
+                ) AS buckets
+            ) AS ranked
+            WHERE position = 1 ORDER BY reputed_at DESC
+        """ % table
+        snapshots = self.raw(sql, [sample_size, user.id, language_code])
+        points = [(snapshot.reputed_at, snapshot.reputation) for snapshot in snapshots]
+        samples[sample_size] = points
+        cache.set(cache_key, samples, const.LONG_TIME)
+        return points
+
+
+class ReputationSnapshot(models.Model):
+    """Reputation of the user at the end of the day, per language,
+    the last `Repute` of the day. Maintained by the `Repute.save`
+    when the `ASKBOT_REPUTATION_SNAPSHOTS_ENABLED` setting is on,
+    used to draw the reputation graph."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    language_code = LanguageCodeField()
+    date = models.DateField()
+    reputed_at = models.DateTimeField()
+    reputation = models.IntegerField()
+
+    objects = ReputationSnapshotManager()
+
+    class Meta:
+        app_label = 'askbot'
+        unique_together = ('user', 'language_code', 'date')
@@ -1,16 +1,26 @@
+import hashlib
+import itertools
 import re
+import time
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils.translation import get_language
 from django.utils.translation import ugettext as _
 from django.utils.translation import ugettext_lazy
 from django.conf import settings as django_settings
+from django.core.cache import cache
 from askbot.models.base import BaseQuerySetManager
+from askbot.models.base import format_id_list
 from askbot.models.fields import LanguageCodeField
 from askbot import const
 from askbot.conf import settings as askbot_settings
+from askbot.search import tag_trie
 from askbot.utils import category_tree
 
+# related tags of the searches by up to this many tags are precomputed
+RELATED_TAGS_MAX_SELECTED = 2
+RELATED_TAGS_GENERATION_CACHE_KEY = 'askbot-related-tags-generation'
+
 def delete_tags(tags):
     """deletes tags in the list"""
     tag_ids = [tag.id for tag in tags]
@@ -87,6 +97,16 @@ def tags_match_some_wildcard(tag_names, wildcard_tags):
                 return True
     return False
 
+def get_tag_name_prefixes(tag_names):
+    """returns set of all prefixes of the tag names,
+    including the empty string, the wildcards matching
+    any of the tags have their prefixes in this set"""
+    prefixes = set([''])
+    for tag_name in tag_names:
+        for length in range(1, len(tag_name) + 1):
+            prefixes.add(tag_name[:length])
+    return prefixes
+
 def get_mandatory_tags():
     """returns list of mandatory tags,
     or an empty list, if there aren't any"""
@@ -128,11 +148,13 @@ class TagQuerySet(models.query.QuerySet):
 
     def mark_undeleted(self):
         """removes deleted(+at/by) marks"""
-        self.update(#undelete them
+        undeleted_count = self.filter(deleted=True).update(#undelete them
             deleted = False,
             deleted_by = None,
             deleted_at = None
         )
+        if undeleted_count:
+            tag_trie.invalidate()
 
     def tags_match_some_wildcard(self, wildcard_tags = None):
         """True if any one of the tags in the query set
@@ -162,14 +184,6 @@ class TagQuerySet(models.query.QuerySet):
             tag_filter |= models.Q(name__startswith = next_tag[:-1])
         return self.filter(tag_filter & models.Q(language_code=get_language()))
 
-    def get_related_to_search(self, threads, ignored_tag_names):
-        """Returns at least tag names, along with use counts"""
-        tags = self.filter(threads__in=threads).annotate(local_used_count=models.Count('id')).order_by('-local_used_count', 'name')
-        if ignored_tag_names:
-            tags = tags.exclude(name__in=ignored_tag_names)
-        tags = tags.exclude(deleted = True)
-        return list(tags[:50])
-
 
 class TagManager(BaseQuerySetManager):
     """chainable custom filter query set manager
@@ -216,7 +230,8 @@ class TagManager(BaseQuerySetManager):
         #deal with suggested tags
         if auto_approve or user.can_create_tags():
             #turn previously suggested tags into accepted
-            pre_suggested_tags.update(status = Tag.STATUS_ACCEPTED)
+            if pre_suggested_tags.update(status = Tag.STATUS_ACCEPTED):
+                tag_trie.invalidate()
         else:
             #increment use count and add user to "suggested_by"
             for tag in pre_suggested_tags:
@@ -292,10 +307,156 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        tag = super(Tag, cls).from_db(db, field_names, values)
+        # remember the loaded values, to tell if the tag
+        # autocomplete must be updated when the tag is saved
+        if not tag.get_deferred_fields() & {'name', 'status', 'deleted'}:
+            tag._loaded_autocomplete_key = (tag.name, tag_trie.is_listed(tag))
+        return tag
+
     def decrement_used_count(self, delta=1):
         if self.used_count >= delta:
             self.used_count = self.used_count - delta
 
+def get_tag_combinations(tag_ids):
+    """returns set of pairs (selected tag ids, related tag id)
+    for the thread with the given tags, where the selected tag ids
+    are formatted by the `format_id_list`, there are up to
+    `RELATED_TAGS_MAX_SELECTED` of them and the related tag
+    is any tag of the thread, including the selected ones"""
+    tag_ids = set(tag_ids)
+    combinations = set()
+    for size in range(1, RELATED_TAGS_MAX_SELECTED + 1):
+        for selected_ids in itertools.combinations(sorted(tag_ids), size):
+            key = format_id_list(selected_ids)
+            for tag_id in tag_ids:
+                combinations.add((key, tag_id))
+    return combinations
+
+
+class RelatedTagCountManager(BaseQuerySetManager):
+
+    def add_combinations(self, combinations, delta):
+        """adds ``delta`` to the counts of the combinations,
+        returned by the `get_tag_combinations`"""
+        if not combinations:
+            return
+        keys = set(key for key, _ in combinations)
+        tag_ids = set(tag_id for _, tag_id in combinations)
+        records = self.filter(
+            selected_tag_ids__in=keys, tag_id__in=tag_ids
+        ).values_list('id', 'selected_tag_ids', 'tag_id')
+        record_ids = dict(((key, tag_id), record_id) for record_id, key, tag_id in records)
+
+        ids = [record_ids[combination] for combination in combinations if combination in record_ids]
+        self.filter(id__in=ids).update(count=models.F('count') + delta)
+        if delta > 0:
+            self.bulk_create([
+                self.model(selected_tag_ids=key, tag_id=tag_id, count=delta)
+                for key, tag_id in combinations if (key, tag_id) not in record_ids
+            ])
+        else:
+            self.filter(id__in=ids, count__lte=0).delete()
+
+    def update_for_tags(self, old_tag_ids, new_tag_ids):
+        """updates the counts when the tags of a thread
+        are changed from the old ones to the new ones"""
+        old_combinations = get_tag_combinations(old_tag_ids)
+        new_combinations = get_tag_combinations(new_tag_ids)
+        self.add_combinations(old_combinations - new_combinations, -1)
+        self.add_combinations(new_combinations - old_combinations, 1)
+        tag_names = Tag.objects.filter(
+            id__in=set(old_tag_ids) | set(new_tag_ids)
+        ).values_list('name', flat=True)
+        self.bump_generations(tag_names)
+
+    def get_generation_key(self, tag_name=None):
+        """returns cache key of the generation number of the
+        related tags of the searches by the tag, or of
+        the searches without tags, if the tag is not given"""
+        if tag_name is None:
+            return RELATED_TAGS_GENERATION_CACHE_KEY + '-untagged'
+        tag_hash = hashlib.md5(tag_name.lower().encode('utf-8')).hexdigest()
+        return RELATED_TAGS_GENERATION_CACHE_KEY + '-' + tag_hash
+
+    def get_generations(self, tag_names):
+        """returns list of the generation numbers used in the keys
+        of the cached related tags of the searches by the tags"""
+        keys = [RELATED_TAGS_GENERATION_CACHE_KEY]
+        keys.extend(self.get_generation_key(name) for name in sorted(tag_names))
+        if len(keys) == 1:
+            keys.append(self.get_generation_key())
+        generations = cache.get_many(keys)
+        for key in keys:
+            if key not in generations:
+                # start from the timestamp so that the tags cached
+                # before the number was lost are not mistaken as current
+                cache.add(key, int(time.time() * 1000), None)
+                generations[key] = cache.get(key)
+        return [generations[key] for key in keys]
+
+    def bump_generations(self, tag_names):
+        """marks as stale the cached related tags of the searches,
+        which could find a thread with the tags"""
+        keys = [self.get_generation_key()]
+        keys.extend(self.get_generation_key(name) for name in tag_names)
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                pass # the number will start from the current timestamp
+
+    def bump_generation(self):
+        """marks as stale all cached related tags"""
+        try:
+            cache.incr(RELATED_TAGS_GENERATION_CACHE_KEY)
+        except ValueError:
+            pass
+
+    def get_related_tags(self, selected_tag_ids, language_code, limit):
+        """returns most used tags of the threads having all the selected tags,
+        use counts in these threads are stored as ``local_used_count``"""
+        if not selected_tag_ids:
+            tags = Tag.objects.filter(
+                language_code=language_code, deleted=False, used_count__gt=0
+            ).order_by('-used_count', 'name')[:limit]
+            for tag in tags:
+                tag.local_used_count = tag.used_count
+            return list(tags)
+
+        records = self.filter(
+            selected_tag_ids=format_id_list(selected_tag_ids),
+            tag__deleted=False
+        ).select_related('tag').order_by('-count', 'tag__name')[:limit]
+        tags = list()
+        for record in records:
+            record.tag.local_used_count = record.count
+            tags.append(record.tag)
+        return tags
+
+
+class RelatedTagCount(models.Model):
+    """Number of the threads having the selected tags and the related tag.
+    Records are kept for all combinations of up to `RELATED_TAGS_MAX_SELECTED`
+    selected tags, to show the related tags of the common searches
+    without the aggregation of the thread tags at request time.
+    Threads with the deleted questions are not counted.
+    Records are maintained by the signal handlers and rebuilt with
+    the `askbot_rebuild_related_tag_counts` command.
+    """
+    selected_tag_ids = models.CharField(max_length=64)
+    tag = models.ForeignKey('Tag', related_name='+', on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+
+    objects = RelatedTagCountManager()
+
+    class Meta:
+        app_label = 'askbot'
+        unique_together = ('selected_tag_ids', 'tag')
+
+
 class MarkedTag(models.Model):
     TAG_MARK_REASONS = (
         ('good', ugettext_lazy('interesting')),
@@ -310,6 +471,50 @@ class MarkedTag(models.Model):
         app_label = 'askbot'
 
 
+class MarkedWildcardTagManager(models.Manager):
+
+    def update_for_user(self, user):
+        """replaces records of the user with the wildcard
+        tag selections stored on the user profile"""
+        self.filter(user=user).delete()
+        selections = (
+            ('good', user.interesting_tags),
+            ('bad', user.ignored_tags),
+            ('subscribed', user.subscribed_tags),
+        )
+        records = list()
+        for reason, wildcards in selections:
+            for wildcard in set(wildcards.split()):
+                records.append(
+                    self.model(user=user, reason=reason, prefix=wildcard[:-1])
+                )
+        self.bulk_create(records)
+
+    def get_user_ids_for_tag_names(self, tag_names, reason=None):
+        """returns query set of ids of users who selected
+        wildcards matching some of the tag names, with the given reason"""
+        prefixes = get_tag_name_prefixes(tag_names)
+        records = self.filter(prefix__in=prefixes, reason=reason)
+        return records.values('user_id')
+
+
+class MarkedWildcardTag(models.Model):
+    """Wildcard tag selections of the users, same as those stored on
+    the user profile in the `interesting_tags`, `ignored_tags` and
+    `subscribed_tags` fields. Wildcards are stored without the trailing
+    asterisk, so that the users matching a tag are found with an
+    exact lookup on the prefixes of the tag name.
+    """
+    user = models.ForeignKey(User, related_name='wildcard_tag_selections', on_delete=models.CASCADE)
+    reason = models.CharField(max_length=16, choices=MarkedTag.TAG_MARK_REASONS)
+    prefix = models.CharField(max_length=255, db_index=True)
+
+    objects = MarkedWildcardTagManager()
+
+    class Meta:
+        app_label = 'askbot'
+
+
 class TagSynonym(models.Model):
 
     source_tag_name = models.CharField(max_length=255, unique=True)
@@ -1,8 +1,11 @@
 import datetime
 import logging
 import re
-from django.db import models
-from django.db.models import Q
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.db.utils import IntegrityError
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import fields
@@ -18,9 +21,26 @@ from askbot import const
 from askbot.conf import settings as askbot_settings
 from askbot.utils import functions
 from askbot.models.base import BaseQuerySetManager
+from askbot.models.user_profile import UserProfile, get_profile_cache_key
+from askbot.search.native.analyzers import WORD_RE
 from collections import defaultdict
 
 PERSONAL_GROUP_NAME_PREFIX = '_personal_'
+# cached list of the non-personal groups, per language
+GROUP_LIST_CACHE_KEY = 'askbot-group-list'
+
+
+def get_moderation_items_cache_key(user_id):
+    """key of the cached counts of items
+    on the moderation queue of the given user"""
+    return 'askbot-moderation-items-%d' % user_id
+
+
+def get_users_count_cache_key(group_id, language_code):
+    """key of the cached number of users listed
+    on the users page of the group in the language,
+    ``group_id`` is 0 when the groups are disabled"""
+    return 'askbot-users-count-%d-%s' % (group_id, language_code)
 
 class InvitedModerator(object):
     """Mock user class to represent invited moderators"""
@@ -222,6 +242,51 @@ class ActivityManager(BaseQuerySetManager):
 
         return mention_activity
 
+    def create_new_mentions(
+                self,
+                mentioned_by = None,
+                mentioned_whom = None,
+                mentioned_at = None,
+                mentioned_in = None
+            ):
+        """same as :meth:`create_new_mention`, but creates
+        mentions of many users at once, with a fixed number of queries,
+        the response counts of the mentioned users are not updated
+        """
+        mentioned_whom = list(mentioned_whom)
+        if len(mentioned_whom) == 0:
+            return list()
+
+        kwargs = {
+            'activity_type': const.TYPE_ACTIVITY_MENTION,
+            'active_at': mentioned_at or timezone.now(),
+            'user': mentioned_by,
+            'content_type': ContentType.objects.get_for_model(mentioned_in),
+            'object_id': mentioned_in.id,
+            'is_auditted': False
+        }
+        question = mentioned_in.get_origin_post()
+        activities = [
+            self.model(question=question, **kwargs) for user in mentioned_whom
+        ]
+
+        with transaction.atomic():
+            activities = self.bulk_create(activities)
+            if activities[0].pk is None:
+                #database backend does not return the new ids,
+                #read them back in the order of insertion
+                activity_ids = self.filter(**kwargs).order_by('-id')
+                activity_ids = activity_ids.values_list('id', flat=True)
+                activity_ids = reversed(activity_ids[:len(activities)])
+                for activity, activity_id in zip(activities, activity_ids):
+                    activity.pk = activity_id
+
+            ActivityAuditStatus.objects.bulk_create([
+                ActivityAuditStatus(user=user, activity=activity)
+                for user, activity in zip(mentioned_whom, activities)
+            ])
+        return activities
+
     def get_mentions(
                 self,
                 mentioned_by = None,
@@ -292,6 +357,36 @@ class ActivityAuditStatus(models.Model):
         return (self.status == self.STATUS_NEW)
 
 
+def update_response_counts(user_ids):
+    """Recounts the responses to many users with a single
+    UPDATE statement, same as ``User.update_response_counts()``
+    """
+    user_ids = list(user_ids)
+    if len(user_ids) == 0:
+        return
+
+    activity_types = const.RESPONSE_ACTIVITY_TYPES_FOR_DISPLAY
+    activity_types += (const.TYPE_ACTIVITY_MENTION,)
+
+    def count_responses(status):
+        counts = ActivityAuditStatus.objects.filter(
+                                user=OuterRef('pk'),
+                                status=status,
+                                activity__activity_type__in=activity_types
+                            ).order_by().values('user')
+        counts = counts.annotate(count=Count('pk')).values('count')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    UserProfile.objects.filter(pk__in=user_ids).update(
+        new_response_count=count_responses(ActivityAuditStatus.STATUS_NEW),
+        seen_response_count=count_responses(ActivityAuditStatus.STATUS_SEEN)
+    )
+    #drop the cached profiles, so that the counts are read again
+    cache.delete_many([
+        get_profile_cache_key(User(pk=user_id)) for user_id in user_ids
+    ])
+
+
 class Activity(models.Model):
     """
     We keep some history data for user activities
@@ -326,10 +421,16 @@ class Activity(models.Model):
         """have to use a special method, because django does not allow
         auto-adding to M2M with "through" model
         """
-        for recipient in recipients:
-            #todo: may optimize for bulk addition
-            aas = ActivityAuditStatus(user=recipient, activity=self)
-            aas.save()
+        recipient_ids = set([recipient.id for recipient in recipients])
+        ActivityAuditStatus.objects.bulk_create([
+            ActivityAuditStatus(user_id=user_id, activity=self)
+            for user_id in recipient_ids
+        ])
+        #bulk_create does not send the post_save signals
+        cache.delete_many([
+            get_moderation_items_cache_key(user_id)
+            for user_id in recipient_ids
+        ])
 
     def get_mentioned_user(self):
         assert(self.activity_type == const.TYPE_ACTIVITY_MENTION)
@@ -785,3 +886,70 @@ class BulkTagSubscription(models.Model):
     class Meta:
         app_label = 'askbot'
         ordering = ['-date_added']
+
+
+def get_user_search_terms(text, limit=None):
+    """returns set of the lowercased words of the text,
+    as stored in the user search index, at most ``limit``
+    first distinct words are returned"""
+    terms = set()
+    for word in WORD_RE.finditer(text.lower()):
+        if limit is not None and len(terms) >= limit:
+            break
+        terms.add(word.group()[:UserSearchTerm.MAX_TERM_LENGTH])
+    return terms
+
+
+class UserSearchTermManager(BaseQuerySetManager):
+
+    def is_enabled(self):
+        return django_settings.ASKBOT_USER_SEARCH_INDEX_ENABLED
+
+    def update_for_user(self, user_id, source, text):
+        """replaces the terms of the user from the given source,
+        e.g. 'username', 'real_name' or 'about-en'"""
+        terms = get_user_search_terms(text or '', limit=UserSearchTerm.MAX_TERMS)
+        old_terms = set(
+            self.filter(user_id=user_id, source=source).values_list('term', flat=True)
+        )
+        if old_terms - terms:
+            self.filter(user_id=user_id, source=source, term__in=old_terms - terms).delete()
+        self.bulk_create([
+            self.model(user_id=user_id, source=source, term=term)
+            for term in terms - old_terms
+        ])
+
+    def filter_users(self, users, search_query):
+        """returns users whose names or profile texts
+        have words starting with each word of the query"""
+        words = get_user_search_terms(search_query)
+        if not words:
+            return users.none()
+        for word in words:
+            # range instead of LIKE, so that the index is used with any collation
+            user_ids = self.filter(
+                term__gte=word, term__lt=word + '\uffff'
+            ).values('user_id')
+            users = users.filter(id__in=user_ids)
+        return users
+
+
+class UserSearchTerm(models.Model):
+    """Words of the user names and the profile texts,
+    used for the prefix search in the users directory.
+    Enable with ``ASKBOT_USER_SEARCH_INDEX_ENABLED = True``
+    after running the ``askbot_rebuild_user_search_index`` command.
+    """
+    MAX_TERM_LENGTH = 64
+    # distinct words of a long text, that are indexed
+    MAX_TERMS = 200
+
+    user = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    source = models.CharField(max_length=24)
+    term = models.CharField(max_length=MAX_TERM_LENGTH, db_index=True)
+
+    objects = UserSearchTermManager()
+
+    class Meta:
+        app_label = 'askbot'
+        index_together = ('user', 'source')
@@ -0,0 +1,98 @@
+"""Built-in full text search of the threads.
+
+The index of each language is stored in a separate sqlite
+file within ``ASKBOT_SEARCH_INDEX_DIR``. The index is updated
+when the posts are edited, deleted or restored and when the
+threads are retagged, and can be rebuilt with the management
+command ``askbot_rebuild_search_index``.
+
+Enable with ``ASKBOT_SEARCH_INDEX_ENABLED = True``.
+"""
+import os
+from django.conf import settings as django_settings
+from django.db.models import Case, FloatField, Value, When
+import askbot
+from askbot.search.native.analyzers import get_analyzer, normalize_language_code
+from askbot.search.native.index import SearchIndex
+from askbot.utils.translation import get_language, get_language_codes
+
+TITLE_WEIGHT = 3
+TAGS_WEIGHT = 2
+TEXT_WEIGHT = 1
+
+INDEXES = dict()
+
+
+def is_enabled():
+    return django_settings.ASKBOT_SEARCH_INDEX_ENABLED
+
+
+def get_index(language_code):
+    """returns search index of the language"""
+    language_code = normalize_language_code(language_code)
+    path = os.path.join(
+        django_settings.ASKBOT_SEARCH_INDEX_DIR, language_code + '.sqlite3'
+    )
+    if path not in INDEXES:
+        INDEXES[path] = SearchIndex(path, get_analyzer(language_code))
+    return INDEXES[path]
+
+
+def get_search_languages():
+    """returns codes of the languages whose indexes
+    are searched for the current request"""
+    if askbot.get_lang_mode() == 'user-lang':
+        return get_language_codes()
+    return [get_language()]
+
+
+def get_thread_fields(thread):
+    """returns list of pairs (text, weight) of the thread"""
+    fields = [(thread.title, TITLE_WEIGHT), (thread.tagnames, TAGS_WEIGHT)]
+    texts = thread.posts.filter(
+        deleted=False, post_type__in=('question', 'answer', 'comment')
+    ).values_list('text', flat=True)
+    fields.extend((text, TEXT_WEIGHT) for text in texts if text)
+    return fields
+
+
+def update_thread(thread):
+    """adds the thread to the index of its language,
+    deleted threads are removed from the index"""
+    index = get_index(thread.language_code)
+    has_question = thread.posts.filter(post_type='question', deleted=False).exists()
+    if thread.deleted or not has_question:
+        index.remove_document(thread.id)
+    else:
+        index.add_document(thread.id, get_thread_fields(thread))
+
+
+def remove_thread(thread_id, language_code):
+    get_index(language_code).remove_document(thread_id)
+
+
+def search_threads(query, language_codes=None):
+    """returns list of pairs (thread id, score)
+    of the best matching threads, best first"""
+    language_codes = language_codes or get_search_languages()
+    limit = django_settings.ASKBOT_SEARCH_INDEX_MAX_RESULTS
+    results = list()
+    for language_code in set(map(normalize_language_code, language_codes)):
+        results.extend(get_index(language_code).search(query, limit))
+    results.sort(key=lambda result: result[1], reverse=True)
+    return results[:limit]
+
+
+def run_thread_search(query_set, query):
+    """filters the thread query set by the matching threads
+    and annotates it with the ``relevance`` score"""
+    results = search_threads(query)
+    if not results:
+        return query_set.none()
+    relevance = Case(
+        *[When(id=thread_id, then=Value(score)) for thread_id, score in results],
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+    thread_ids = [thread_id for thread_id, _ in results]
+    return query_set.filter(id__in=thread_ids).annotate(relevance=relevance)
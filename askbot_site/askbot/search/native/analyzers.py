@@ -0,0 +1,85 @@
+"""Analyzers split text into the terms of the search index.
+
+There is one analyzer per language. Words are lowercased and,
+if the optional ``snowballstemmer`` package is installed, stemmed
+with the algorithm named in ``askbot.search.postgresql.LANGUAGE_NAMES``.
+Text in Chinese and Japanese is not separated by spaces,
+so it is indexed as overlapping pairs of characters.
+"""
+import re
+
+try:
+    import snowballstemmer
+except ImportError:
+    snowballstemmer = None
+
+from askbot.search.postgresql import LANGUAGE_NAMES
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+BIGRAM_LANGUAGES = ('ja', 'zh-cn')
+
+
+def normalize_language_code(language_code):
+    """returns key of the language in the ``LANGUAGE_NAMES``,
+    or the base language code, if the language is not listed"""
+    language_code = language_code.lower().replace('_', '-')
+    if language_code in LANGUAGE_NAMES:
+        return language_code
+    return language_code.split('-')[0]
+
+
+def get_stemmer(language_code):
+    """returns stemmer for the language or ``None``"""
+    if snowballstemmer is None:
+        return None
+    name = LANGUAGE_NAMES.get(language_code)
+    if name in snowballstemmer.algorithms():
+        return snowballstemmer.stemmer(name)
+    return None
+
+
+class Analyzer(object):
+    """Splits text into lowercased and,
+    if possible, stemmed words"""
+
+    def __init__(self, language_code):
+        self.language_code = language_code
+        self.stemmer = get_stemmer(language_code)
+
+    def tokenize(self, text):
+        return WORD_RE.findall(text.lower())
+
+    def analyze(self, text):
+        """returns list of the terms in the text"""
+        terms = self.tokenize(text)
+        if self.stemmer:
+            return self.stemmer.stemWords(terms)
+        return terms
+
+
+class BigramAnalyzer(Analyzer):
+    """Splits text into pairs of characters,
+    for the languages written without spaces"""
+
+    def tokenize(self, text):
+        terms = list()
+        for word in super(BigramAnalyzer, self).tokenize(text):
+            if len(word) == 1:
+                terms.append(word)
+            else:
+                terms.extend(word[idx:idx + 2] for idx in range(len(word) - 1))
+        return terms
+
+
+ANALYZERS = dict()
+
+def get_analyzer(language_code):
+    """returns analyzer for the language"""
+    language_code = normalize_language_code(language_code)
+    if language_code not in ANALYZERS:
+        if language_code in BIGRAM_LANGUAGES:
+            analyzer = BigramAnalyzer(language_code)
+        else:
+            analyzer = Analyzer(language_code)
+        ANALYZERS[language_code] = analyzer
+    return ANALYZERS[language_code]
@@ -0,0 +1,140 @@
+"""Inverted index stored in an sqlite database file.
+
+Each document is a list of fields with weights, the weighted
+frequencies of the terms are stored in the postings table
+and the matching documents are ranked with the BM25 formula.
+"""
+import math
+import os
+import sqlite3
+import threading
+from collections import Counter
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS documents (
+        doc_id INTEGER PRIMARY KEY,
+        length INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS postings (
+        term TEXT NOT NULL,
+        doc_id INTEGER NOT NULL,
+        frequency INTEGER NOT NULL,
+        PRIMARY KEY (term, doc_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS postings_doc_id ON postings (doc_id)",
+)
+
+SEARCH_QUERY = """
+    WITH query_terms(term, idf) AS (VALUES %s)
+    SELECT postings.doc_id, SUM(
+        query_terms.idf * postings.frequency * (? + 1) / (
+            postings.frequency + ? * (1 - ? + ? * documents.length / ?)
+        )
+    ) AS score
+    FROM query_terms
+    JOIN postings ON postings.term = query_terms.term
+    JOIN documents ON documents.doc_id = postings.doc_id
+    GROUP BY postings.doc_id
+    ORDER BY score DESC, postings.doc_id DESC
+    LIMIT ?
+"""
+
+
+class SearchIndex(object):
+    """Inverted index of the documents in one language"""
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, path, analyzer):
+        self.path = path
+        self.analyzer = analyzer
+        self.local = threading.local()
+
+    def get_connection(self):
+        """returns connection to the index file, connections are
+        not shared between the threads and the forked processes"""
+        pid = os.getpid()
+        if getattr(self.local, 'pid', None) != pid:
+            directory = os.path.dirname(self.path)
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            with connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+            self.local.connection = connection
+            self.local.pid = pid
+        return self.local.connection
+
+    def close(self):
+        if getattr(self.local, 'pid', None) == os.getpid():
+            self.local.connection.close()
+        self.local.pid = None
+
+    def get_term_frequencies(self, fields):
+        """returns counter of the weighted term frequencies,
+        ``fields`` is a list of pairs (text, weight)"""
+        frequencies = Counter()
+        for text, weight in fields:
+            for term in self.analyzer.analyze(text):
+                frequencies[term] += weight
+        return frequencies
+
+    def add_document(self, doc_id, fields):
+        """adds or replaces the document"""
+        frequencies = self.get_term_frequencies(fields)
+        connection = self.get_connection()
+        with connection:
+            connection.execute('DELETE FROM postings WHERE doc_id = ?', (doc_id,))
+            connection.execute(
+                'INSERT OR REPLACE INTO documents (doc_id, length) VALUES (?, ?)',
+                (doc_id, sum(frequencies.values()))
+            )
+            connection.executemany(
+                'INSERT INTO postings (term, doc_id, frequency) VALUES (?, ?, ?)',
+                [(term, doc_id, count) for term, count in frequencies.items()]
+            )
+
+    def remove_document(self, doc_id):
+        connection = self.get_connection()
+        with connection:
+            connection.execute('DELETE FROM postings WHERE doc_id = ?', (doc_id,))
+            connection.execute('DELETE FROM documents WHERE doc_id = ?', (doc_id,))
+
+    def clear(self):
+        connection = self.get_connection()
+        with connection:
+            connection.execute('DELETE FROM postings')
+            connection.execute('DELETE FROM documents')
+
+    def search(self, text, limit):
+        """returns list of pairs (doc_id, score) of the documents
+        matching any of the terms in the text, best matches first"""
+        terms = set(self.analyzer.analyze(text))
+        if not terms:
+            return list()
+
+        connection = self.get_connection()
+        doc_count, average_length = connection.execute(
+            'SELECT COUNT(*), AVG(length) FROM documents'
+        ).fetchone()
+        if doc_count == 0:
+            return list()
+
+        placeholders = ', '.join('?' * len(terms))
+        document_frequencies = connection.execute(
+            'SELECT term, COUNT(*) FROM postings WHERE term IN (%s) GROUP BY term' % placeholders,
+            list(terms)
+        ).fetchall()
+        if not document_frequencies:
+            return list()
+
+        params = list()
+        for term, frequency in document_frequencies:
+            idf = math.log(1 + (doc_count - frequency + 0.5) / (frequency + 0.5))
+            params.extend((term, idf))
+        params.extend((self.K1, self.K1, self.B, self.B, average_length or 1, limit))
+        values = ', '.join(['(?, ?)'] * len(document_frequencies))
+        return connection.execute(SEARCH_QUERY % values, params).fetchall()
@@ -43,6 +43,71 @@ def setup_full_text_search(script_path):
     finally:
         cursor.close()
 
+# triggers maintaining the text search vectors of the threads and posts,
+# created by the thread_and_post_models_03012016.plsql script
+SEARCH_VECTOR_TRIGGERS = (
+    ('thread_search_vector_update_trigger', 'askbot_thread',
+     'BEFORE UPDATE ON askbot_thread FOR EACH ROW '
+     'EXECUTE PROCEDURE thread_update_trigger()'),
+    ('thread_search_vector_insert_trigger', 'askbot_thread',
+     'BEFORE INSERT ON askbot_thread FOR EACH ROW '
+     'EXECUTE PROCEDURE thread_insert_trigger()'),
+    ('post_search_vector_insert_trigger', 'askbot_post',
+     'BEFORE INSERT ON askbot_post FOR EACH ROW '
+     'EXECUTE PROCEDURE post_trigger()'),
+    ('post_search_vector_update_trigger', 'askbot_post',
+     'BEFORE UPDATE ON askbot_post FOR EACH ROW '
+     'WHEN ((old.text IS DISTINCT FROM new.text) '
+     'OR (old.text_search_vector IS DISTINCT FROM new.text_search_vector)) '
+     'EXECUTE PROCEDURE post_trigger()'),
+)
+
+# same computation as in the plsql script, limited to the given threads
+UPDATE_SEARCH_VECTORS_QUERIES = (
+    """UPDATE askbot_post SET text_search_vector =
+        get_post_tsv(text, post_type, language_code)
+        WHERE thread_id = ANY(%s) AND post_type IN ('answer', 'comment', 'question')""",
+    """UPDATE askbot_post AS q SET text_search_vector =
+        text_search_vector || get_dependent_comments_tsv(q.id)
+        WHERE thread_id = ANY(%s) AND post_type IN ('question', 'answer')""",
+    """UPDATE askbot_thread SET title_search_vector =
+        get_thread_tsv(title, tagnames, language_code)
+        WHERE id = ANY(%s)""",
+    """UPDATE askbot_thread AS t SET text_search_vector = title_search_vector ||
+        get_dependent_answers_tsv(t.id, t.language_code) ||
+        get_thread_question_tsv(t.id, t.language_code)
+        WHERE id = ANY(%s)""",
+)
+
+def drop_search_vector_triggers():
+    """drops the triggers, after that the text search vectors
+    are updated only by the `update_thread_search_vectors`"""
+    with connection.cursor() as cursor:
+        for name, table, _ in SEARCH_VECTOR_TRIGGERS:
+            cursor.execute('DROP TRIGGER IF EXISTS %s ON %s' % (name, table))
+
+def create_search_vector_triggers():
+    """creates the triggers dropped by the `drop_search_vector_triggers`"""
+    drop_search_vector_triggers()
+    with connection.cursor() as cursor:
+        for name, _, definition in SEARCH_VECTOR_TRIGGERS:
+            cursor.execute('CREATE TRIGGER %s %s' % (name, definition))
+
+def lock_search_vector_tables():
+    """blocks the writes to the tables with the text search vectors
+    until the end of the transaction"""
+    tables = sorted(set(table for _, table, _ in SEARCH_VECTOR_TRIGGERS))
+    with connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE %s IN SHARE ROW EXCLUSIVE MODE' % ', '.join(tables))
+
+def update_thread_search_vectors(thread_ids):
+    """recomputes the text search vectors of the threads and of their
+    posts, the triggers must be dropped, otherwise the vectors of
+    the posts would be added to the vectors of the threads twice"""
+    with connection.cursor() as cursor:
+        for query in UPDATE_SEARCH_VECTORS_QUERIES:
+            cursor.execute(query, [list(thread_ids)])
+
 def run_full_text_search(query_set, query_text, text_search_vector_name):
     """runs full text search against the query set and
     the search text. All words in the query text are
@@ -98,6 +163,16 @@ def run_full_text_search(query_set, query_text, text_search_vector_name):
     return result_qs
 
 
+def run_post_search(query_set, query):
+    """filters posts containing all words of the query,
+    using the indexed text search vectors of the posts"""
+    language_name = LANGUAGE_NAMES.get(get_language(), 'english')
+    return query_set.extra(
+        where=['askbot_post.text_search_vector @@ plainto_tsquery(%s, %s)'],
+        params=(language_name, query)
+    )
+
+
 def run_thread_search(query_set, query):
     """runs search for full thread content"""
     return run_full_text_search(query_set, query, 'text_search_vector');
@@ -0,0 +1,191 @@
+"""Profiling of the question searches run by
+`ThreadManager.run_advanced_search`.
+
+A share of the searches, given by the
+``ASKBOT_SEARCH_PROFILE_SAMPLE_RATE`` setting, is measured:
+SQL statements executed while the search is built and its page
+is loaded by `ThreadManager.get_questions_page` are recorded
+along with the wall time and the number of the found threads.
+
+Measurements are added to the statistics of the search "shape",
+a string describing which filters the search used, see
+`get_search_shape`. Searches slower than
+``ASKBOT_SEARCH_SLOW_LOG_THRESHOLD`` milliseconds are also saved
+to the slow search log, optionally with the query plan.
+
+Statistics and the log are shown by the ``askbot_search_stats``
+management command.
+"""
+import logging
+import random
+import time
+from contextlib import contextmanager
+from django.conf import settings as django_settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+import askbot
+from askbot import const
+
+LOG = logging.getLogger(__name__)
+
+TAG_FILTER_STRATEGY_NAMES = {
+    const.INCLUDE_ALL: 'all',
+    const.EXCLUDE_IGNORED: 'exclude-ignored',
+    const.INCLUDE_INTERESTING: 'include-interesting',
+    const.INCLUDE_SUBSCRIBED: 'include-subscribed',
+}
+
+
+def get_search_shape(search_state, request_user, uses_listing):
+    """returns string describing the filters of the search,
+    without their values, e.g. the number of the tags
+    but not their names, so that the similar searches
+    are counted together"""
+    from askbot.conf import settings as askbot_settings  # Avoid circular import
+    if request_user.is_authenticated:
+        strategy = request_user.display_tag_filter_strategy
+        strategy_name = TAG_FILTER_STRATEGY_NAMES.get(strategy, str(strategy))
+        if strategy == const.INCLUDE_INTERESTING:
+            wildcards = request_user.has_interesting_wildcard_tags()
+        elif strategy == const.EXCLUDE_IGNORED:
+            wildcards = request_user.has_ignored_wildcard_tags()
+        else:
+            wildcards = False
+    else:
+        strategy_name = 'anonymous'
+        wildcards = False
+
+    bits = [
+        ('scope', search_state.scope),
+        ('sort', search_state.sort),
+        ('tags', len(search_state.unified_tags())),
+        ('strategy', strategy_name),
+        ('wildcards', int(bool(wildcards))),
+        ('query', int(bool(search_state.stripped_query))),
+        ('title', int(bool(search_state.query_title))),
+        ('users', int(bool(search_state.query_users))),
+        ('author', int(bool(search_state.author))),
+        ('cursor', int(bool(search_state.cursor))),
+        ('groups', int(bool(askbot_settings.GROUPS_ENABLED))),
+        ('premoderation', int(askbot_settings.CONTENT_MODERATION_MODE == 'premoderation')),
+        ('lang', askbot.get_lang_mode()),
+        ('listing', int(bool(uses_listing))),
+    ]
+    return ' '.join('%s=%s' % bit for bit in bits)
+
+
+class SearchProfile(object):
+    """Measurements of one search"""
+
+    def __init__(self, shape, search_url):
+        self.shape = shape
+        self.search_url = search_url
+        self.started_at = time.time()
+        self.queries = list()# pairs (sql, milliseconds)
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started_at = time.time()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.time() - started_at) * 1000
+            if params and not many:
+                try:
+                    sql = sql % tuple(repr(param) for param in params)
+                except (TypeError, ValueError):
+                    pass
+            self.queries.append((sql, duration))
+
+    @contextmanager
+    def capture_queries(self):
+        """records the SQL statements executed in the block"""
+        with connection.execute_wrapper(self.execute_wrapper):
+            yield
+
+    def get_duration(self):
+        """milliseconds since the start of the search"""
+        return (time.time() - self.started_at) * 1000
+
+    def get_sql(self):
+        return '\n\n'.join(
+            '-- %.1f ms\n%s' % (duration, sql) for sql, duration in self.queries
+        )
+
+    def record(self, qs, found_count):
+        """adds the search to the statistics, saves it to
+        the slow search log if necessary. Database errors are
+        logged, so that they do not break the search"""
+        duration = self.get_duration()
+        is_slow = duration >= django_settings.ASKBOT_SEARCH_SLOW_LOG_THRESHOLD
+        plan = ''
+        if is_slow and django_settings.ASKBOT_SEARCH_SLOW_LOG_EXPLAIN:
+            try:
+                with transaction.atomic():
+                    plan = qs.explain()
+            except DatabaseError:
+                LOG.exception('could not explain the search query')
+        try:
+            with transaction.atomic():
+                self.save_stats(duration, found_count, is_slow)
+                if is_slow:
+                    self.save_slow_search(duration, found_count, plan)
+        except DatabaseError:
+            LOG.exception('could not save the search profile')
+
+    def save_stats(self, duration, found_count, is_slow):
+        from askbot.models import SearchShapeStats
+        updates = {
+            'search_count': F('search_count') + 1,
+            'slow_count': F('slow_count') + int(is_slow),
+            'total_ms': F('total_ms') + duration,
+            'max_ms': Greatest(F('max_ms'), duration),
+            'total_found': F('total_found') + found_count,
+            'total_queries': F('total_queries') + len(self.queries),
+            'last_search_at': timezone.now()
+        }
+        stats = SearchShapeStats.objects.filter(shape=self.shape)
+        if stats.update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                SearchShapeStats.objects.create(
+                    shape=self.shape,
+                    search_count=1,
+                    slow_count=int(is_slow),
+                    total_ms=duration,
+                    max_ms=duration,
+                    total_found=found_count,
+                    total_queries=len(self.queries),
+                    last_search_at=updates['last_search_at']
+                )
+        except IntegrityError:
+            # created by a concurrent search
+            stats.update(**updates)
+
+    def save_slow_search(self, duration, found_count, plan):
+        """adds the search to the log and drops the oldest
+        records beyond ``ASKBOT_SEARCH_SLOW_LOG_SIZE``"""
+        from askbot.models import SlowSearch
+        slow_search = SlowSearch.objects.create(
+            shape=self.shape,
+            search_url=self.search_url,
+            duration_ms=duration,
+            found_count=found_count,
+            query_count=len(self.queries),
+            sql=self.get_sql(),
+            plan=plan
+        )
+        max_id = slow_search.id - django_settings.ASKBOT_SEARCH_SLOW_LOG_SIZE
+        SlowSearch.objects.filter(id__lte=max_id).delete()
+
+
+def start_profile(search_state, request_user, uses_listing):
+    """returns profile of the search if the search
+    is sampled for profiling, `None` otherwise"""
+    rate = django_settings.ASKBOT_SEARCH_PROFILE_SAMPLE_RATE
+    if not rate or random.random() >= rate:
+        return None
+    shape = get_search_shape(search_state, request_user, uses_listing)
+    return SearchProfile(shape, search_state.full_url())
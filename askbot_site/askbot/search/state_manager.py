@@ -3,6 +3,7 @@ import re
 import urllib.request, urllib.parse, urllib.error
 import copy
 
+from django.conf import settings as django_settings
 from django.urls import reverse
 from django.utils.http import urlencode
 from django.utils.encoding import smart_str
@@ -84,13 +85,20 @@ def parse_query(query):
 
 class SearchState(object):
 
+    # sort methods supporting the cursor ("keyset") pagination,
+    # the cursor is "<value of the sort field>_<thread id>" of the last
+    # thread on the previous page, datetimes are in microseconds
+    CURSOR_SORT_METHODS = ('activity-desc', 'age-desc', 'votes-desc')
+    CURSOR_RE = re.compile(r'^-?\d+_\d+$')
+
     @classmethod
     def get_empty(cls):
         return cls(scope=None, sort=None, query=None, tags=None, author=None, page=None, page_size=None, user_logged_in=None)
 
     def __init__(self,
         scope=None, sort=None, query=None, tags=None,
-        author=None, page=None, page_size=None, user_logged_in=False
+        author=None, page=None, page_size=None, user_logged_in=False,
+        cursor=None
     ):
         # INFO: zip(*[('a', 1), ('b', 2)])[0] == ('a', 'b')
         if (scope not in list(zip(*const.POST_SCOPE_LIST))[0]) or (scope == 'followed' and not user_logged_in):
@@ -142,6 +150,11 @@ class SearchState(object):
         default_page_size = int(askbot_settings.DEFAULT_QUESTIONS_PAGE_SIZE)
         self.page_size = int(page_size) if page_size else default_page_size
 
+        if cursor and self.supports_cursor() and self.CURSOR_RE.match(cursor):
+            self.cursor = cursor
+        else:
+            self.cursor = None
+
         self._questions_url = reverse('questions')
 
     def __str__(self):
@@ -160,10 +173,38 @@ class SearchState(object):
     def full_ask_url(self):
         return reverse('ask') + self.ask_query_string()
 
+    def supports_cursor(self):
+        """True if the cursor pagination can be used
+        with the current sort method"""
+        return django_settings.ASKBOT_KEYSET_PAGINATION_ENABLED \
+            and self.sort in self.CURSOR_SORT_METHODS
+
+    def get_cursor_value(self):
+        """returns a tuple (sort field value, thread id)
+        parsed from the cursor or `None`"""
+        if not self.cursor:
+            return None
+        value, thread_id = self.cursor.rsplit('_', 1)
+        return int(value), int(thread_id)
+
     def unified_tags(self):
         "Returns tags both from tag selector and extracted from query"
         return (self.query_tags or []) + (self.tags or [])
 
+    def canonical_key(self):
+        """returns string identifying the found threads and their
+        order, the page and the cursor are left out and the tags
+        are sorted, so that the equivalent searches have the same key"""
+        return repr((
+            self.scope,
+            self.sort,
+            sorted(set(self.unified_tags())),
+            self.stripped_query,
+            self.query_title,
+            sorted(self.query_users or []),
+            self.author
+        ))
+
     #
     # Safe characters in urlquote() according to http://www.ietf.org/rfc/rfc1738.txt:
     #
@@ -196,6 +237,7 @@ class SearchState(object):
             r'(%s)?' % r'/tags:(?P<tags>[\w+.#,-]+)' + # Should match: const.TAG_CHARS + ','; TODO: Is `#` char decoded by the time URLs are processed ??
             r'(%s)?' % r'/author:(?P<author>\d+)' +
             r'(%s)?' % r'/page:(?P<page>\d+)' +
+            r'(%s)?' % r'/after:(?P<cursor>-?\d+_\d+)' +
             r'(%s)?' % r'/query:(?P<query>.+)' +  # INFO: query is last, b/c it can contain slash!!!
         """
 
@@ -206,6 +248,8 @@ class SearchState(object):
             lst.append('author:' + str(self.author))
         if self.page:
             lst.append('page:' + str(self.page))
+        if self.cursor:
+            lst.append('after:' + self.cursor)
         if self.query:
             lst.append('query:' + urllib.parse.quote(smart_str(self.query), safe=self.SAFE_CHARS))
         return '/'.join(lst) + '/'
@@ -213,6 +257,7 @@ class SearchState(object):
     def deepcopy(self): # TODO: test me
         "Used to contruct a new SearchState for manipulation, e.g. for adding/removing tags"
         ss = copy.copy(self) #SearchState.get_empty()
+        ss.cursor = None # cursor is only valid for the current state
 
         #ss.scope = self.scope
         #ss.sort = self.sort
@@ -269,9 +314,13 @@ class SearchState(object):
         ss.page = 1
         return ss
 
-    def change_page(self, new_page):
+    def change_page(self, new_page, cursor=None):
+        """``cursor`` - optional cursor of the last thread
+        on the page preceding the ``new_page``"""
         ss = self.deepcopy()
         ss.page = new_page
+        if cursor and ss.supports_cursor():
+            ss.cursor = cursor
         return ss
 
 
@@ -0,0 +1,347 @@
+"""Prefix trie of the tag names for the tag autocomplete
+and the wildcard tag lookups.
+
+Each process keeps one trie per language, built from the accepted
+and not deleted tags in a background thread, so the request is not
+held while the trie is built. Until the trie is ready, lookups are
+answered with a range query of the indexed tag names, which,
+unlike the trie, is case-sensitive. The tries are rebuilt
+in the background every ``MAX_AGE`` seconds, to refresh the ranking
+by the tag use counts, and the old trie is used until the new
+one replaces it.
+
+Only the prefixes are matched, the tags containing the typed
+text elsewhere in the name are not offered.
+
+Added, renamed and removed tags are recorded in the numbered cache
+slots and applied to the tries of all processes. The trie
+is rebuilt if the slots expired or too many tags were changed.
+"""
+import heapq
+import threading
+import time
+from django.core.cache import cache
+from django.db import connection, transaction
+from askbot import const
+
+CHANGES_SEQ_KEY = 'askbot-tag-trie-seq'
+CHANGE_SLOT_KEY = 'askbot-tag-trie-slot-%d'
+# seconds between the checks of the recorded changes
+CHECK_INTERVAL = 1
+# if more tags were changed since the last check, the tries are rebuilt
+MAX_CHANGES = 1000
+MAX_AGE = 600
+# matches kept on the trie nodes, maximum number of the returned tags
+TOP_SIZE = 50
+
+
+class TrieNode(object):
+    __slots__ = ('children', 'entries', 'count', 'top')
+
+    def __init__(self):
+        self.children = dict()
+        # tags with the name ending at this node,
+        # tag id -> (-used_count, name), names are case-insensitive
+        self.entries = dict()
+        # number of the tags in the subtree
+        self.count = 0
+        # best matches of the subtree, filled on the first lookup
+        self.top = None
+
+    def iter_entries(self):
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            for entry in node.entries.values():
+                yield entry
+            nodes.extend(node.children.values())
+
+
+class TagTrie(object):
+    """Tag names of one language, ranked by the use counts"""
+
+    def __init__(self, tags=()):
+        self.root = TrieNode()
+        self.names = dict()# tag id -> name
+        self.lock = threading.Lock()
+        for tag_id, name, used_count in tags:
+            self.add(tag_id, name, used_count)
+
+    def get_path(self, prefix, create=False):
+        """returns list of the nodes from the root
+        to the node of the prefix, or ``None``"""
+        node = self.root
+        path = [node]
+        for char in prefix.lower():
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[char] = TrieNode()
+            node = child
+            path.append(node)
+        return path
+
+    def add(self, tag_id, name, used_count):
+        """adds the tag or updates its name and use count"""
+        with self.lock:
+            self._remove(tag_id)
+            path = self.get_path(name, create=True)
+            path[-1].entries[tag_id] = (-used_count, name)
+            for node in path:
+                node.count += 1
+                node.top = None
+            self.names[tag_id] = name
+
+    def remove(self, tag_id):
+        with self.lock:
+            self._remove(tag_id)
+
+    def _remove(self, tag_id):
+        name = self.names.pop(tag_id, None)
+        if name is None:
+            return
+        path = self.get_path(name)
+        del path[-1].entries[tag_id]
+        for node in path:
+            node.count -= 1
+            node.top = None
+        # prune the branch left without tags
+        for parent, node, char in zip(path, path[1:], name.lower()):
+            if node.count == 0:
+                del parent.children[char]
+                break
+
+    def count(self, prefix):
+        """returns number of the tags starting with the prefix"""
+        with self.lock:
+            path = self.get_path(prefix)
+            return path[-1].count if path else 0
+
+    def search(self, prefix, limit=10):
+        """returns names of the most used tags
+        starting with the prefix"""
+        with self.lock:
+            path = self.get_path(prefix)
+            if path is None:
+                return list()
+            node = path[-1]
+            if node.top is None:
+                node.top = heapq.nsmallest(TOP_SIZE, node.iter_entries())
+            return [name for _, name in node.top[:limit]]
+
+
+LOCAL_TRIES = dict()# language code -> trie
+LOCAL_STATE = {'checked_at': 0, 'building': set()}
+LOCAL_LOCK = threading.Lock()
+# tests build the tries in the request, to see the uncommitted tags
+BUILD_IN_BACKGROUND = True
+
+
+def get_listed_tags(language_code, **filters):
+    from askbot.models import Tag
+    return Tag.objects.filter(
+        language_code=language_code,
+        deleted=False,
+        status=Tag.STATUS_ACCEPTED,
+        **filters
+    )
+
+
+def get_seq():
+    return cache.get(CHANGES_SEQ_KEY, 0)
+
+
+def build_trie(language_code):
+    seq = get_seq()
+    tags = get_listed_tags(language_code).values_list('id', 'name', 'used_count')
+    trie = TagTrie(tags.iterator())
+    trie.built_at = time.time()
+    # changes recorded later are applied on the next lookup
+    trie.seq = seq
+    return trie
+
+
+def replace_trie(language_code):
+    """builds the trie and replaces the one used by the lookups"""
+    try:
+        trie = build_trie(language_code)
+        with LOCAL_LOCK:
+            LOCAL_TRIES[language_code] = trie
+            LOCAL_STATE['checked_at'] = 0
+    finally:
+        with LOCAL_LOCK:
+            LOCAL_STATE['building'].discard(language_code)
+        if BUILD_IN_BACKGROUND:
+            connection.close()
+
+
+def start_build(language_code):
+    """starts building the trie in the background thread,
+    the language must be marked as being built"""
+    if BUILD_IN_BACKGROUND:
+        thread = threading.Thread(target=replace_trie, args=(language_code,))
+        thread.daemon = True
+        thread.start()
+    else:
+        replace_trie(language_code)
+
+
+def apply_changes(trie, changes):
+    for tag_id, name, used_count in changes:
+        if name is None:
+            trie.remove(tag_id)
+        else:
+            trie.add(tag_id, name, used_count)
+
+
+def sync_local_tries():
+    """applies the changes of the tags recorded since the tries
+    were last synchronized, returns set of the languages
+    of the tries to rebuild, where the changes cannot be applied"""
+    stale = set()
+    now = time.time()
+    if now - LOCAL_STATE['checked_at'] < CHECK_INTERVAL:
+        return stale
+    LOCAL_STATE['checked_at'] = now
+    seq = get_seq()
+    for language_code, trie in list(LOCAL_TRIES.items()):
+        if trie.seq == seq:
+            continue
+        if seq < trie.seq or seq - trie.seq > MAX_CHANGES:
+            stale.add(language_code)
+            continue
+        slot_keys = [CHANGE_SLOT_KEY % slot for slot in range(trie.seq + 1, seq + 1)]
+        changes = cache.get_many(slot_keys)
+        if len(changes) != len(slot_keys):
+            stale.add(language_code)
+            continue
+        for key in slot_keys:
+            change_language, tag_changes = changes[key]
+            if change_language is None:
+                # bulk update of the tags
+                stale.add(language_code)
+                break
+            if change_language == language_code:
+                apply_changes(trie, tag_changes)
+        else:
+            trie.seq = seq
+    return stale
+
+
+def get_tag_trie(language_code):
+    """returns trie of the tags in the language,
+    or ``None`` if it is not built yet"""
+    with LOCAL_LOCK:
+        stale = sync_local_tries()
+        trie = LOCAL_TRIES.get(language_code)
+        if trie is None or time.time() - trie.built_at > MAX_AGE:
+            stale.add(language_code)
+        # the tries already being built are not built again
+        builds = stale - LOCAL_STATE['building']
+        LOCAL_STATE['building'].update(builds)
+
+    for build_language in builds:
+        start_build(build_language)
+
+    if language_code in builds and not BUILD_IN_BACKGROUND:
+        with LOCAL_LOCK:
+            trie = LOCAL_TRIES.get(language_code)
+    return trie
+
+
+def get_prefix_tags(language_code, prefix):
+    """returns query set of the tags starting with the prefix,
+    a range query of the index of the tag names"""
+    if prefix == '':
+        return get_listed_tags(language_code)
+    return get_listed_tags(
+        language_code, name__gte=prefix, name__lt=prefix + '\uffff'
+    )
+
+
+def search(language_code, prefix, limit=10):
+    """returns names of the most used tags
+    starting with the prefix"""
+    trie = get_tag_trie(language_code)
+    if trie is not None:
+        return trie.search(prefix, limit=limit)
+    tags = get_prefix_tags(language_code, prefix).order_by('-used_count', 'name')
+    return list(tags.values_list('name', flat=True)[:limit])
+
+
+def count(language_code, prefix):
+    """returns number of the tags starting with the prefix"""
+    trie = get_tag_trie(language_code)
+    if trie is not None:
+        return trie.count(prefix)
+    return get_prefix_tags(language_code, prefix).count()
+
+
+def clear_local_tries():
+    with LOCAL_LOCK:
+        LOCAL_TRIES.clear()
+        LOCAL_STATE['checked_at'] = 0
+        LOCAL_STATE['building'].clear()
+
+
+def record_change(language_code, changes):
+    """records changes of the tags, list of
+    (tag id, name, use count), name is ``None`` for the removed
+    tags. Changes with the language ``None`` make
+    all processes rebuild all their tries"""
+    cache.add(CHANGES_SEQ_KEY, 0, const.LONG_TIME)
+    slot = cache.incr(CHANGES_SEQ_KEY)
+    # older changes are not needed, the tries are rebuilt every MAX_AGE seconds
+    cache.set(CHANGE_SLOT_KEY % slot, (language_code, changes), MAX_AGE)
+
+
+def notify_other_processes(language_code, changes):
+    """records the changes after the commit, so that
+    the other processes do not apply them too early"""
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: record_change(language_code, changes))
+    else:
+        record_change(language_code, changes)
+
+
+def invalidate():
+    """makes all processes rebuild their tries,
+    to be called after the bulk updates of the tags"""
+    notify_other_processes(None, [])
+
+
+def is_listed(tag):
+    """True if the tag is offered in the autocomplete"""
+    return not tag.deleted and tag.status == tag.STATUS_ACCEPTED
+
+
+def update_tag(tag, created=False):
+    """updates the saved tag in the local trie, when the name of the tag
+    was changed, or the tag was added or dropped from the autocomplete,
+    the change is sent to the other processes"""
+    listed = is_listed(tag)
+    loaded = getattr(tag, '_loaded_autocomplete_key', None)
+    was_listed = not created and (loaded is None or loaded[1])
+    changed = loaded != (tag.name, listed)
+    tag._loaded_autocomplete_key = (tag.name, listed)
+
+    if listed:
+        change = (tag.id, tag.name, tag.used_count)
+    else:
+        change = (tag.id, None, 0)
+
+    with LOCAL_LOCK:
+        trie = LOCAL_TRIES.get(tag.language_code)
+        if trie is not None:
+            apply_changes(trie, [change])
+    if changed and (listed or was_listed):
+        notify_other_processes(tag.language_code, [change])
+
+
+def remove_tag(tag):
+    with LOCAL_LOCK:
+        trie = LOCAL_TRIES.get(tag.language_code)
+        if trie is not None:
+            trie.remove(tag.id)
+    notify_other_processes(tag.language_code, [(tag.id, None, 0)])
@@ -0,0 +1,317 @@
+"""Trigram index of the question titles for the title suggestions
+shown while the question is typed in the ask form.
+
+Each process keeps one index per language, built from the threads
+with not deleted questions in a background thread, so the request
+is not held while the index is built. Until the index is ready,
+`search` returns ``None`` and the titles are matched with
+the database query. The index entries store the denormalized
+data needed in the suggestions, so the lookup does not query
+the database.
+
+Changed threads are recorded in the numbered cache slots, once
+the transaction is committed. On each lookup the process reloads
+the threads recorded since its last lookup. If the slots expired
+or too many threads were changed, the index is rebuilt in the
+background and the old one is used until the new one replaces it.
+"""
+import heapq
+import threading
+from collections import Counter
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils.http import urlquote as django_urlquote
+import askbot
+from askbot import const
+from askbot.search.native.analyzers import WORD_RE
+from askbot.utils.slug import slugify
+from askbot.utils.translation import get_language
+
+CHANGES_SEQ_KEY = 'askbot-title-index-seq'
+CHANGE_SLOT_KEY = 'askbot-title-index-slot-%d'
+# if more threads were changed since the last lookup, the indexes are rebuilt
+MAX_CHANGES = 1000
+# seconds the changes are kept, the processes idle for longer
+# find the slots missing and rebuild their indexes
+CHANGE_SLOT_TIMEOUT = 600
+# share of the query trigrams, that must be in the suggested title
+MIN_COVERAGE = 0.5
+MAX_RESULTS = 30
+
+
+def get_trigrams(text, prefix=False):
+    """returns set of trigrams of the words in the text,
+    words are padded with two spaces on the left and one
+    on the right. If ``prefix`` is true, the last word
+    is treated as incomplete and not padded on the right"""
+    words = WORD_RE.findall(text.lower())
+    trigrams = set()
+    for idx, word in enumerate(words):
+        padded = '  ' + word
+        if not (prefix and idx == len(words) - 1):
+            padded += ' '
+        trigrams.update(padded[pos:pos + 3] for pos in range(len(padded) - 2))
+    return trigrams
+
+
+class TitleEntry(object):
+    __slots__ = ('thread_id', 'question_id', 'title', 'tagnames',
+                 'answer_count', 'trigram_count')
+
+    def __init__(self, thread_id, question_id, title, tagnames, answer_count):
+        self.thread_id = thread_id
+        self.question_id = question_id
+        self.title = title
+        self.tagnames = tagnames
+        self.answer_count = answer_count
+        self.trigram_count = 0
+
+    def has_tag(self, tag_name):
+        return tag_name in self.tagnames.split()
+
+    def get_absolute_url(self):
+        """same as the url of the question post,
+        the index is searched in the language of the thread"""
+        url = reverse('question', args=[self.question_id])
+        return url + django_urlquote(slugify(self.title)) + '/'
+
+
+class TitleIndex(object):
+    """Trigram postings of the titles of one language"""
+
+    def __init__(self, entries=()):
+        self.entries = dict()# thread id -> entry
+        self.postings = dict()# trigram -> set of thread ids
+        self.lock = threading.Lock()
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        """adds or replaces the entry of the thread"""
+        with self.lock:
+            self._remove(entry.thread_id)
+            trigrams = get_trigrams(entry.title)
+            entry.trigram_count = len(trigrams)
+            for trigram in trigrams:
+                self.postings.setdefault(trigram, set()).add(entry.thread_id)
+            self.entries[entry.thread_id] = entry
+
+    def remove(self, thread_id):
+        with self.lock:
+            self._remove(thread_id)
+
+    def _remove(self, thread_id):
+        entry = self.entries.pop(thread_id, None)
+        if entry is None:
+            return
+        for trigram in get_trigrams(entry.title):
+            thread_ids = self.postings[trigram]
+            thread_ids.discard(thread_id)
+            if not thread_ids:
+                del self.postings[trigram]
+
+    def search(self, query, tag_name=None, limit=MAX_RESULTS):
+        """returns list of entries of the titles best matching
+        the query, the last word of the query may be incomplete.
+        Titles are ranked by the number of the shared trigrams,
+        then the shorter and the newer ones go first."""
+        query_trigrams = get_trigrams(query, prefix=not query[-1:].isspace())
+        if not query_trigrams:
+            return list()
+        min_count = len(query_trigrams) * MIN_COVERAGE
+        with self.lock:
+            counts = Counter()
+            for trigram in query_trigrams:
+                counts.update(self.postings.get(trigram, ()))
+            candidates = list()
+            for thread_id, count in counts.items():
+                if count < min_count:
+                    continue
+                entry = self.entries[thread_id]
+                if tag_name and not entry.has_tag(tag_name):
+                    continue
+                rank = (count, -entry.trigram_count, thread_id)
+                candidates.append((rank, entry))
+        best = heapq.nlargest(limit, candidates, key=lambda item: item[0])
+        return [entry for _, entry in best]
+
+
+LOCAL_INDEXES = dict()# language code -> index
+LOCAL_STATE = {'building': set()}
+LOCAL_LOCK = threading.Lock()
+# tests build the indexes in the request, to see the uncommitted threads
+BUILD_IN_BACKGROUND = True
+
+
+def get_index_language():
+    """returns language of the index searched in this request,
+    ``None`` if the site is not multilingual
+    and all threads are in the same index"""
+    if askbot.is_multilingual():
+        return get_language()
+    return None
+
+
+def get_question_entries(**filters):
+    """returns iterator over the entries of the threads
+    with not deleted questions, as pairs (language code, entry)"""
+    from askbot.models import Post
+    questions = Post.objects.filter(
+        post_type='question', deleted=False, thread__deleted=False, **filters
+    ).values_list(
+        'thread_id', 'id', 'thread__title', 'thread__tagnames',
+        'thread__answer_count', 'thread__language_code'
+    )
+    for thread_id, question_id, title, tagnames, answer_count, language_code in questions.iterator():
+        entry = TitleEntry(thread_id, question_id, title, tagnames, answer_count)
+        yield language_code, entry
+
+
+def get_seq():
+    return cache.get(CHANGES_SEQ_KEY, 0)
+
+
+def build_index(language_code):
+    seq = get_seq()
+    if language_code is None:
+        entries = get_question_entries()
+    else:
+        entries = get_question_entries(language_code=language_code)
+    index = TitleIndex(entry for _, entry in entries)
+    # changes recorded later are applied on the next lookup
+    index.seq = seq
+    return index
+
+
+def replace_index(language_code):
+    """builds the index and replaces the one used by the lookups"""
+    try:
+        index = build_index(language_code)
+        with LOCAL_LOCK:
+            LOCAL_INDEXES[language_code] = index
+    finally:
+        with LOCAL_LOCK:
+            LOCAL_STATE['building'].discard(language_code)
+        if BUILD_IN_BACKGROUND:
+            connection.close()
+
+
+def start_build(language_code):
+    """starts building the index in the background thread,
+    the language must be marked as being built"""
+    if BUILD_IN_BACKGROUND:
+        thread = threading.Thread(target=replace_index, args=(language_code,))
+        thread.daemon = True
+        thread.start()
+    else:
+        replace_index(language_code)
+
+
+def reload_threads(language_code, index, thread_ids):
+    """updates entries of the threads in the index"""
+    found_ids = set()
+    for entry_language, entry in get_question_entries(thread_id__in=thread_ids):
+        found_ids.add(entry.thread_id)
+        if language_code in (None, entry_language):
+            index.add(entry)
+        else:
+            index.remove(entry.thread_id)
+    for thread_id in set(thread_ids) - found_ids:
+        index.remove(thread_id)
+
+
+def sync_local_indexes():
+    """applies the changes of the threads recorded
+    since the last lookup, returns set of the languages
+    of the indexes to rebuild, where the changes cannot be applied"""
+    stale = set()
+    seq = get_seq()
+    for language_code, index in list(LOCAL_INDEXES.items()):
+        if index.seq == seq:
+            continue
+        if seq < index.seq or seq - index.seq > MAX_CHANGES:
+            stale.add(language_code)
+            continue
+        slot_keys = [CHANGE_SLOT_KEY % slot for slot in range(index.seq + 1, seq + 1)]
+        thread_ids = cache.get_many(slot_keys)
+        if len(thread_ids) != len(slot_keys):
+            stale.add(language_code)
+            continue
+        reload_threads(language_code, index, set(thread_ids.values()))
+        index.seq = seq
+    return stale
+
+
+def get_title_index(language_code):
+    """returns index of the titles in the language,
+    or ``None`` if it is not built yet"""
+    with LOCAL_LOCK:
+        stale = sync_local_indexes()
+        index = LOCAL_INDEXES.get(language_code)
+        if index is None:
+            stale.add(language_code)
+        # the indexes already being built are not built again
+        builds = stale - LOCAL_STATE['building']
+        LOCAL_STATE['building'].update(builds)
+
+    for build_language in builds:
+        start_build(build_language)
+
+    if language_code in builds and not BUILD_IN_BACKGROUND:
+        with LOCAL_LOCK:
+            index = LOCAL_INDEXES.get(language_code)
+    return index
+
+
+def clear_local_indexes():
+    with LOCAL_LOCK:
+        LOCAL_INDEXES.clear()
+        LOCAL_STATE['building'].clear()
+
+
+def record_change(thread_id):
+    cache.add(CHANGES_SEQ_KEY, 0, const.LONG_TIME)
+    slot = cache.incr(CHANGES_SEQ_KEY)
+    cache.set(CHANGE_SLOT_KEY % slot, thread_id, CHANGE_SLOT_TIMEOUT)
+
+
+def get_indexed_key(instance):
+    """returns the values of the thread or of the question
+    used in the index entries, or ``None`` if some of them
+    were not loaded"""
+    if instance._meta.model_name == 'thread':
+        field_names = ('title', 'tagnames', 'answer_count', 'deleted')
+    else:
+        field_names = ('post_type', 'deleted')
+    if instance.get_deferred_fields() & set(field_names):
+        return None
+    return tuple(getattr(instance, name) for name in field_names)
+
+
+def is_changed(instance, created=False):
+    """True if the saved thread or question changed the index entry,
+    the values of the instance are remembered for the next save"""
+    loaded = getattr(instance, '_loaded_title_index_key', None)
+    key = get_indexed_key(instance)
+    instance._loaded_title_index_key = key
+    return created or loaded is None or key is None or loaded != key
+
+
+def update_thread(thread_id):
+    """schedules update of the thread in the indexes of all processes,
+    the change is recorded after the commit, so that other
+    processes do not reload the thread too early"""
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: record_change(thread_id))
+    else:
+        record_change(thread_id)
+
+
+def search(query, tag_name=None, limit=MAX_RESULTS):
+    """returns list of entries of the best matching titles,
+    ``None`` if the index is not built yet"""
+    index = get_title_index(get_index_language())
+    if index is None:
+        return None
+    return index.search(query, tag_name=tag_name, limit=limit)
@@ -19,6 +19,7 @@ That is the reason for having two types of methods here:
 """
 import logging
 import os
+import smtplib
 import sys
 import traceback
 import uuid
@@ -45,12 +46,16 @@ from askbot.mail.messages import (
 from askbot.models import (
     Activity,
     ActivityAuditStatus,
+    BadgeEvent,
     Post,
     PostRevision,
     User,
     ReplyAddress,
+    SearchVectorUpdate,
+    Thread,
+    ThreadSimilarity,
 )
-from askbot.models.user import get_invited_moderators
+from askbot.models.user import get_invited_moderators, update_response_counts
 from askbot.models.badges import award_badges_signal
 from askbot import exceptions as askbot_exceptions
 from askbot.utils.twitter import Twitter
@@ -134,11 +139,10 @@ def delete_update_notifications_task(rev_ids, keep_activity):
     notifs = ActivityAuditStatus.objects.filter(activity__pk__in=act_ids)
 
     # 3) Find recipients of notifications
-    user_ids = notifs.values_list('user', flat=True).distinct()
-    users = list(User.objects.filter(pk__in=user_ids))
+    user_ids = list(notifs.values_list('user', flat=True).distinct())
 
     # 4) Delete notifications by deleting activities
-    # so that the loop below updates the counts
+    # so that the counts are updated below
     if keep_activity:
         # delete only notifications
         notifs.delete()
@@ -147,8 +151,7 @@ def delete_update_notifications_task(rev_ids, keep_activity):
         # b/c notifications have activity as FK records
         aa.delete()
 
-    for user in users:
-        user.update_response_counts()
+    update_response_counts(user_ids)
 
 @shared_task(ignore_result=True)
 def notify_author_of_published_revision_celery_task(revision_id):
@@ -266,6 +269,54 @@ def record_question_visit(
                              actor=user,
                              context_object=question_post)
 
+@shared_task(ignore_result=True)
+def flush_view_counts():
+    """saves question view counts buffered in the cache,
+    to be run periodically when ASKBOT_VIEW_COUNT_BUFFER_ENABLED is on
+    """
+    Thread.objects.flush_view_count_buffer()
+
+@shared_task(ignore_result=True)
+def evaluate_badges():
+    """considers the badge awards for the queued events,
+    to be run periodically when ASKBOT_BADGE_EVALUATION_DEFERRED is on
+    """
+    BadgeEvent.objects.evaluate_all()
+
+@shared_task(ignore_result=True)
+def update_search_vectors():
+    """recomputes the queued PostgreSQL text search vectors,
+    to be run periodically when ASKBOT_POSTGRESQL_DEFERRED_SEARCH_VECTORS is on
+    """
+    SearchVectorUpdate.objects.update_all()
+
+@shared_task(ignore_result=True)
+def update_thread_search_index(thread_id):
+    """updates the thread in the built-in search index"""
+    from askbot.search import native as native_search
+    try:
+        thread = Thread.objects.get(id=thread_id)
+    except Thread.DoesNotExist:
+        return
+    native_search.update_thread(thread)
+
+@shared_task(ignore_result=True)
+def update_similar_threads(thread_id, update_others=True):
+    """updates the lists of the threads similar to the retagged thread,
+    see `ThreadSimilarityManager.update_for_thread`"""
+    try:
+        thread = Thread.objects.get(id=thread_id)
+    except Thread.DoesNotExist:
+        return
+    ThreadSimilarity.objects.update_for_thread(thread, update_others=update_others)
+
+@shared_task(ignore_result=True)
+def send_delayed_email_alerts(user_ids):
+    """sends daily and weekly email alerts to a chunk of users,
+    deferred by the `send_email_alerts --celery` command"""
+    from askbot.mail.delayed_alerts import send_delayed_alerts
+    send_delayed_alerts(user_ids)
+
 @shared_task(ignore_result=True)
 def send_instant_notifications_about_activity_in_post(
         activity_id=None, post_id=None, recipient_ids=None):
@@ -306,23 +357,57 @@ def send_instant_notifications_about_activity_in_post(
     else:
         log_id = None
 
-    for user in recipients:
-        if user.is_blocked():
-            continue
+    send_instant_email_alerts(post, update_activity, recipients, log_id=log_id)
 
-        activate_language(post.language_code)
 
-        email = InstantEmailAlert({
-            'to_user': user,
-            'from_user': update_activity.user,
-            'post': post,
-            'update_activity': update_activity
-        })
-        try:
-            email.send([user.email])
-        except askbot_exceptions.EmailNotSent as error:
-            logger.debug(
-                '%s, error=%s, logId=%s' % (user.email, error, log_id)
-            )
-        else:
+def send_instant_email_alerts(post, update_activity, recipients,
+                              log_id=None, batched=True):
+    """sends instant email alerts about the post update to the recipients,
+    in the batched mode the parts of the alert that are the same for all
+    recipients are calculated once and all emails are sent through one
+    connection to the mail server, which is reopened if the server
+    fails to send an alert"""
+    activate_language(post.language_code)
+
+    if batched:
+        shared_context = InstantEmailAlert.get_shared_context(post, update_activity)
+        connection = mail.open_connection()
+    else:
+        shared_context = None
+        connection = None
+
+    try:
+        for user in recipients:
+            if user.is_blocked():
+                continue
+
+            email = InstantEmailAlert({
+                'to_user': user,
+                'from_user': update_activity.user,
+                'post': post,
+                'update_activity': update_activity,
+                'shared_context': shared_context
+            })
+            try:
+                email.send([user.email], raise_on_failure=True, connection=connection)
+            except askbot_exceptions.EmailNotSent as error:
+                if connection and isinstance(error.__cause__, smtplib.SMTPException):
+                    # the server may have dropped the connection,
+                    # it is reopened and the alert is sent once more
+                    connection.close()
+                    connection = mail.open_connection()
+                    try:
+                        email.send([user.email], raise_on_failure=True, connection=connection)
+                    except askbot_exceptions.EmailNotSent as retry_error:
+                        error = retry_error
+                    else:
+                        error = None
+                if error:
+                    logger.warning(
+                        '%s, error=%s, logId=%s' % (user.email, error, log_id)
+                    )
+                    continue
             logger.debug('success %s, logId=%s' % (user.email, log_id))
+    finally:
+        if connection:
+            connection.close()
@@ -1,4 +1,5 @@
-from askbot.tests.utils import AskbotTestCase
+from askbot.tests.utils import AskbotTestCase, with_settings
+from django.test import override_settings as override_django_settings
 from django.urls import reverse
 import json
 from askbot.utils.html import site_url
@@ -69,3 +70,27 @@ class ApiV1Tests(AskbotTestCase):
         last_act_info = response_data['questions'][0]['last_activity_by']
         self.assertEqual(set(last_act_info.keys()), set(['id', 'username']))
         self.assertEqual(set(last_act_info.values()), set([user.id, user.username]))
+
+    @override_django_settings(ASKBOT_KEYSET_PAGINATION_ENABLED=True)
+    @with_settings(DEFAULT_QUESTIONS_PAGE_SIZE=2)
+    def test_api_v1_questions_cursor(self):
+        user = self.create_user('user')
+        thread_ids = [self.post_question(user=user).thread_id for _ in range(5)]
+        thread_ids.reverse()
+
+        seen_ids = list()
+        params = {'sort': 'age-desc'}
+        while True:
+            response = self.client.get(reverse('api_v1_questions'), params)
+            response_data = json.loads(response.content)
+            self.assertEqual(response_data['count'], 5)
+            seen_ids.extend([datum['id'] for datum in response_data['questions']])
+            if 'next_cursor' not in response_data:
+                break
+            params['after'] = response_data['next_cursor']
+
+        self.assertEqual(seen_ids, thread_ids)
+
+    @override_django_settings(ASKBOT_THREAD_LISTING_INDEX_ENABLED=True)
+    def test_api_v1_questions_cursor_with_thread_listing(self):
+        self.test_api_v1_questions_cursor()
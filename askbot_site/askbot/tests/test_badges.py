@@ -1,9 +1,14 @@
 import datetime
+from io import StringIO
+from unittest import mock
 from django.conf import settings as django_settings
+from django.core import management
+from django.test import override_settings as override_django_settings
 from django.urls import reverse
 from django.test.client import Client
 from django.utils import timezone
 from askbot.tests.utils import AskbotTestCase
+from askbot import const
 from askbot.conf import settings
 from askbot import models
 from askbot.models import badges
@@ -541,3 +546,149 @@ class BadgeTests(AskbotTestCase):
         expired = badges.RapidResponder.expire(award)
         self.assertTrue(expired)
         self.assert_have_badge(badges.RapidResponder.key, self.u2, expected_count=0)
+
+
+@override_django_settings(ASKBOT_BADGE_EVALUATION_DEFERRED=True)
+class DeferredBadgeEvaluationTests(AskbotTestCase):
+
+    def setUp(self):
+        self.u1 = self.create_user(username='user1')
+        self.u2 = self.create_user(username='user2')
+        self.u3 = self.create_user(username='user3')
+        question = self.post_question(user=self.u1)
+        self.answer = self.post_answer(user=self.u2, question=question)
+        self.answer.points = settings.NICE_ANSWER_BADGE_MIN_UPVOTES - 2
+        self.answer.save()
+        models.BadgeEvent.objects.all().delete()
+
+    def get_award_count(self, badge_key, recipient):
+        return models.Award.objects.filter(badge__slug=badge_key, user=recipient).count()
+
+    def test_events_are_queued(self):
+        self.u1.upvote(self.answer)
+        self.u3.upvote(self.answer)
+        self.assertEqual(models.BadgeEvent.objects.count(), 2)
+        self.assertEqual(self.get_award_count('nice-answer', self.u2), 0)
+
+        models.BadgeEvent.objects.evaluate_all()
+        self.assertEqual(self.get_award_count('nice-answer', self.u2), 1)
+        self.assertEqual(self.get_award_count('supporter', self.u1), 1)
+        self.assertEqual(self.get_award_count('supporter', self.u3), 1)
+        self.assertEqual(models.BadgeEvent.objects.count(), 0)
+
+    def test_repeated_events_are_queued_once(self):
+        for _ in range(3):
+            badges.award_badges_signal.send(
+                None, event='upvote_answer', actor=self.u1, context_object=self.answer
+            )
+        self.assertEqual(models.BadgeEvent.objects.count(), 1)
+
+    def test_repeated_events_without_actor_are_queued_once(self):
+        for _ in range(3):
+            models.BadgeEvent.objects.record(
+                'upvote_answer', None, self.answer, timezone.now()
+            )
+        self.assertEqual(models.BadgeEvent.objects.count(), 1)
+
+    def test_events_for_same_post_are_coalesced(self):
+        self.u1.upvote(self.answer)
+        self.u3.upvote(self.answer)
+        target = 'askbot.models.badges.NiceAnswer.consider_award'
+        with mock.patch(target) as consider_award:
+            models.BadgeEvent.objects.evaluate_all()
+        self.assertEqual(consider_award.call_count, 1)
+
+    def test_events_of_deleted_objects_are_skipped(self):
+        self.u1.upvote(self.answer)
+        self.answer.delete()
+        self.assertEqual(models.BadgeEvent.objects.evaluate_all(), 1)
+        self.assertEqual(models.BadgeEvent.objects.count(), 0)
+
+    def test_command_evaluates_queue(self):
+        self.u1.upvote(self.answer)
+        self.u3.upvote(self.answer)
+        management.call_command('askbot_evaluate_badges')
+        self.assertEqual(self.get_award_count('nice-answer', self.u2), 1)
+
+
+class BadgeRecomputeTests(AskbotTestCase):
+
+    def setUp(self):
+        self.u1 = self.create_user(username='user1')
+        self.u2 = self.create_user(username='user2')
+        self.u3 = self.create_user(username='user3')
+        self.question = self.post_question(user=self.u1)
+        self.answer = self.post_answer(user=self.u2, question=self.question)
+        self.u1.upvote(self.answer)
+        self.u3.upvote(self.answer)
+        self.u3.downvote(self.question)
+        self.u1.accept_best_answer(self.answer)
+
+    def get_recomputable_awards(self):
+        awards = models.Award.objects.values_list(
+            'badge__slug', 'user_id', 'content_type_id', 'object_id'
+        )
+        return set(
+            award for award in awards
+            if badges.BADGES[award[0]].can_recompute_awards()
+        )
+
+    def delete_awards(self):
+        models.Award.objects.all().delete()
+        models.BadgeData.objects.update(awarded_count=0)
+        badges.recount_badges([self.u1.id, self.u2.id, self.u3.id])
+
+    def test_recomputed_awards_match_awards_given_on_events(self):
+        expected_awards = self.get_recomputable_awards()
+        self.assertIn('nice-answer', [award[0] for award in expected_awards])
+        self.assertIn('scholar', [award[0] for award in expected_awards])
+        self.delete_awards()
+
+        management.call_command('askbot_award_badges', chunk_size=2, verbosity=0, stdout=StringIO())
+        self.assertEqual(self.get_recomputable_awards(), expected_awards)
+
+        self.reload_object(self.u2)
+        self.assertEqual(self.u2.bronze, 2)  # teacher and nice answer
+        nice_answer = models.BadgeData.objects.get(slug='nice-answer')
+        self.assertEqual(nice_answer.awarded_count, 1)
+        award_ids = models.Award.objects.filter(user=self.u2).values_list('id', flat=True)
+        activities = models.Activity.objects.filter(
+            activity_type=const.TYPE_ACTIVITY_PRIZE, object_id__in=list(award_ids)
+        )
+        self.assertEqual(activities.count(), 2)
+        self.assertEqual(
+            set(activities.values_list('recipients', flat=True)), {self.u2.id}
+        )
+
+    def test_awards_are_not_duplicated(self):
+        expected_awards = self.get_recomputable_awards()
+        award_count = models.Award.objects.count()
+        management.call_command('askbot_award_badges', verbosity=0, stdout=StringIO())
+        self.assertEqual(models.Award.objects.count(), award_count)
+        self.assertEqual(self.get_recomputable_awards(), expected_awards)
+
+    def test_badges_filter(self):
+        self.delete_awards()
+        management.call_command(
+            'askbot_award_badges', badges='nice-answer,supporter', verbosity=0,
+            stdout=StringIO()
+        )
+        slugs = set(models.Award.objects.values_list('badge__slug', flat=True))
+        self.assertEqual(slugs, {'nice-answer', 'supporter'})
+
+    def test_recount_badges(self):
+        self.u2.gold = 3
+        self.u2.silver = 5
+        self.u2.bronze = 10
+        self.u2.save()
+        self.reload_object(self.u2)
+        self.assertEqual((self.u2.gold, self.u2.silver, self.u2.bronze), (3, 5, 10))
+
+        management.call_command('askbot_recount_badges', verbosity=0)
+        self.reload_object(self.u2)
+        # rapid responder, teacher and nice answer
+        self.assertEqual((self.u2.gold, self.u2.silver, self.u2.bronze), (0, 1, 2))
+
+        self.u2.recount_badges()
+        self.reload_object(self.u2)
+        self.assertEqual((self.u2.gold, self.u2.silver, self.u2.bronze), (0, 1, 2))
@@ -5,18 +5,26 @@ e.g. ``some_user.do_something(...)``
 """
 from bs4 import BeautifulSoup
 from django.core import exceptions
+from django.core.cache import cache
 from django.urls import reverse
+from django.test import override_settings as override_django_settings
 from django.test.client import Client
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django import forms
 from django.utils import timezone
+from django.utils.translation import get_language
 from askbot import exceptions as askbot_exceptions
 from askbot.tests.utils import AskbotTestCase
 from askbot.tests.utils import with_settings
 from askbot import models
 from askbot import const
+from askbot import signals
 from askbot.conf import settings as askbot_settings
+from askbot.search import tag_trie
+from askbot.search import title_index
+import json
+from unittest import mock
 
 class DBApiTestsBase(AskbotTestCase):
     def setUp(self):
@@ -391,6 +399,266 @@ class GlobalTagSubscriberGetterTests(AskbotTestCase):
             reason = 'bad'
         )
 
+
+class MarkedWildcardTagTests(AskbotTestCase):
+    """tests for the index of the wildcard tag selections"""
+
+    def setUp(self):
+        #user profiles are cached by the user id
+        cache.clear()
+        self.user = self.create_user()
+        askbot_settings.update('USE_WILDCARD_TAGS', True)
+
+    def get_user_ids(self, tag_names, reason):
+        user_ids = models.MarkedWildcardTag.objects.get_user_ids_for_tag_names(
+            tag_names, reason=reason
+        )
+        return set(item['user_id'] for item in user_ids)
+
+    def test_mark_tags_updates_index(self):
+        self.user.mark_tags(wildcards=('da*', 'ni*'), reason='good', action='add')
+        prefixes = models.MarkedWildcardTag.objects.filter(
+            user=self.user, reason='good'
+        ).values_list('prefix', flat=True)
+        self.assertEqual(set(prefixes), set(['da', 'ni']))
+
+        self.user.mark_tags(wildcards=('da*',), reason='good', action='remove')
+        prefixes = models.MarkedWildcardTag.objects.filter(
+            user=self.user
+        ).values_list('prefix', flat=True)
+        self.assertEqual(set(prefixes), set(['ni']))
+
+    def test_lookup_by_tag_names(self):
+        self.user.mark_tags(wildcards=('da*',), reason='good', action='add')
+        self.assertEqual(self.get_user_ids(('day',), 'good'), set([self.user.id]))
+        self.assertEqual(self.get_user_ids(('da',), 'good'), set([self.user.id]))
+        self.assertEqual(self.get_user_ids(('d', 'night'), 'good'), set())
+        self.assertEqual(self.get_user_ids(('day',), 'bad'), set())
+
+    def test_catch_all_wildcard(self):
+        self.user.mark_tags(wildcards=('*',), reason='bad', action='add')
+        self.assertEqual(self.get_user_ids(('anything',), 'bad'), set([self.user.id]))
+
+
+class TagTrieTests(AskbotTestCase):
+
+    def test_tags_are_ranked_by_use_count(self):
+        trie = tag_trie.TagTrie([(1, 'django', 5), (2, 'dj', 1), (3, 'Docker', 9), (4, 'flask', 7)])
+        self.assertEqual(trie.search('d'), ['Docker', 'django', 'dj'])
+        self.assertEqual(trie.search('D', limit=1), ['Docker'])
+        self.assertEqual(trie.search('dj'), ['django', 'dj'])
+        self.assertEqual(trie.search('x'), [])
+        self.assertEqual(trie.count('d'), 3)
+        self.assertEqual(trie.count(''), 4)
+
+    def test_rename_and_remove(self):
+        trie = tag_trie.TagTrie([(1, 'django', 5), (2, 'dj', 1)])
+        trie.search('d')
+        trie.add(1, 'flask', 5)
+        self.assertEqual(trie.search('d'), ['dj'])
+        self.assertEqual(trie.search('f'), ['flask'])
+        trie.remove(2)
+        self.assertEqual(trie.search('d'), [])
+        self.assertEqual(trie.count('d'), 0)
+
+
+class TagAutocompleteTests(AskbotTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_user()
+        self.post_question(tags='python pyramid')
+        self.post_question(tags='python django')
+
+    def complete_tags(self, prefix):
+        response = self.client.get(reverse('complete_tags'), {'q': prefix, 'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode('utf-8')
+        return text.split('\n') if text else []
+
+    def test_tags_are_ranked_by_use_count(self):
+        self.assertEqual(self.complete_tags('py'), ['python', 'pyramid'])
+        self.assertEqual(self.complete_tags('dj'), ['django'])
+
+    def test_new_renamed_and_deleted_tags(self):
+        self.complete_tags('py')
+        self.post_question(tags='pytest')
+        self.assertEqual(self.complete_tags('py'), ['python', 'pyramid', 'pytest'])
+
+        tag = models.Tag.objects.get(name='pyramid')
+        tag.name = 'flask'
+        tag.save()
+        self.assertEqual(self.complete_tags('py'), ['python', 'pytest'])
+        self.assertEqual(self.complete_tags('fl'), ['flask'])
+
+        models.Tag.objects.filter(name='pytest').delete()
+        self.assertEqual(self.complete_tags('py'), ['python'])
+
+    def test_tag_renamed_in_other_process(self):
+        self.complete_tags('py')
+        trie = tag_trie.LOCAL_TRIES[get_language()]
+        tag = models.Tag.objects.get(name='pyramid')
+        models.Tag.objects.filter(id=tag.id).update(name='flask')
+        tag_trie.record_change(tag.language_code, [(tag.id, 'flask', tag.used_count)])
+        tag_trie.LOCAL_STATE['checked_at'] = 0
+        self.assertEqual(self.complete_tags('fl'), ['flask'])
+        # the change is applied to the trie, it is not rebuilt
+        self.assertIs(tag_trie.LOCAL_TRIES[get_language()], trie)
+
+    def test_tries_are_rebuilt_after_bulk_updates(self):
+        self.complete_tags('py')
+        models.Tag.objects.filter(name='pyramid').update(name='flask')
+        with self.captureOnCommitCallbacks(execute=True):
+            tag_trie.invalidate()
+        tag_trie.LOCAL_STATE['checked_at'] = 0
+        self.assertEqual(self.complete_tags('fl'), ['flask'])
+
+    def test_range_query_is_used_until_trie_is_built(self):
+        with mock.patch.object(tag_trie, 'start_build') as start_build:
+            self.assertEqual(self.complete_tags('py'), ['python', 'pyramid'])
+        self.assertTrue(start_build.called)
+        self.assertEqual(tag_trie.LOCAL_TRIES, {})
+
+    def test_trie_is_built_without_lock(self):
+        def build(language_code):
+            self.assertFalse(tag_trie.LOCAL_LOCK.locked())
+            tag_trie.replace_trie(language_code)
+        with mock.patch.object(tag_trie, 'start_build', side_effect=build) as start_build:
+            self.assertEqual(self.complete_tags('py'), ['python', 'pyramid'])
+            self.complete_tags('py')
+        self.assertEqual(start_build.call_count, 1)
+
+    def test_get_tags_by_wildcard(self):
+        response = self.client.get(reverse('get_tags_by_wildcard'), {'wildcard': 'py*'})
+        data = json.loads(response.content)
+        self.assertEqual(data['tag_count'], 2)
+        self.assertEqual(data['tag_names'], ['python', 'pyramid'])
+
+
+class TitleIndexTests(AskbotTestCase):
+
+    def get_index(self, *titles):
+        entries = [
+            title_index.TitleEntry(idx, idx, title, 'tag%d' % (idx % 2), 0)
+            for idx, title in enumerate(titles, 1)
+        ]
+        return title_index.TitleIndex(entries)
+
+    def search(self, index, query, **kwargs):
+        return [entry.title for entry in index.search(query, **kwargs)]
+
+    def test_last_word_may_be_incomplete(self):
+        index = self.get_index('how to install django', 'django templates', 'installing python')
+        self.assertEqual(self.search(index, 'instal'), ['installing python', 'how to install django'])
+        self.assertEqual(self.search(index, 'install '), ['how to install django', 'installing python'])
+        self.assertEqual(self.search(index, 'django templ'), ['django templates', 'how to install django'])
+        self.assertEqual(self.search(index, 'qwerty'), [])
+        self.assertEqual(self.search(index, '  '), [])
+
+    def test_tag_filter_and_removal(self):
+        index = self.get_index('django forms', 'django models')
+        self.assertEqual(self.search(index, 'django', tag_name='tag0'), ['django models'])
+        index.remove(2)
+        self.assertEqual(self.search(index, 'django'), ['django forms'])
+        index.add(title_index.TitleEntry(1, 1, 'flask forms', 'tag1', 0))
+        self.assertEqual(self.search(index, 'django'), [])
+        self.assertEqual(self.search(index, 'forms'), ['flask forms'])
+
+
+@override_django_settings(ASKBOT_TITLE_INDEX_ENABLED=True)
+class TitleSuggestionsTests(AskbotTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_user()
+        self.question = self.post_question(title='how to install django', tags='django')
+        self.post_question(title='installing python packages', tags='python')
+
+    def get_suggestions(self, query, **kwargs):
+        kwargs['query_text'] = query
+        response = self.client.get(reverse('api_get_questions'), kwargs)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_suggestions(self):
+        data = self.get_suggestions('install')
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[0]['title'], 'how to install django')
+        self.assertEqual(data[0]['url'], self.question.get_absolute_url())
+        self.assertEqual(data[0]['answer_count'], 0)
+        data = self.get_suggestions('install', tag_name='python')
+        self.assertEqual([item['title'] for item in data], ['installing python packages'])
+
+    def test_index_tracks_changes(self):
+        self.get_suggestions('install')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_answer(question=self.question)
+            self.user.edit_question(question=self.question, title='how to install django apps')
+        data = self.get_suggestions('django apps')
+        self.assertEqual(data[0]['title'], 'how to install django apps')
+        self.assertEqual(data[0]['answer_count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete_question(self.question)
+        self.assertEqual(len(self.get_suggestions('django')), 0)
+
+    def test_only_indexed_changes_are_recorded(self):
+        thread = models.Thread.objects.get(id=self.question.thread_id)
+        seq = title_index.get_seq()
+        with self.captureOnCommitCallbacks(execute=True):
+            thread.view_count += 1
+            thread.save()
+        self.assertEqual(title_index.get_seq(), seq)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            thread.title = 'how to install flask'
+            thread.save()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(title_index.get_seq(), seq + 1)
+
+    def test_only_questions_remember_indexed_values(self):
+        answer = self.post_answer(question=self.question)
+        answer = models.Post.objects.get(id=answer.id)
+        self.assertFalse(hasattr(answer, '_loaded_title_index_key'))
+        question = models.Post.objects.get(id=self.question.id)
+        self.assertEqual(question._loaded_title_index_key, ('question', False))
+        with override_django_settings(ASKBOT_TITLE_INDEX_ENABLED=False):
+            question = models.Post.objects.get(id=self.question.id)
+        self.assertFalse(hasattr(question, '_loaded_title_index_key'))
+
+    def test_change_slots_expire(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            title_index.record_change(self.question.thread_id)
+        cache_set.assert_called_once_with(
+            title_index.CHANGE_SLOT_KEY % title_index.get_seq(),
+            self.question.thread_id,
+            title_index.CHANGE_SLOT_TIMEOUT
+        )
+
+    def test_database_is_queried_until_index_is_built(self):
+        with mock.patch.object(title_index, 'start_build') as start_build:
+            data = self.get_suggestions('install')
+        self.assertTrue(start_build.called)
+        self.assertEqual(
+            set(item['title'] for item in data),
+            set(['how to install django', 'installing python packages'])
+        )
+
+    def test_index_is_built_without_lock(self):
+        def build(language_code):
+            self.assertFalse(title_index.LOCAL_LOCK.locked())
+            title_index.replace_index(language_code)
+        with mock.patch.object(title_index, 'start_build', side_effect=build) as start_build:
+            self.assertEqual(len(self.get_suggestions('install')), 2)
+            self.get_suggestions('install')
+        self.assertEqual(start_build.call_count, 1)
+
+    def test_index_rebuilt_if_changes_are_lost(self):
+        self.get_suggestions('install')
+        models.Thread.objects.filter(id=self.question.thread_id).update(title='flask')
+        title_index.record_change(self.question.thread_id)
+        cache.delete(title_index.CHANGE_SLOT_KEY % title_index.get_seq())
+        self.assertEqual(self.get_suggestions('flask')[0]['title'], 'flask')
+
+
 class CommentTests(AskbotTestCase):
     """unfortunately, not very useful tests,
     as assertions of type "user can" are not inside
@@ -423,6 +691,88 @@ class CommentTests(AskbotTestCase):
         comment = models.Post.objects.get_comments().get(id = self.comment.id)
         self.assertEqual(comment.points, 0)
 
+
+class VoteTests(AskbotTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = self.create_user('author')
+        self.voters = [self.create_user('voter%d' % idx) for idx in range(3)]
+        self.question = self.post_question(user=self.author)
+        self.answer = self.post_answer(user=self.author, question=self.question)
+
+    def test_votes_of_stale_instances_are_counted(self):
+        for voter in self.voters[:2]:
+            # each vote is applied to its own copy of the post
+            answer = models.Post.objects.get(id=self.answer.id)
+            voter.upvote(answer, force=True)
+        self.voters[2].downvote(models.Post.objects.get(id=self.answer.id), force=True)
+        answer = models.Post.objects.get(id=self.answer.id)
+        self.assertEqual(answer.vote_up_count, 2)
+        self.assertEqual(answer.vote_down_count, 1)
+        self.assertEqual(answer.points, 1)
+
+        author = models.User.objects.get(id=self.author.id)
+        gain = 2 * askbot_settings.REP_GAIN_FOR_RECEIVING_UPVOTE \
+            + askbot_settings.REP_LOSS_FOR_RECEIVING_DOWNVOTE
+        self.assertEqual(author.reputation, const.MIN_REPUTATION + gain)
+        self.assertEqual(author.get_localized_profile().reputation, gain)
+
+    def test_question_points_are_copied_to_thread(self):
+        question = models.Post.objects.get(id=self.question.id)
+        self.voters[0].upvote(question, force=True)
+        self.voters[1].upvote(self.question, force=True)
+        thread = models.Thread.objects.get(id=self.question.thread_id)
+        self.assertEqual(thread.points, 2)
+        self.voters[1].upvote(self.question, force=True, cancel=True)
+        thread = models.Thread.objects.get(id=self.question.thread_id)
+        self.assertEqual(thread.points, 1)
+        self.assertEqual(self.question.vote_up_count, 1)
+
+    def test_daily_upvote_reputation_gain_is_cached(self):
+        gain = askbot_settings.REP_GAIN_FOR_RECEIVING_UPVOTE
+        self.voters[0].upvote(self.answer, force=True)
+        self.assertEqual(
+            models.Repute.objects.get_cached_reputation_by_upvoted_today(self.author), gain
+        )
+        with self.assertNumQueries(0):
+            models.Repute.objects.get_cached_reputation_by_upvoted_today(self.author)
+
+        self.voters[1].upvote(self.answer, force=True)
+        self.voters[0].upvote(self.answer, force=True, cancel=True)
+        self.assertEqual(
+            models.Repute.objects.get_cached_reputation_by_upvoted_today(self.author),
+            models.Repute.objects.get_reputation_by_upvoted_today(self.author)
+        )
+
+    @with_settings(MAX_REP_GAIN_PER_USER_PER_DAY=10, REP_GAIN_FOR_RECEIVING_UPVOTE=5)
+    def test_daily_upvote_reputation_gain_is_limited(self):
+        for voter in self.voters:
+            voter.upvote(self.answer, force=True)
+        author = models.User.objects.get(id=self.author.id)
+        self.assertEqual(author.reputation, const.MIN_REPUTATION + 10)
+
+    def test_clamped_reputation_reports_previous_value(self):
+        received = list()
+        def record_reputation(sender, user=None, reputation_before=None, **kwargs):
+            received.append((user.id, reputation_before))
+        signals.reputation_received.connect(record_reputation)
+        self.addCleanup(signals.reputation_received.disconnect, record_reputation)
+
+        self.author.receive_reputation(-10)
+        author = models.User.objects.get(id=self.author.id)
+        self.assertEqual(author.reputation, const.MIN_REPUTATION)
+        self.assertEqual(received, [(self.author.id, const.MIN_REPUTATION)])
+
+    def test_answer_vote_keeps_summary_html(self):
+        thread = self.question.thread
+        thread.update_summary_html()
+        self.voters[0].upvote(self.answer, force=True)
+        self.assertTrue(thread.summary_html_cached())
+        self.voters[0].upvote(self.question, force=True)
+        self.assertFalse(thread.summary_html_cached())
+
+
 class GroupTests(AskbotTestCase):
     def setUp(self):
         self.u1 = self.create_user('u1')
@@ -2,10 +2,15 @@ import bs4
 import copy
 import datetime
 import functools
+import smtplib
 import time
+from unittest.mock import patch
 from django.conf import settings as django_settings
 from django.core import management
 from django.core import serializers
+from django.core.mail.backends import locmem
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import django.core.mail
 from django.urls import reverse
 from django.test import TestCase
@@ -15,6 +20,8 @@ from askbot.tests import utils
 from askbot.tests.utils import with_settings
 from askbot import models
 from askbot import mail
+from askbot.mail.delayed_alerts import DelayedAlertBatch
+from askbot.tasks import send_instant_email_alerts
 from askbot.conf import settings as askbot_settings
 from askbot import const
 from askbot.models.question import Thread
@@ -715,6 +722,103 @@ class InstantQAnsEmailAlertTests(EmailAlertTests):
         self.expected_results['answer_edit'] = {'message_count': 1, }
         self.expected_results['q_ans_new_answer'] = {'message_count': 1, }
 
+class DelayedAlertBatchTests(utils.AskbotTestCase):
+
+    def setUp(self):
+        self.author = self.create_user('author')
+        schedule = copy.deepcopy(models.EmailFeedSetting.NO_EMAIL_SCHEDULE)
+        schedule['q_sel'] = 'd'
+        self.follower = self.create_user('follower', notification_schedule=schedule)
+        self.question = self.post_question(user=self.author)
+        self.follower.follow_question(self.question)
+        django.core.mail.outbox = list()
+
+    @with_settings(ENABLE_EMAIL_ALERTS=True)
+    def test_chunked_alerts(self):
+        for idx in range(3):
+            self.create_user('idle%d' % idx)
+        management.call_command('send_email_alerts', chunk_size=2)
+        outbox = django.core.mail.outbox
+        self.assertEqual(len(outbox), 1)
+        self.assertEqual(outbox[0].recipients(), [self.follower.email])
+
+        # the feed is marked as reported
+        management.call_command('send_email_alerts', chunk_size=2)
+        self.assertEqual(len(django.core.mail.outbox), 1)
+
+    def test_idle_users_add_no_queries(self):
+        def count_queries(user_ids):
+            with CaptureQueriesContext(connection) as context:
+                DelayedAlertBatch(user_ids).run()
+            return len(context.captured_queries)
+
+        idle_ids = [self.create_user('idle%d' % idx).id for idx in range(6)]
+        # warm up the settings
+        count_queries(idle_ids[:1])
+        self.assertEqual(count_queries(idle_ids[:2]), count_queries(idle_ids))
+
+    def test_old_threads_are_not_loaded(self):
+        old_question = self.post_question(user=self.author, title='old question')
+        self.follower.follow_question(old_question)
+        joined_at = self.follower.date_joined
+        Thread.objects.filter(id=old_question.thread_id).update(
+            last_activity_at=joined_at - datetime.timedelta(days=1)
+        )
+        Thread.objects.filter(id=self.question.thread_id).update(
+            last_activity_at=joined_at + datetime.timedelta(minutes=1)
+        )
+        batch = DelayedAlertBatch([self.follower.id])
+        batch.load_users()
+        batch.load_due_feeds()
+        batch.load_questions()
+        self.assertEqual(list(batch.questions.keys()), [self.question.id])
+        self.assertEqual(batch.followed_threads[self.follower.id], {self.question.thread_id})
+
+
+class InstantAlertDeliveryTests(utils.AskbotTestCase):
+
+    def setUp(self):
+        self.author = self.create_user('author')
+        self.readers = [self.create_user('reader%d' % idx) for idx in range(3)]
+        question = self.post_question(user=self.author)
+        self.answer = self.post_answer(user=self.author, question=question)
+        self.activity = models.Activity.objects.filter(
+            activity_type=const.TYPE_ACTIVITY_ANSWER
+        ).latest('id')
+
+    def send_alerts(self, batched):
+        django.core.mail.outbox = list()
+        with patch('django.core.mail.get_connection', wraps=django.core.mail.get_connection) as get_connection:
+            send_instant_email_alerts(
+                self.answer, self.activity, self.readers, batched=batched
+            )
+        bodies = [message.body for message in django.core.mail.outbox]
+        return bodies, get_connection.call_count
+
+    @with_settings(ENABLE_EMAIL_ALERTS=True, INSTANT_EMAIL_ALERT_ENABLED=True)
+    def test_batched_alerts_use_one_connection(self):
+        batched_bodies, batched_connections = self.send_alerts(batched=True)
+        bodies, connections = self.send_alerts(batched=False)
+        self.assertEqual(len(batched_bodies), 3)
+        self.assertEqual(batched_bodies, bodies)
+        self.assertEqual(batched_connections, 1)
+        self.assertEqual(connections, 3)
+
+    @with_settings(ENABLE_EMAIL_ALERTS=True, INSTANT_EMAIL_ALERT_ENABLED=True)
+    def test_dropped_connection_is_reopened(self):
+        class DroppedConnection(locmem.EmailBackend):
+            def send_messages(self, messages):
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+        django.core.mail.outbox = list()
+        connections = [DroppedConnection(), locmem.EmailBackend()]
+        with patch('askbot.mail.open_connection', side_effect=connections) as open_connection:
+            send_instant_email_alerts(self.answer, self.activity, self.readers)
+        self.assertEqual(open_connection.call_count, 2)
+        recipients = [message.to[0] for message in django.core.mail.outbox]
+        self.assertEqual(recipients, [reader.email for reader in self.readers])
+
+
 class DelayedAlertSubjectLineTests(TestCase):
     def test_topics_in_subject_line(self):
         threads = [
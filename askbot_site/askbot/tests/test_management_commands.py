@@ -5,11 +5,14 @@ import os
 import sys
 import io
 import shutil
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock, mock_open
 import zipfile
 import askbot
 from django.core import management, mail
+from django.core.management.base import CommandError
+from django.db import connection
 from django.conf import settings as django_settings
 from django.contrib import auth
 from django.contrib.auth.models import User
@@ -377,3 +380,59 @@ class ManagementCommandTests(AskbotTestCase):
         #command sends alerts to three moderators at a time
         self.assertEqual(len(mail.outbox), 2)
         self.assertTrue('moderation' in mail.outbox[0].subject)
+
+
+class BenchmarkRequestsTests(AskbotTestCase):
+
+    def setUp(self):
+        # the first user becomes the administrator
+        self.create_user('admin')
+        self.user = self.create_user()
+        self.post_question(user=self.user)
+        self.baseline_dir = tempfile.mkdtemp()
+        self.baseline_path = os.path.join(self.baseline_dir, 'baseline.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.baseline_dir)
+
+    def run_benchmark(self, **options):
+        management.call_command(
+            'askbot_benchmark_requests', current_data=True,
+            endpoints='questions,api_v1_question', warmup=0, repeat=2,
+            baseline=self.baseline_path, stdout=io.StringIO(), **options
+        )
+
+    def test_percentile(self):
+        from askbot.management.commands.askbot_benchmark_requests import get_percentile
+        values = list(range(20, 0, -1))
+        self.assertEqual(get_percentile(values, 50), 10)
+        self.assertEqual(get_percentile(values, 95), 19)
+        self.assertEqual(get_percentile([5], 95), 5)
+
+    def test_default_baseline_has_sqlite_results(self):
+        from askbot.management.commands import askbot_benchmark_requests as command
+        with open(command.DEFAULT_BASELINE) as baseline_file:
+            baseline = json.load(baseline_file)
+        for scale in command.DEFAULT_SCALES.split(','):
+            for endpoint in command.ENDPOINTS:
+                for visitor in ('anonymous', 'user'):
+                    key = 'sqlite scale=%s %s %s' % (scale, endpoint, visitor)
+                    self.assertEqual(baseline[key]['status'], 200)
+
+    def test_results_are_compared_with_baseline(self):
+        self.run_benchmark(save_baseline=True)
+        with open(self.baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+        key = '%s current questions user' % connection.vendor
+        self.assertEqual(len(baseline), 4)
+        self.assertEqual(baseline[key]['status'], 200)
+        self.assertTrue(baseline[key]['queries'] > 0)
+
+        self.run_benchmark(tolerance=1000)
+
+        baseline[key]['queries'] = 0
+        with open(self.baseline_path, 'w') as baseline_file:
+            json.dump(baseline, baseline_file)
+        with self.assertRaises(CommandError):
+            self.run_benchmark(tolerance=1000)
+
@@ -245,6 +245,30 @@ class OnScreenUpdateNotificationTests(TestCase):
             ]
         )
 
+    def test_mention_of_several_users(self):
+        """each mentioned user gets own mention activity"""
+        self.reset_response_counts()
+        time.sleep(1)
+        timestamp = timezone.now()
+        comment = self.answer1.add_comment(
+                            user = self.u21,
+                            comment = 'hey @user14 and @user34',
+                            added_at = timestamp
+                        )
+        mentions = models.Activity.objects.filter(
+                            activity_type = const.TYPE_ACTIVITY_MENTION,
+                            object_id = comment.id
+                        )
+        mentioned_users = set([mention.get_mentioned_user() for mention in mentions])
+        self.assertEqual(mentioned_users, set([self.u14, self.u34]))
+        self.assertNewResponseCountsEqual(
+            [
+                 0, 0, 0, 1,
+                 0, 1, 1, 0,
+                 0, 0, 0, 1,
+            ]
+        )
+
     def test_self_comments(self):
         """poster of the question or answer adds a comment
         under the corresponding question or answer"""
@@ -3,7 +3,10 @@ from django.test import signals
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.urls import reverse
+from django.test import override_settings as override_django_settings
 from django.core import management
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.core.cache.backends.dummy import DummyCache
 from django.core import cache
 import json
@@ -162,6 +165,19 @@ class PageLoadTestCase(AskbotTestCase):
         self.assertTrue(isinstance(templates, list))
         self.assertIn('questions/index.html', [t.name for t in templates])
 
+    @override_django_settings(ASKBOT_KEYSET_PAGINATION_ENABLED=True)
+    def test_questions_page_cursor(self):
+        search_state = SearchState.get_empty().change_sort('votes-desc')
+        url = reverse('questions') + search_state.query_string()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        dom = BeautifulSoup(response.content, 'html5lib')
+        next_url = dom.find('a', attrs={'class': 'next-page'})['href']
+        self.assertTrue('/page:2/after:' in next_url)
+        response = self.client.get(next_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['threads'].number, 2)
+
     def proto_test_ask_page(self, allow_anonymous, status_code):
         prev_setting = askbot_settings.ALLOW_POSTING_BEFORE_LOGGING_IN
         askbot_settings.update('ALLOW_POSTING_BEFORE_LOGGING_IN', allow_anonymous)
@@ -602,6 +618,37 @@ class QuestionViewTests(AskbotTestCase):
         self.assertTrue(text in meta_descr.attrs['content'])
 
 
+    def post_thread(self, num_answers):
+        """posts question with the given number of answers
+        and two comments per answer"""
+        asker = self.create_user('asker%d' % num_answers)
+        question = self.post_question(user=asker)
+        for num in range(num_answers):
+            answerer = self.create_user('answerer%d_%d' % (num_answers, num))
+            answer = self.post_answer(user=answerer, question=question)
+            self.post_comment(user=asker, parent_post=answer)
+            self.post_comment(user=answerer, parent_post=answer)
+        return question
+
+    def count_question_page_queries(self, question):
+        url = question.get_absolute_url()
+        # warm up caches not related to the thread data
+        self.client.get(url)
+        question.thread.invalidate_cached_post_data()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # live settings may be re-read depending on the state
+        # of their cache left by other tests
+        queries = [query for query in context.captured_queries
+                   if 'livesettings_' not in query['sql']]
+        return len(queries)
+
+    def test_question_page_query_count_does_not_grow_with_thread(self):
+        small_count = self.count_question_page_queries(self.post_thread(1))
+        large_count = self.count_question_page_queries(self.post_thread(10))
+        self.assertEqual(small_count, large_count)
+
 class QuestionPageRedirectTests(AskbotTestCase):
 
     def setUp(self):
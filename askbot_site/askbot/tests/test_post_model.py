@@ -2,28 +2,51 @@ import copy
 import datetime
 from operator import attrgetter
 import time
+from unittest import mock
 from askbot.search.state_manager import SearchState
 from django.conf import settings as django_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.core import cache
+from django.core import management
 from django.core.cache.backends.dummy import DummyCache
 from django.core.cache.backends.locmem import LocMemCache
 
 from django.core.exceptions import ValidationError
+from django.test import Client
+from django.test import override_settings as override_django_settings
 from django.template.loader import get_template
 from django.template import Context
 from askbot.tests.utils import AskbotTestCase
 from askbot.models import Post
+from askbot.models.post import PostSearchResults
 from askbot.models import PostRevision
 from askbot.models import Thread
+from askbot.models import ThreadListing
 from askbot.models import Tag
+from askbot.models import RelatedTagCount
+from askbot.models import SearchVectorUpdate
 from askbot.models import Group
 from askbot.search.state_manager import DummySearchState
 import json
 from django.utils import timezone
+from django.utils import translation
 from askbot.tests.utils import skipIf, with_settings
 from askbot.conf import settings as askbot_settings
+from django.db.models import Count
+
+
+def get_related_to_search(threads, ignored_tag_names):
+    """returns most used tags of the threads, with the use
+    counts in these threads, counted without the precomputed
+    records, to check the related tags of the searches"""
+    tags = Tag.objects.filter(threads__in=threads).annotate(
+        local_used_count=Count('id')
+    ).order_by('-local_used_count', 'name')
+    if ignored_tag_names:
+        tags = tags.exclude(name__in=ignored_tag_names)
+    tags = tags.exclude(deleted=True)
+    return list(tags[:50])
 
 
 class PostModelTests(AskbotTestCase):
@@ -195,30 +218,30 @@ class ThreadTagModelsTests(AskbotTestCase):
         self.q4 = self.post_question(tags='tag1 tag2 tag3 tag4 tag5 tag6', user=user3)
 
     def test_related_tags(self):
-        tags = Tag.objects.get_related_to_search(threads=[self.q1.thread, self.q2.thread], ignored_tag_names=[])
+        tags = get_related_to_search(threads=[self.q1.thread, self.q2.thread], ignored_tag_names=[])
         self.assertListEqual(['tag3', 'tag1', 'tag2', 'tag4', 'tag5'], [t.name for t in tags])
         self.assertListEqual([2, 1, 1, 1, 1], [t.local_used_count for t in tags])
         self.assertListEqual([3, 2, 2, 2, 2], [t.used_count for t in tags])
 
-        tags = Tag.objects.get_related_to_search(threads=[self.q1.thread, self.q2.thread], ignored_tag_names=['tag3', 'tag5'])
+        tags = get_related_to_search(threads=[self.q1.thread, self.q2.thread], ignored_tag_names=['tag3', 'tag5'])
         self.assertListEqual(['tag1', 'tag2', 'tag4'], [t.name for t in tags])
         self.assertListEqual([1, 1, 1], [t.local_used_count for t in tags])
         self.assertListEqual([2, 2, 2], [t.used_count for t in tags])
 
-        tags = Tag.objects.get_related_to_search(threads=[self.q3.thread], ignored_tag_names=[])
+        tags = get_related_to_search(threads=[self.q3.thread], ignored_tag_names=[])
         self.assertListEqual(['tag6'], [t.name for t in tags])
         self.assertListEqual([1], [t.local_used_count for t in tags])
         self.assertListEqual([2], [t.used_count for t in tags])
 
-        tags = Tag.objects.get_related_to_search(threads=[self.q3.thread], ignored_tag_names=['tag1'])
+        tags = get_related_to_search(threads=[self.q3.thread], ignored_tag_names=['tag1'])
         self.assertListEqual(['tag6'], [t.name for t in tags])
         self.assertListEqual([1], [t.local_used_count for t in tags])
         self.assertListEqual([2], [t.used_count for t in tags])
 
-        tags = Tag.objects.get_related_to_search(threads=[self.q3.thread], ignored_tag_names=['tag6'])
+        tags = get_related_to_search(threads=[self.q3.thread], ignored_tag_names=['tag6'])
         self.assertListEqual([], [t.name for t in tags])
 
-        tags = Tag.objects.get_related_to_search(threads=[self.q1.thread, self.q2.thread, self.q4.thread], ignored_tag_names=['tag2'])
+        tags = get_related_to_search(threads=[self.q1.thread, self.q2.thread, self.q4.thread], ignored_tag_names=['tag2'])
         self.assertListEqual(['tag3', 'tag1', 'tag4', 'tag5', 'tag6'], [t.name for t in tags])
         self.assertListEqual([3, 2, 2, 2, 1], [t.local_used_count for t in tags])
         self.assertListEqual([3, 2, 2, 2, 2], [t.used_count for t in tags])
@@ -309,6 +332,298 @@ class ThreadTagModelsTests(AskbotTestCase):
             self.assertEqual(thread.last_activity_by, thread._last_activity_by_cache)
 
 
+@override_django_settings(ASKBOT_THREAD_LISTING_INDEX_ENABLED=True)
+class ThreadListingSearchTests(ThreadTagModelsTests):
+    """runs the advanced search tests against the
+    denormalized thread listing records"""
+
+    def test_listing_records(self):
+        self.assertEqual(ThreadListing.objects.count(), 4)
+        listing = ThreadListing.objects.get(thread=self.q3.thread)
+        self.assertEqual(listing.author, self.user2)
+        self.assertEqual(listing.answer_count, self.q3.thread.answer_count)
+
+    def test_listing_search_filters_tags_by_subquery(self):
+        ss = SearchState.get_empty().add_tag('tag1')
+        qs, meta_data = Thread.objects.run_advanced_search(request_user=self.user, search_state=ss)
+        sql = str(qs.query)
+        self.assertIn('askbot_thread_tags', sql)
+        self.assertNotIn('LIKE', sql)
+
+    def test_listing_search_does_not_join_posts(self):
+        ss = SearchState.get_empty().add_tag('tag1')
+        qs, meta_data = Thread.objects.run_advanced_search(request_user=self.user, search_state=ss)
+        sql = str(qs.query)
+        self.assertNotIn('askbot_post', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_listing_tracks_retag(self):
+        self.user.retag_question(question=self.q3, tags='tag1')
+        ss = SearchState.get_empty().add_tag('tag1')
+        qs, meta_data = Thread.objects.run_advanced_search(request_user=self.user, search_state=ss)
+        self.assertEqual(3, qs.count())
+
+    @with_settings(UNANSWERED_QUESTION_MEANING='NO_ANSWERS')
+    def test_listing_unanswered_scope(self):
+        self.post_answer(question=self.q1)
+        ss = SearchState(scope='unanswered', sort=None, query=None, tags=None, author=None, page=None, user_logged_in=True)
+        qs, meta_data = Thread.objects.run_advanced_search(request_user=self.user, search_state=ss)
+        self.assertEqual(3, qs.count())
+        self.assertNotIn(self.q1.thread_id, [thread.id for thread in qs])
+
+
+class RelatedTagsTests(AskbotTestCase):
+
+    setUp = ThreadTagModelsTests.setUp
+
+    def get_related_tags(self, search_state):
+        qs, meta_data = Thread.objects.run_advanced_search(
+            request_user=self.user, search_state=search_state
+        )
+        tags = Thread.objects.get_related_tags(qs, search_state, self.user, meta_data)
+        expected_tags = get_related_to_search(threads=qs, ignored_tag_names=[])
+        return [(tag.name, tag.local_used_count) for tag in tags], \
+            [(tag.name, tag.local_used_count) for tag in expected_tags]
+
+    def assert_related_tags_match_search(self, search_state):
+        tags, expected_tags = self.get_related_tags(search_state)
+        self.assertEqual(tags, expected_tags)
+
+    def test_related_tags_are_counted_over_all_found_threads(self):
+        ss = SearchState.get_empty()
+        self.assertTrue(Thread.objects.can_use_related_tag_counts(ss, self.user))
+        self.assert_related_tags_match_search(ss)
+        self.assert_related_tags_match_search(ss.add_tag('tag1'))
+        self.assert_related_tags_match_search(ss.add_tag('tag3').add_tag('tag4'))
+        self.assert_related_tags_match_search(ss.add_tag('tag1').add_tag('tag3').add_tag('tag6'))
+        tags, _ = self.get_related_tags(ss.add_tag('tag3'))
+        self.assertEqual(
+            tags,
+            [('tag3', 3), ('tag1', 2), ('tag2', 2), ('tag4', 2), ('tag5', 2), ('tag6', 1)]
+        )
+
+    def test_related_tags_of_missing_tag(self):
+        tags, _ = self.get_related_tags(SearchState.get_empty().add_tag('nosuchtag'))
+        self.assertEqual(tags, [])
+
+    def test_retag_and_delete_update_counts(self):
+        ss = SearchState.get_empty().add_tag('tag6')
+        self.user.retag_question(question=self.q1, tags='tag1 tag6')
+        self.assert_related_tags_match_search(ss)
+        self.user.delete_question(self.q4)
+        self.assert_related_tags_match_search(ss)
+        tags, _ = self.get_related_tags(ss)
+        self.assertEqual(tags, [('tag6', 2), ('tag1', 1)])
+        self.user.restore_post(self.q4)
+        self.assert_related_tags_match_search(ss)
+
+    def test_cached_related_tags_are_invalidated_by_tag(self):
+        ss = SearchState.get_empty().add_tag('tag1').add_tag('tag2').add_tag('tag3')
+        self.assertFalse(Thread.objects.can_use_related_tag_counts(ss, self.user))
+        key = Thread.objects.get_related_tags_cache_key(ss, self.user)
+        self.user.retag_question(question=self.q3, tags='tag6 tag7')
+        self.assertEqual(Thread.objects.get_related_tags_cache_key(ss, self.user), key)
+        self.user.retag_question(question=self.q2, tags='tag1 tag4')
+        self.assertNotEqual(Thread.objects.get_related_tags_cache_key(ss, self.user), key)
+
+    def test_rebuild_command(self):
+        self.user.retag_question(question=self.q2, tags='tag1 tag5')
+        self.user.delete_question(self.q3)
+        records = set(RelatedTagCount.objects.values_list('selected_tag_ids', 'tag_id', 'count'))
+        management.call_command('askbot_rebuild_related_tag_counts')
+        rebuilt_records = set(RelatedTagCount.objects.values_list('selected_tag_ids', 'tag_id', 'count'))
+        self.assertEqual(records, rebuilt_records)
+
+
+class SearchResultsCacheTests(AskbotTestCase):
+
+    def setUp(self):
+        cache.cache.clear()
+        ThreadTagModelsTests.setUp(self)
+
+    def get_page(self, search_state):
+        qs, meta_data = Thread.objects.run_advanced_search(
+            request_user=self.user, search_state=search_state
+        )
+        paginator, page, next_cursor = Thread.objects.get_questions_page(
+            qs, search_state, self.user, meta_data
+        )
+        return paginator.count, [thread.id for thread in page.object_list]
+
+    def assert_page_matches_search(self, search_state):
+        qs, _ = Thread.objects.run_advanced_search(
+            request_user=self.user, search_state=search_state
+        )
+        start = (search_state.page - 1) * search_state.page_size
+        expected_ids = [thread.id for thread in qs[start:start + search_state.page_size]]
+        self.assertEqual(self.get_page(search_state), (qs.count(), expected_ids))
+
+    def test_canonical_key(self):
+        ss = SearchState.get_empty()
+        self.assertEqual(
+            ss.add_tag('tag1').add_tag('tag2').canonical_key(),
+            ss.add_tag('tag2').add_tag('tag1').change_page(3).canonical_key()
+        )
+        self.assertNotEqual(
+            ss.add_tag('tag1').canonical_key(),
+            ss.add_tag('tag1').change_sort('age-desc').canonical_key()
+        )
+
+    def test_page_is_loaded_by_cached_ids(self):
+        ss = SearchState.get_empty().add_tag('tag3')
+        self.assert_page_matches_search(ss)
+        # the marked tags of the user and the page threads
+        with self.assertNumQueries(3):
+            count, thread_ids = self.get_page(ss)
+        self.assertEqual(count, 3)
+
+    def test_thread_change_invalidates_searches_by_its_tags(self):
+        tag1_search = SearchState.get_empty().add_tag('tag1')
+        tag6_search = SearchState.get_empty().add_tag('tag6')
+        all_search = SearchState.get_empty()
+        for ss in (tag1_search, tag6_search, all_search):
+            self.assert_page_matches_search(ss)
+        tag6_generations = Thread.objects.get_search_generations(['tag6'])
+
+        self.post_answer(question=self.q1)
+        self.user.retag_question(question=self.q2, tags='tag1')
+        for ss in (tag1_search, all_search):
+            self.assert_page_matches_search(ss)
+        self.assertEqual(self.get_page(tag1_search)[0], 3)
+        self.assertEqual(Thread.objects.get_search_generations(['tag6']), tag6_generations)
+
+        self.user.delete_question(self.q4)
+        for ss in (tag1_search, tag6_search, all_search):
+            self.assert_page_matches_search(ss)
+
+    def test_pages_beyond_cached_ids(self):
+        ss = SearchState(page_size=1, page=2, sort='age-desc')
+        with mock.patch('askbot.models.question.SEARCH_RESULTS_MAX_IDS', 2):
+            self.assert_page_matches_search(ss)
+            self.assert_page_matches_search(ss.change_page(4))
+
+
+@override_django_settings(ASKBOT_POSTGRESQL_DEFERRED_SEARCH_VECTORS=True)
+class SearchVectorUpdateTests(AskbotTestCase):
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.question = self.post_question(user=self.user)
+        self.thread = self.question.thread
+
+    def get_queued_ids(self):
+        return set(SearchVectorUpdate.objects.values_list('thread_id', flat=True))
+
+    def test_changed_threads_are_queued(self):
+        other = self.post_question(user=self.user)
+        self.assertEqual(self.get_queued_ids(), {self.thread.id, other.thread.id})
+
+        SearchVectorUpdate.objects.all().delete()
+        self.post_answer(question=self.question, user=self.create_user('other'))
+        self.assertEqual(self.get_queued_ids(), {self.thread.id})
+
+    @override_django_settings(ASKBOT_POSTGRESQL_DEFERRED_SEARCH_VECTORS=False)
+    def test_threads_not_queued_when_disabled(self):
+        SearchVectorUpdate.objects.all().delete()
+        self.post_answer(question=self.question)
+        self.assertEqual(self.get_queued_ids(), set())
+
+    @override_django_settings(ASKBOT_POSTGRESQL_DEFERRED_SEARCH_VECTORS=False)
+    def test_threads_queued_during_rebuild(self):
+        SearchVectorUpdate.objects.all().delete()
+        SearchVectorUpdate.objects.set_rebuilding(True)
+        try:
+            self.post_answer(question=self.question)
+        finally:
+            SearchVectorUpdate.objects.set_rebuilding(False)
+        self.assertEqual(self.get_queued_ids(), {self.thread.id})
+        self.assertFalse(SearchVectorUpdate.objects.is_queueing())
+
+    def test_update_all_processes_queue_in_batches(self):
+        other = self.post_question(user=self.user)
+        third = self.post_question(user=self.user)
+        target = 'askbot.search.postgresql.update_thread_search_vectors'
+        with mock.patch(target) as update_vectors:
+            count = SearchVectorUpdate.objects.update_all(batch_size=2)
+        self.assertEqual(count, 3)
+        self.assertEqual(update_vectors.call_count, 2)
+        updated_ids = set()
+        for call in update_vectors.call_args_list:
+            updated_ids.update(call[0][0])
+        self.assertEqual(updated_ids, {self.thread.id, other.thread.id, third.thread.id})
+        self.assertEqual(self.get_queued_ids(), set())
+
+    def test_command_empties_queue(self):
+        with mock.patch('askbot.search.postgresql.update_thread_search_vectors'):
+            management.call_command('askbot_update_search_vectors')
+        self.assertEqual(self.get_queued_ids(), set())
+
+
+class KeysetPostSearchResults(PostSearchResults):
+    MAX_CACHED_IDS = 1
+
+
+class PostSearchResultsTests(AskbotTestCase):
+
+    def setUp(self):
+        cache.cache.clear()
+        self.user = self.create_user()
+        other_user = self.create_user('other_user')
+        question = self.post_question(user=self.user, body_text='apple pie')
+        self.post_answer(question=question, user=self.user, body_text='pear pie')
+        answer = self.post_answer(question=question, user=other_user, body_text='apple tart')
+        self.post_comment(parent_post=answer, user=self.user, body_text='apple crumble')
+        self.expected_ids = list(
+            Post.objects.filter(text__icontains='apple').order_by('id').values_list('id', flat=True)
+        )
+
+    def assert_browses_posts(self, results_class):
+        results = results_class('apple')
+        self.assertEqual(results.count, 3)
+        self.assertEqual(results.get_post().id, self.expected_ids[0])
+        self.assertEqual(results.get_post(ordinal=3).id, self.expected_ids[2])
+        self.assertEqual(results.get_post(ordinal=4), None)
+        for ordinal, post_id in enumerate(self.expected_ids, 1):
+            self.assertEqual(results.get_ordinal(post_id), ordinal)
+        prev_id, next_id = results.get_neighbour_ids(self.expected_ids[1], 2)
+        self.assertEqual((prev_id, next_id), (self.expected_ids[0], self.expected_ids[2]))
+        self.assertEqual(results.get_neighbour_ids(self.expected_ids[2], 3), (self.expected_ids[1], None))
+
+    def test_cached_ids(self):
+        self.assert_browses_posts(PostSearchResults)
+        with self.assertNumQueries(0):
+            results = PostSearchResults('apple')
+            self.assertEqual(results.get_ordinal(self.expected_ids[2]), 3)
+            results.get_neighbour_ids(self.expected_ids[2], 3)
+
+    def test_cache_key_depends_on_language(self):
+        with translation.override('en'):
+            english_key = PostSearchResults('apple').cache_key
+        with translation.override('de'):
+            self.assertNotEqual(PostSearchResults('apple').cache_key, english_key)
+
+    def test_keyset_navigation(self):
+        self.assert_browses_posts(KeysetPostSearchResults)
+        # ordinal of the next post is cached when the previous one is shown
+        results = KeysetPostSearchResults('apple')
+        with self.assertNumQueries(0):
+            self.assertEqual(results.get_ordinal(self.expected_ids[2]), 3)
+
+    def test_not_matching_post(self):
+        pear_answer = Post.objects.get(text__icontains='pear')
+        for results_class in (PostSearchResults, KeysetPostSearchResults):
+            cache.cache.clear()
+            self.assertEqual(results_class('apple').get_post(post_id=pear_answer.id), None)
+
+    def test_search_posts_view(self):
+        self.user.set_status('d')
+        self.client.login(user_id=self.user.id, method='force')
+        response = self.client.get(reverse('search_posts'), {'q': 'apple', 'post_id': self.expected_ids[1]})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'post_id=%d&' % self.expected_ids[0])
+        self.assertContains(response, 'post_id=%d&' % self.expected_ids[2])
+
+
 class ThreadRenderLowLevelCachingTests(AskbotTestCase):
     def setUp(self):
         self.create_user()
@@ -632,6 +947,38 @@ class ThreadRenderCacheUpdateTests(AskbotTestCase):
         html = self._html_for_question(thread._question_post())
         self.assertEqual(html, thread.get_cached_summary_html())
 
+    @override_django_settings(ASKBOT_VIEW_COUNT_BUFFER_ENABLED=True)
+    def test_buffered_view_count(self):
+        # the summary is cached per language, the requests activate 'en'
+        with translation.override('en'):
+            self.assert_view_count_is_buffered()
+
+    def assert_view_count_is_buffered(self):
+        question = self.post_question()
+        thread = question.thread
+        thread.update_summary_html()
+        # make sure that the caching backend is set up properly
+        self.assertTrue(thread.summary_html_cached())
+        self.client.logout()
+
+        for num in range(2):
+            client = Client()
+            client.get(
+                question.get_absolute_url(),
+                HTTP_ACCEPT_LANGUAGE='en',
+                HTTP_USER_AGENT='Mozilla Gecko'
+            )
+        self.assertEqual(0, Thread.objects.get(id=thread.id).view_count)
+        # buffered views do not drop the summary
+        self.assertTrue(thread.summary_html_cached())
+
+        self.assertEqual(1, Thread.objects.flush_view_count_buffer())
+        self.assertEqual(2, Thread.objects.get(id=thread.id).view_count)
+        self.assertFalse(thread.summary_html_cached())
+        # nothing left to flush
+        self.assertEqual(0, Thread.objects.flush_view_count_buffer())
+        self.assertEqual(2, Thread.objects.get(id=thread.id).view_count)
+
     def test_question_upvote_downvote(self):
         question = self.post_question()
         question.points = 5
@@ -0,0 +1,141 @@
+"""Tests of the built-in full text search index"""
+import os
+import shutil
+import tempfile
+from django.test import TestCase
+from django.test import override_settings as override_django_settings
+from askbot.models import Thread
+from askbot.search import native as native_search
+from askbot.search.native.analyzers import get_analyzer
+from askbot.search.native.index import SearchIndex
+from askbot.search.state_manager import SearchState
+from askbot.tests.utils import AskbotTestCase
+
+
+class AnalyzerTests(TestCase):
+
+    def test_words_are_lowercased(self):
+        terms = get_analyzer('en').tokenize('Django, ORM and SQLite!')
+        self.assertEqual(terms, ['django', 'orm', 'and', 'sqlite'])
+
+    def test_regional_language_code(self):
+        self.assertEqual(get_analyzer('pt_BR').language_code, 'pt')
+        self.assertEqual(get_analyzer('zh_CN').language_code, 'zh-cn')
+
+    def test_chinese_text_is_split_into_bigrams(self):
+        terms = get_analyzer('zh-cn').tokenize('搜索引擎')
+        self.assertEqual(terms, ['搜索', '索引', '引擎'])
+
+
+class SearchIndexTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'en.sqlite3')
+        self.index = SearchIndex(path, get_analyzer('en'))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.directory)
+
+    def test_documents_are_ranked(self):
+        self.index.add_document(1, [('database migrations', 1)])
+        self.index.add_document(2, [('database database migrations', 1)])
+        self.index.add_document(3, [('templates', 1)])
+        self.index.add_document(4, [('database', 3)])
+        doc_ids = [doc_id for doc_id, score in self.index.search('database', 10)]
+        self.assertEqual(doc_ids, [4, 2, 1])
+
+    def test_rare_terms_score_higher(self):
+        self.index.add_document(1, [('common words', 1)])
+        self.index.add_document(2, [('common rare', 1)])
+        self.index.add_document(3, [('common', 1)])
+        results = self.index.search('common rare', 10)
+        self.assertEqual(results[0][0], 2)
+
+    def test_document_is_replaced_and_removed(self):
+        self.index.add_document(1, [('old text', 1)])
+        self.index.add_document(1, [('new text', 1)])
+        self.assertEqual(self.index.search('old', 10), [])
+        self.assertEqual(len(self.index.search('new', 10)), 1)
+        self.index.remove_document(1)
+        self.assertEqual(self.index.search('new', 10), [])
+
+    def test_limit(self):
+        for doc_id in range(5):
+            self.index.add_document(doc_id, [('text', 1)])
+        self.assertEqual(len(self.index.search('text', 3)), 3)
+
+
+class NativeSearchTests(AskbotTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_django_settings(
+            ASKBOT_SEARCH_INDEX_ENABLED=True,
+            ASKBOT_SEARCH_INDEX_DIR=self.directory
+        )
+        self.settings_override.enable()
+        self.user = self.create_user()
+        self.q1 = self.post_question(
+            title='How to configure the mail server',
+            body_text='sending email fails with a timeout',
+            tags='email'
+        )
+        self.q2 = self.post_question(
+            title='Upload of large images',
+            body_text='the upload of images stops at 2 megabytes',
+            tags='images'
+        )
+
+    def tearDown(self):
+        native_search.get_index('en').close()
+        self.settings_override.disable()
+        shutil.rmtree(self.directory)
+
+    def search(self, query):
+        search_state = SearchState.get_empty()
+        search_state.query = query
+        search_state.stripped_query = query
+        qs, meta_data = Thread.objects.run_advanced_search(
+            request_user=self.user, search_state=search_state
+        )
+        return [thread.id for thread in qs]
+
+    def test_new_posts_are_found(self):
+        self.assertEqual(self.search('timeout'), [self.q1.thread_id])
+        self.post_answer(question=self.q2, body_text='increase the nginx body size')
+        self.assertEqual(self.search('nginx'), [self.q2.thread_id])
+
+    def test_edited_post_is_reindexed(self):
+        self.edit_question(user=self.user, question=self.q1, title='Mail server configuration',
+                           body_text='messages are rejected by the relay', tags='email')
+        self.assertEqual(self.search('timeout'), [])
+        self.assertEqual(self.search('relay'), [self.q1.thread_id])
+
+    def test_retagged_thread_is_reindexed(self):
+        self.user.retag_question(question=self.q2, tags='uploads')
+        self.assertEqual(self.search('uploads'), [self.q2.thread_id])
+
+    def test_deleted_question_is_removed(self):
+        self.user.delete_post(self.q1)
+        self.assertEqual(self.search('timeout'), [])
+        self.user.restore_post(self.q1)
+        self.assertEqual(self.search('timeout'), [self.q1.thread_id])
+
+    def test_results_are_sorted_by_relevance(self):
+        self.post_answer(question=self.q1, body_text='images of the mail server logs')
+        search_state = SearchState.get_empty()
+        search_state.query = search_state.stripped_query = 'images'
+        search_state.sort = 'relevance-desc'
+        qs, meta_data = Thread.objects.run_advanced_search(
+            request_user=self.user, search_state=search_state
+        )
+        self.assertEqual([thread.id for thread in qs], [self.q2.thread_id, self.q1.thread_id])
+
+    def test_rebuild_command(self):
+        from django.core import management
+        native_search.get_index('en').clear()
+        self.assertEqual(self.search('timeout'), [])
+        management.call_command('askbot_rebuild_search_index')
+        self.assertEqual(self.search('timeout'), [self.q1.thread_id])
@@ -0,0 +1,92 @@
+"""Tests of the profiling of the question searches"""
+from io import StringIO
+from django.core import management
+from django.test import override_settings as override_django_settings
+from askbot import const
+from askbot.models import SearchShapeStats, SlowSearch, Thread
+from askbot.search.profiling import get_search_shape
+from askbot.search.state_manager import SearchState
+from askbot.tests.utils import AskbotTestCase
+
+
+@override_django_settings(
+    ASKBOT_SEARCH_PROFILE_SAMPLE_RATE=1,
+    ASKBOT_SEARCH_SLOW_LOG_THRESHOLD=0,
+    ASKBOT_SEARCH_RESULTS_CACHE_TIMEOUT=0
+)
+class SearchProfilingTests(AskbotTestCase):
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.post_question(user=self.user, tags='one two')
+        self.post_question(user=self.user, tags='one')
+
+    def run_search(self, **kwargs):
+        search_state = SearchState(user_logged_in=True, **kwargs)
+        qs, meta_data = Thread.objects.run_advanced_search(
+            request_user=self.user, search_state=search_state
+        )
+        return Thread.objects.get_questions_page(qs, search_state, self.user, meta_data)
+
+    def test_search_shape(self):
+        tags = const.TAG_SEP.join(['one', 'two'])
+        search_state = SearchState(tags=tags, sort='votes-desc', user_logged_in=True)
+        self.user.display_tag_filter_strategy = const.INCLUDE_INTERESTING
+        shape = get_search_shape(search_state, self.user, False)
+        self.assertIn('sort=votes-desc tags=2 strategy=include-interesting', shape)
+        self.assertIn('listing=0', shape)
+
+    def test_searches_are_counted_by_shape(self):
+        self.run_search(tags='one')
+        self.run_search(tags='two')
+        self.run_search()
+        stats = SearchShapeStats.objects.order_by('shape')
+        self.assertEqual(stats.count(), 2)
+        self.assertEqual([item.search_count for item in stats], [1, 2])
+        tag_stats = stats.get(shape__contains='tags=1')
+        self.assertEqual(tag_stats.total_found, 3)
+        self.assertEqual(tag_stats.slow_count, 2)
+        self.assertTrue(tag_stats.total_queries > 0)
+        self.assertTrue(tag_stats.max_ms > 0)
+
+    def test_slow_searches_are_logged(self):
+        paginator, page, _ = self.run_search(tags='one')
+        self.assertEqual(paginator.count, 2)
+        slow_search = SlowSearch.objects.get()
+        self.assertEqual(slow_search.found_count, 2)
+        self.assertIn('tags:one', slow_search.search_url)
+        self.assertIn('askbot_thread', slow_search.sql)
+        self.assertEqual(slow_search.plan, '')
+
+    @override_django_settings(ASKBOT_SEARCH_SLOW_LOG_EXPLAIN=True)
+    def test_query_plan_is_saved(self):
+        self.run_search()
+        self.assertNotEqual(SlowSearch.objects.get().plan, '')
+
+    @override_django_settings(ASKBOT_SEARCH_SLOW_LOG_SIZE=2)
+    def test_slow_log_is_rotated(self):
+        for _ in range(3):
+            self.run_search()
+        self.assertEqual(SlowSearch.objects.count(), 2)
+
+    @override_django_settings(ASKBOT_SEARCH_SLOW_LOG_THRESHOLD=60000)
+    def test_fast_searches_are_not_logged(self):
+        self.run_search()
+        self.assertEqual(SlowSearch.objects.count(), 0)
+        self.assertEqual(SearchShapeStats.objects.get().slow_count, 0)
+
+    @override_django_settings(ASKBOT_SEARCH_PROFILE_SAMPLE_RATE=0)
+    def test_searches_are_not_profiled_when_disabled(self):
+        self.run_search()
+        self.assertEqual(SearchShapeStats.objects.count(), 0)
+
+    def test_stats_command(self):
+        self.run_search()
+        output = StringIO()
+        management.call_command('askbot_search_stats', slow=1, stdout=output)
+        self.assertIn('scope=', output.getvalue())
+        self.assertIn('askbot_thread', output.getvalue())
+
+        management.call_command('askbot_search_stats', reset=True)
+        self.assertEqual(SearchShapeStats.objects.count(), 0)
+        self.assertEqual(SlowSearch.objects.count(), 0)
@@ -2,6 +2,7 @@ from askbot.tests.utils import AskbotTestCase
 from askbot.search.state_manager import SearchState
 import askbot.conf
 from django.urls import reverse
+from django.test import override_settings as override_django_settings
 
 
 class SearchStateTests(AskbotTestCase):
@@ -290,3 +291,23 @@ class SearchStateTests(AskbotTestCase):
             ss.query_string()
         )
 
+
+    @override_django_settings(ASKBOT_KEYSET_PAGINATION_ENABLED=True)
+    def test_cursor(self):
+        ss = SearchState(sort='votes-desc', page='2', cursor='-3_15')
+        self.assertEqual(ss.get_cursor_value(), (-3, 15))
+        self.assertEqual(
+            'scope:all/sort:votes-desc/page:2/after:-3_15/',
+            ss.query_string()
+        )
+        # cursor is dropped when the search state changes
+        self.assertEqual(ss.change_sort('age-desc').cursor, None)
+        self.assertEqual(ss.add_tag('tag1').cursor, None)
+        self.assertEqual(ss.change_page(3, cursor='-4_1').cursor, '-4_1')
+        # only some sort methods support the cursor
+        ss = SearchState(sort='answers-desc', cursor='5_15')
+        self.assertEqual(ss.cursor, None)
+
+    def test_cursor_disabled(self):
+        ss = SearchState(sort='votes-desc', cursor='5_15')
+        self.assertEqual(ss.cursor, None)
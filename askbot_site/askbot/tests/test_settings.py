@@ -1,8 +1,14 @@
+from unittest.mock import patch, PropertyMock
 from django.conf import settings as django_settings
 from django.urls import reverse
 from django.utils import translation
 from askbot.tests.utils import AskbotTestCase
 from askbot.conf import settings as askbot_settings
+from askbot.conf.settings_wrapper import (ConfigSettings,
+                                          bump_settings_generation,
+                                          get_settings_generation)
+from livesettings.values import Value
+from askbot import context
 import askbot
 
 class SettingsTests(AskbotTestCase):
@@ -55,3 +61,59 @@ class SettingsTests(AskbotTestCase):
         self.client.login(user_id=self.admin.id, method='force')
         response = self.client.get(reverse('satchmo_site_settings'))
         self.assertEqual(response.status_code, 200)
+
+    def test_update_bumps_settings_generation(self):
+        generation = get_settings_generation()
+        backup = askbot_settings.MIN_REP_TO_VOTE_UP
+        askbot_settings.update('MIN_REP_TO_VOTE_UP', 500)
+        self.assertNotEqual(get_settings_generation(), generation)
+        askbot_settings.update('MIN_REP_TO_VOTE_UP', backup)
+
+
+class SettingsSnapshotTests(AskbotTestCase):
+
+    def test_snapshot_is_memoized(self):
+        memo = {'MIN_REP_TO_VOTE_UP': -1}
+        language = translation.get_language()
+        context.SETTINGS_SNAPSHOTS[language] = (get_settings_generation(), memo)
+        self.assertIs(context.get_settings_snapshot(), memo)
+
+        bump_settings_generation()
+        snapshot = context.get_settings_snapshot()
+        self.assertEqual(snapshot['MIN_REP_TO_VOTE_UP'], askbot_settings.MIN_REP_TO_VOTE_UP)
+
+    def test_snapshot_is_refreshed_on_update(self):
+        backup = askbot_settings.MIN_REP_TO_VOTE_UP
+        context.get_settings_snapshot()
+        askbot_settings.update('MIN_REP_TO_VOTE_UP', backup + 10)
+        try:
+            snapshot = context.get_settings_snapshot()
+            self.assertEqual(snapshot['MIN_REP_TO_VOTE_UP'], backup + 10)
+        finally:
+            askbot_settings.update('MIN_REP_TO_VOTE_UP', backup)
+
+
+class LocalSettingsCacheTests(AskbotTestCase):
+
+    def test_values_are_read_once_per_generation(self):
+        ConfigSettings.validate_local_cache()
+        value = askbot_settings.MIN_REP_TO_VOTE_UP
+        with patch.object(Value, 'value', new_callable=PropertyMock) as mocked:
+            mocked.return_value = value + 1
+            self.assertEqual(askbot_settings.MIN_REP_TO_VOTE_UP, value)
+            self.assertFalse(mocked.called)
+
+            # a change in another process bumps the generation
+            bump_settings_generation()
+            ConfigSettings.validate_local_cache()
+            self.assertEqual(askbot_settings.MIN_REP_TO_VOTE_UP, value + 1)
+        ConfigSettings.clear_local_cache()
+
+    def test_update_clears_local_values(self):
+        backup = askbot_settings.MIN_REP_TO_VOTE_UP
+        askbot_settings.update('MIN_REP_TO_VOTE_UP', backup + 10)
+        try:
+            self.assertEqual(askbot_settings.MIN_REP_TO_VOTE_UP, backup + 10)
+        finally:
+            askbot_settings.update('MIN_REP_TO_VOTE_UP', backup)
+        self.assertEqual(askbot_settings.MIN_REP_TO_VOTE_UP, backup)
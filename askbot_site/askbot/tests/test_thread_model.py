@@ -1,8 +1,10 @@
-from unittest import skip
+from unittest import mock, skip
 from askbot.tests.utils import AskbotTestCase
 from askbot.conf import settings as askbot_settings
 from askbot import models
 import django.core.mail
+from django.core import management
+from django.core.cache import cache
 from django.urls import reverse
 
 class ThreadModelTestsWithGroupsEnabled(AskbotTestCase):
@@ -136,3 +138,65 @@ class ThreadModelTestsWithGroupsEnabled(AskbotTestCase):
         answer_groups = set(answer.groups.all())
         user_groups = set(self.user.get_groups())
         self.assertEqual(len(answer_groups & user_groups), 1)
+
+
+class SimilarThreadsTests(AskbotTestCase):
+
+    def setUp(self):
+        self.user = self.create_user()
+        # "common" is on every question, so it weighs least
+        self.q1 = self.post_question(title='first question', tags='common rare')
+        self.q2 = self.post_question(title='second question', tags='common')
+        self.q3 = self.post_question(title='third question', tags='rare')
+        self.q4 = self.post_question(title='fourth question', tags='common rare')
+
+    def get_similar_titles(self, question):
+        cache.clear()
+        thread = self.reload_object(question.thread)
+        return [item['title'] for item in thread.get_similar_threads().data()]
+
+    def test_rare_common_tags_weigh_more(self):
+        # weights of the tags are updated by the rebuild
+        management.call_command('askbot_rebuild_similar_threads')
+        self.assertEqual(
+            self.get_similar_titles(self.q1),
+            ['fourth question', 'third question', 'second question']
+        )
+        self.assertEqual(
+            self.get_similar_titles(self.q3),
+            ['fourth question', 'first question']
+        )
+
+    def test_retag_updates_lists_of_other_threads(self):
+        self.user.retag_question(question=self.q2, tags='common rare')
+        self.assertEqual(
+            set(self.get_similar_titles(self.q3)),
+            set(['first question', 'second question', 'fourth question'])
+        )
+        self.user.retag_question(question=self.q4, tags='other')
+        self.assertEqual(self.get_similar_titles(self.q4), [])
+        self.assertEqual(
+            set(self.get_similar_titles(self.q3)),
+            set(['first question', 'second question'])
+        )
+
+    def test_deleted_threads_are_hidden(self):
+        self.user.delete_question(self.q4)
+        self.assertNotIn('fourth question', self.get_similar_titles(self.q1))
+
+    def test_threads_without_similar_ones_are_computed_once(self):
+        question = self.post_question(title='lonely question', tags='lonely')
+        models.Thread.objects.filter(id=question.thread_id).update(similar_threads_computed=False)
+        self.assertEqual(self.get_similar_titles(question), [])
+        self.assertTrue(self.reload_object(question.thread).similar_threads_computed)
+        target = 'askbot.models.question.ThreadSimilarityManager.update_for_thread'
+        with mock.patch(target) as update_for_thread:
+            self.assertEqual(self.get_similar_titles(question), [])
+        self.assertFalse(update_for_thread.called)
+
+    def test_rebuild_command(self):
+        expected = self.get_similar_titles(self.q1)
+        models.ThreadSimilarity.objects.all().delete()
+        management.call_command('askbot_rebuild_similar_threads')
+        self.assertEqual(self.get_similar_titles(self.q1), expected)
+        self.assertEqual(models.ThreadSimilarity.objects.filter(thread=self.q2.thread).count(), 2)
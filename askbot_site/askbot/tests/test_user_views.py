@@ -1,8 +1,14 @@
+import datetime
+from askbot import models
 from askbot.tests.utils import AskbotTestCase
 from askbot.utils.functions import decode_jwt
 from askbot.views.users import owner_or_moderator_required
 from django.contrib.auth.models import AnonymousUser
+from django.core import management
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.http import HttpResponseRedirect
 from mock import Mock
 import urllib.request, urllib.parse, urllib.error
@@ -39,3 +45,152 @@ class UserViewsTests(AskbotTestCase):
         self.assertEqual(set(query.keys()), set(['foo', 'abra']))
         self.assertEqual(set(query.values()), set(['bar', 'cadabra']))
         self.assertEqual(query['abra'], 'cadabra')
+
+
+@override_settings(ASKBOT_USER_SEARCH_INDEX_ENABLED=True)
+class UsersListTests(AskbotTestCase):
+
+    def setUp(self):
+        self.alice = self.create_user('alice.smith', reputation=10)
+        self.alice.real_name = 'Wonder Woman'
+        self.alice.save()
+        self.alicia = self.create_user('alicia', reputation=20)
+        self.alicia.update_localized_profile(about='Python programmer from Smithville')
+        self.create_user('bob')
+
+    def search_users(self, query):
+        users = models.get_users_by_text_query(query, models.User.objects.all())
+        users = users.order_by('-askbot_profile__reputation')
+        return [user.username for user in users]
+
+    def test_prefix_search_ordered_by_reputation(self):
+        self.assertEqual(self.search_users('ali'), ['alicia', 'alice.smith'])
+        self.assertEqual(self.search_users('Smith'), ['alicia', 'alice.smith'])
+        self.assertEqual(self.search_users('ali smi'), ['alicia', 'alice.smith'])
+        self.assertEqual(self.search_users('wond'), ['alice.smith'])
+        self.assertEqual(self.search_users('prog'), ['alicia'])
+        self.assertEqual(self.search_users('xyz'), [])
+
+        response = self.client.get(reverse('users'), {'query': 'wond'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'alice.smith')
+        self.assertNotContains(response, 'alicia')
+
+    def test_index_tracks_changes(self):
+        self.alice.username = 'carol'
+        self.alice.save()
+        self.alice.real_name = ''
+        self.alice.save()
+        self.alicia.update_localized_profile(about='')
+        self.assertEqual(self.search_users('ali'), ['alicia'])
+        self.assertEqual(self.search_users('car'), ['carol'])
+        self.assertEqual(self.search_users('wond'), [])
+        self.assertEqual(self.search_users('smi'), [])
+
+    def test_rebuild_command(self):
+        terms = set(models.UserSearchTerm.objects.values_list('user_id', 'source', 'term'))
+        management.call_command('askbot_rebuild_user_search_index')
+        rebuilt_terms = set(models.UserSearchTerm.objects.values_list('user_id', 'source', 'term'))
+        self.assertEqual(terms, rebuilt_terms)
+
+    def test_users_count_is_cached(self):
+        cache.clear()
+        users = models.User.objects.filter(is_active=True)
+        self.assertEqual(models.get_cached_users_count(users), 3)
+        self.create_user('dave')
+        self.assertEqual(models.get_cached_users_count(users), 4)
+        users.filter(username='dave').update(is_active=False)
+        self.assertEqual(models.get_cached_users_count(users), 4)
+
+
+@override_settings(ASKBOT_REPUTATION_SNAPSHOTS_ENABLED=True)
+class ReputationSnapshotTests(AskbotTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_user('user')
+        self.now = timezone.now().replace(hour=12)
+
+    def add_repute(self, days_ago, reputation, hours=0):
+        repute = models.Repute(
+            user=self.user,
+            positive=1,
+            reputed_at=self.now - datetime.timedelta(days=days_ago, hours=hours),
+            reputation_type=10,
+            reputation=reputation,
+            comment='bonus'
+        )
+        repute.save()
+        return repute
+
+    def get_snapshots(self):
+        return list(
+            models.ReputationSnapshot.objects.filter(
+                user=self.user
+            ).order_by('date').values_list('date', 'reputation')
+        )
+
+    def test_last_repute_of_the_day_is_recorded(self):
+        self.add_repute(2, 10)
+        self.add_repute(1, 20, hours=1)
+        self.add_repute(1, 30)
+        # a late saved earlier change does not replace the snapshot
+        self.add_repute(1, 25, hours=2)
+        self.assertEqual(self.get_snapshots(), [
+            ((self.now - datetime.timedelta(days=2)).date(), 10),
+            ((self.now - datetime.timedelta(days=1)).date(), 30),
+        ])
+
+    def test_rebuild_command(self):
+        for days_ago in range(5):
+            self.add_repute(days_ago, 10 - days_ago)
+            self.add_repute(days_ago, 20 - days_ago, hours=1)
+        snapshots = self.get_snapshots()
+        models.ReputationSnapshot.objects.all().delete()
+        management.call_command('askbot_rebuild_reputation_snapshots')
+        self.assertEqual(self.get_snapshots(), snapshots)
+        self.assertEqual(len(snapshots), 5)
+
+    def test_graph_points_are_sampled(self):
+        for days_ago in range(10):
+            self.add_repute(days_ago, 100 - days_ago)
+        language_code = models.ReputationSnapshot.objects.first().language_code
+        points = models.ReputationSnapshot.objects.get_graph_points(
+            self.user, language_code, 3
+        )
+        # the last snapshot of each of the buckets of 4, 3 and 3 days
+        self.assertEqual([reputation for _, reputation in points], [100, 97, 94])
+
+        points = models.ReputationSnapshot.objects.get_graph_points(
+            self.user, language_code, 20
+        )
+        self.assertEqual(len(points), 10)
+
+    @override_settings(ASKBOT_REPUTATION_SNAPSHOTS_ENABLED=False)
+    def test_repute_graph_points_are_sampled(self):
+        for days_ago in range(10):
+            self.add_repute(days_ago, 100 - days_ago)
+        language_code = models.Repute.objects.first().language_code
+        with self.assertNumQueries(2):
+            points = models.Repute.objects.get_graph_points(self.user, language_code, 3)
+        # the 1st, 5th and 8th of the newest first reputes
+        self.assertEqual([reputation for _, reputation in points], [100, 96, 93])
+
+        points = models.Repute.objects.get_graph_points(self.user, language_code, 20)
+        self.assertEqual([reputation for _, reputation in points], list(range(100, 90, -1)))
+
+    def test_graph_points_cache_is_invalidated(self):
+        self.add_repute(1, 10)
+        language_code = models.ReputationSnapshot.objects.first().language_code
+        get_points = models.ReputationSnapshot.objects.get_graph_points
+        self.assertEqual(len(get_points(self.user, language_code, 10)), 1)
+        self.add_repute(0, 20)
+        self.assertEqual(len(get_points(self.user, language_code, 10)), 2)
+
+    def test_reputation_tab_renders(self):
+        self.add_repute(1, 10)
+        url = reverse('user_profile', kwargs={'id': self.user.id, 'slug': self.user.username})
+        response = self.client.get(url, {'sort': 'reputation'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, ',10]')
+
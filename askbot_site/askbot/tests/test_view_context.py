@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AnonymousUser
-from askbot.tests.utils import AskbotTestCase
+from django.core.cache import cache
+from askbot.tests.utils import AskbotTestCase, with_settings
+from askbot import api
+from askbot import context as app_context
 from askbot.models import Group
 from askbot.views import context
 
@@ -26,3 +29,58 @@ class ViewContextTests(AskbotTestCase):
         inbox_context = context.get_for_inbox(simple)
         values = set(inbox_context.values())
         self.assertEqual(values, set([0, 0]))
+
+
+class ApplicationSettingsTests(AskbotTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @with_settings(GROUPS_ENABLED=True)
+    def test_group_list_is_cached(self):
+        group = Group(name='grp', openness=Group.OPEN)
+        group.save()
+        names = [item['name'] for item in app_context.make_group_list()]
+        self.assertTrue('grp' in names)
+
+        with self.assertNumQueries(0):
+            app_context.make_group_list(groups_enabled=True)
+
+    @with_settings(GROUPS_ENABLED=True)
+    def test_group_list_cache_cleared_on_group_change(self):
+        group = Group(name='grp', openness=Group.OPEN)
+        group.save()
+        app_context.make_group_list()
+
+        group.name = 'renamed'
+        group.save()
+        names = [item['name'] for item in app_context.make_group_list()]
+        self.assertTrue('renamed' in names)
+        self.assertFalse('grp' in names)
+
+        group.delete()
+        names = [item['name'] for item in app_context.make_group_list()]
+        self.assertFalse('renamed' in names)
+
+    def test_moderation_items_are_cached(self):
+        mod = self.create_user('mod', status='d')
+        author = self.create_user('author')
+        flagger = self.create_user('flagger', reputation=10000)
+        question = self.post_question(user=author)
+
+        self.assertEqual(
+            api.get_info_on_moderation_items(mod),
+            {'new_count': 0, 'seen_count': 0}
+        )
+        with self.assertNumQueries(0):
+            api.get_info_on_moderation_items(mod)
+
+        # the flag notifies the moderators
+        flagger.flag_post(question)
+        counts = api.get_info_on_moderation_items(mod)
+        self.assertEqual(counts, {'new_count': 1, 'seen_count': 0})
+
+        # visiting the question marks the flag as seen
+        mod.visit_question(question)
+        counts = api.get_info_on_moderation_items(mod)
+        self.assertEqual(counts, {'new_count': 0, 'seen_count': 1})
@@ -1,6 +1,7 @@
 """utility functions used by Askbot test cases
 """
 from functools import wraps
+from unittest import mock
 from markdown2 import Markdown
 from django.apps import apps
 from django.contrib.auth.management import create_permissions
@@ -14,6 +15,8 @@ from django.db.models.signals import post_migrate
 from django.test import TestCase
 from askbot import models
 from askbot import signals
+from askbot.search import tag_trie
+from askbot.search import title_index
 
 def with_settings(**settings_dict):
     """a decorator that will run function with settings
@@ -107,6 +110,25 @@ class AskbotTestCase(TestCase):
     to django TestCase class
     """
 
+    def _pre_setup(self):
+        super(AskbotTestCase, self)._pre_setup()
+        # the in-process search indexes are rebuilt in each test
+        # and in the request, because the changes are recorded on commit
+        # and the background threads do not see the uncommitted test data
+        tag_trie.clear_local_tries()
+        title_index.clear_local_indexes()
+        self._index_patchers = [
+            mock.patch.object(module, 'BUILD_IN_BACKGROUND', False)
+            for module in (tag_trie, title_index)
+        ]
+        for patcher in self._index_patchers:
+            patcher.start()
+
+    def _post_teardown(self):
+        for patcher in self._index_patchers:
+            patcher.stop()
+        super(AskbotTestCase, self)._post_teardown()
+
     def _fixture_setup(self):
         super(AskbotTestCase, self)._fixture_setup()
         for app_config in apps.get_app_configs():
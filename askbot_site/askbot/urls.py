@@ -48,6 +48,7 @@ urlpatterns = [
             r'(%s)?' % r'/tags:(?P<tags>[\w+.#,-]+)' + # Should match: const.TAG_CHARS + ','; TODO: Is `#` char decoded by the time URLs are processed ??
             r'(%s)?' % r'/author:(?P<author>\d+)' +
             r'(%s)?' % r'/page:(?P<page>\d+)' +
+            r'(%s)?' % r'/after:(?P<cursor>-?\d+_\d+)' +
             r'(%s)?' % r'/page-size:(?P<page_size>\d+)' +
             r'(%s)?' % r'/query:(?P<query>.+)' +  # INFO: query is last, b/c it can contain slash!!!
         r'/$'),
@@ -477,6 +478,11 @@ urlpatterns = [
         views.commands.get_tags_by_wildcard,
         name='get_tags_by_wildcard'
     ),
+    service_url(
+        r'^complete-tags/',
+        views.commands.complete_tags,
+        name='complete_tags'
+    ),
     service_url(
         r'^get-tag-list/',
         views.commands.get_tag_list,
@@ -309,3 +309,11 @@ class ProgressBar(object):
         self.print_progress_bar()
         self.counter += 1
         return result
+
+
+def show_progress(iterable, length, message='', verbosity=1):
+    """returns the iterable wrapped in the `ProgressBar`,
+    or the iterable itself if the verbosity is 0"""
+    if verbosity > 0:
+        return ProgressBar(iterable, length, message)
+    return iterable
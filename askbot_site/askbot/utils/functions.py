@@ -239,6 +239,7 @@ def setup_paginator(context):
                 "previous": previous_page_number,
                 "has_previous": page_object.has_previous(),
                 "next": next_page_number,
+                "next_cursor": context.get("next_cursor"),
                 "has_next": page_object.has_next(),
                 "page": context["current_page_number"],
                 "pages": context["pages"],
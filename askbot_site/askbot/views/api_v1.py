@@ -218,7 +218,8 @@ def questions(request):
                                tags=request.GET.get('tags', None),
                                author=author_id,
                                page=page,
-                               user_logged_in=request.user.is_authenticated)
+                               user_logged_in=request.user.is_authenticated,
+                               cursor=request.GET.get('after', None))
 
     qset, meta_data = models.Thread.objects.run_advanced_search(
         request_user=request.user, search_state=search_state
@@ -230,11 +231,8 @@ def questions(request):
     #global_group = models.Group.objects.get_global_group()
     #qs = qs.exclude(~Q(groups__id=global_group.id))
 
-    page_size = askbot_settings.DEFAULT_QUESTIONS_PAGE_SIZE
-    paginator = Paginator(qset, page_size)
-    if paginator.num_pages < search_state.page:
-        search_state.page = 1
-    page = paginator.page(search_state.page)
+    paginator, page, next_cursor = models.Thread.objects.get_questions_page(
+                                                    qset, search_state, request.user, meta_data)
 
     question_list = list()
     for thread in page.object_list:
@@ -246,5 +244,8 @@ def questions(request):
         'pages' : paginator.num_pages,
         'questions': question_list
     }
+    if next_cursor:
+        # value of the "after" parameter for the next page
+        ajax_data['next_cursor'] = next_cursor
     response_data = json.dumps(ajax_data)
     return HttpResponse(response_data, content_type='application/json')
@@ -36,6 +36,7 @@ from askbot import conf
 from askbot import const
 from askbot import mail
 from askbot.conf import settings as askbot_settings
+from askbot.search import tag_trie
 from askbot.utils import category_tree
 from askbot.utils import decorators
 from askbot.utils import url_utils
@@ -277,10 +278,11 @@ def get_tags_by_wildcard(request):
     if wildcard is None:
         return HttpResponseForbidden()
 
-    matching_tags = models.Tag.objects.get_by_wildcards( [wildcard,] )
-    count = matching_tags.count()
-    names = matching_tags.values_list('name', flat = True)[:20]
-    re_data = json.dumps({'tag_count': count, 'tag_names': list(names)})
+    prefix = wildcard[:-1] if wildcard.endswith('*') else wildcard
+    language_code = translation.get_language()
+    count = tag_trie.count(language_code, prefix)
+    names = tag_trie.search(language_code, prefix, limit=20)
+    re_data = json.dumps({'tag_count': count, 'tag_names': names})
     return HttpResponse(re_data, content_type='application/json')
 
 @decorators.get_only
@@ -349,6 +351,25 @@ def get_tag_list(request):
     output = '\n'.join(map(escape, tag_names))
     return HttpResponse(output, content_type='text/plain')
 
+@decorators.get_only
+def complete_tags(request):
+    """returns names of the most used tags starting
+    with the text in the parameter ``q``, one per line,
+    at most ``limit`` tags, 50 is the maximum"""
+    prefix = request.GET.get('q', '').strip()
+    if prefix == '':
+        return HttpResponse('', content_type='text/plain')
+    try:
+        limit = IntegerField(min_value=1).clean(request.GET.get('limit', 10))
+    except ValidationError:
+        return HttpResponseBadRequest()
+
+    names = tag_trie.search(
+        translation.get_language(), prefix, limit=min(limit, tag_trie.TOP_SIZE)
+    )
+    output = '\n'.join(map(escape, names))
+    return HttpResponse(output, content_type='text/plain')
+
 @decorators.get_only
 def load_object_description(request):
     """returns text of the object description in text"""
@@ -704,9 +725,28 @@ def delete_bulk_tag_subscription(request):
 @decorators.get_only
 def api_get_questions(request):
     """json api for retrieving questions by title match"""
-    query = request.GET.get('query_text', '').strip()
+    query = request.GET.get('query_text', '').lstrip()
     tag_name = request.GET.get('tag_name', None)
 
+    use_title_index = django_settings.ASKBOT_TITLE_INDEX_ENABLED \
+        and not getattr(django_settings, 'ENABLE_HAYSTACK_SEARCH', False)
+    if query.strip() and use_title_index:
+        entries = models.Thread.objects.get_title_suggestions(
+            query, request.user, tag_name=tag_name
+        )
+        # until the index is built the titles are queried below
+        if entries is not None:
+            thread_list = [
+                {
+                    'title': escape(entry.title),
+                    'url': entry.get_absolute_url(),
+                    'answer_count': entry.answer_count
+                }
+                for entry in entries
+            ]
+            return HttpResponse(json.dumps(thread_list), content_type="application/json")
+
+    query = query.strip()
     if askbot_settings.GROUPS_ENABLED:
         threads = models.Thread.objects.get_visible(user=request.user)
     else:
@@ -9,7 +9,6 @@ allow adding new comments via Ajax form post.
 import html
 import logging
 import urllib.request, urllib.parse, urllib.error
-import operator
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render
 from django.http import HttpResponseRedirect
@@ -60,7 +59,8 @@ import askbot
 
 # used in index page
 #todo: - take these out of const or settings
-from askbot.models import Post, Vote
+from askbot.models import Vote
+from askbot.models.post import PostSearchResults
 
 #refactor? - we have these
 #views that generate a listing of questions in one way or another:
@@ -93,23 +93,17 @@ def questions(request, **kwargs):
     if meta_data['non_existing_tags']:
         search_state = search_state.remove_tags(meta_data['non_existing_tags'])
 
-    paginator = Paginator(qs, search_state.page_size)
-    if paginator.num_pages < search_state.page:
-        search_state.page = 1
-    page = paginator.page(search_state.page)
-    page.object_list = list(page.object_list) # evaluate the queryset
+    paginator, page, next_cursor = models.Thread.objects.get_questions_page(
+                                                qs, search_state, request.user, meta_data)
 
     # INFO: Because for the time being we need question posts and thread authors
     #       down the pipeline, we have to precache them in thread objects
     models.Thread.objects.precache_view_data_hack(threads=page.object_list)
 
-    related_tags = Tag.objects.get_related_to_search(
-                        threads=page.object_list,
-                        ignored_tag_names=meta_data.get('ignored_tag_names',[])
+    related_tags = models.Thread.objects.get_related_tags(
+                        qs, search_state, request.user, meta_data
                     )
     tag_list_type = askbot_settings.TAG_LIST_FORMAT
-    if tag_list_type == 'cloud': #force cloud to sort by name
-        related_tags = sorted(related_tags, key = operator.attrgetter('name'))
 
     contributors = AvatarsBlockData.get_data()
 
@@ -120,6 +114,7 @@ def questions(request, **kwargs):
         'page_object': page,
         'base_url' : search_state.query_string(),
         'page_size' : search_state.page_size,
+        'next_cursor': next_cursor,
     }
 
     #get url for the rss feed
@@ -854,48 +849,21 @@ def search_posts(request):
     post_id = form.cleaned_data.get('post_id', None)
     post_ord = form.cleaned_data.get('post_ord', None)
 
-    post_types = ('question', 'answer', 'comment')
-    posts = Post.objects.filter(post_type__in=post_types).order_by('id')
+    results = PostSearchResults(query_string)
+    posts_count = results.count
 
-    if query_string:
-        posts = posts.filter(text__icontains=query_string)
-
-    posts_count = posts.count()
-
-    post = None
-    if post_id:
-        try:
-            post = posts.get(pk=post_id)
-        except Post.DoesNotExist:
-            pass
-    elif post_ord:
-        try:
-            post = posts[post_ord - 1]
-        except IndexError:
-            pass
-    elif posts_count:
-        post = posts[0]
-
-    if post and not post_ord:
-        post_ord = posts.filter(id__lt=post.pk).count() + 1
-
-    prev_post, next_post = [None] * 2
+    post = results.get_post(post_id=post_id, ordinal=post_ord)
+    prev_post_id, next_post_id = [None] * 2
     if post:
-        prev_posts = posts.filter(pk__lt=post.pk).only('id').order_by('-id')
-        prev_count = prev_posts.count()
-        if prev_count:
-            prev_post = prev_posts[0]
-
-        next_posts = posts.filter(pk__gt=post.pk).only('id').order_by('id')
-        next_count = next_posts.count()
-        if next_count:
-            next_post = next_posts[0]
+        if not post_ord:
+            post_ord = results.get_ordinal(post.pk)
+        prev_post_id, next_post_id = results.get_neighbour_ids(post.pk, post_ord)
 
     template_data = {
         'post': post,
         'post_ord': post_ord,
-        'next_post': next_post,
-        'prev_post': prev_post,
+        'next_post_id': next_post_id,
+        'prev_post_id': prev_post_id,
         'query_string': query_string,
         'posts_count': posts_count,
     }
@@ -12,7 +12,6 @@ import collections
 import datetime
 import functools
 import logging
-import math
 import os
 import operator
 import urllib.request, urllib.parse, urllib.error
@@ -209,6 +208,9 @@ def users_list(request, by_group=False, group_id=None, group_slug=None):
                             users.order_by(order_by_parameter),
                             askbot_settings.USERS_PAGE_SIZE
                         )
+        objects_list.count = models.get_cached_users_count(
+                                        users, group.id if group else None
+                                    )
         base_url = request.path + '?sort=%s&' % sort_method
     else:
         sort_method = 'reputation'
@@ -1097,12 +1099,12 @@ def user_reputation(request, user, context):
                                     )
 
 
-    def format_graph_data(raw_data, user):
+    def format_graph_data(points, user):
         # prepare data for the graph - last values go in first
         final_rep = user.get_localized_profile().reputation + const.MIN_REPUTATION
         rep_list = ['[%s,%s]' % (calendar.timegm(datetime.datetime.now().timetuple()) * 1000, final_rep)]
-        for rep in raw_data:
-            rep_list.append('[%s,%s]' % (calendar.timegm(rep.reputed_at.timetuple()) * 1000, rep.reputation))
+        for reputed_at, reputation in points:
+            rep_list.append('[%s,%s]' % (calendar.timegm(reputed_at.timetuple()) * 1000, reputation))
 
         #add initial rep point
         rep_list.append('[%s,%s]' % (calendar.timegm(user.date_joined.timetuple()) * 1000, const.MIN_REPUTATION))
@@ -1112,27 +1114,22 @@ def user_reputation(request, user, context):
     sample_size = 150 #number of real data points to take for teh rep graph
     #two extra points are added for beginning and end
 
-    rep_length = reputes.count()
-    if rep_length <= sample_size:
-        raw_graph_data = reputes
+    if models.ReputationSnapshot.objects.is_enabled():
+        graph_points = models.ReputationSnapshot.objects.get_graph_points(
+                                                user, get_language(), sample_size
+                                            )
     else:
         #extract only a sampling of data to limit the number of data points
-        rep_qs = models.Repute.objects.filter(user=user,
-                                              language_code=get_language()
-                                             ).order_by('-reputed_at')
-        #extract 300 points
-        raw_graph_data = list()
-        step = rep_length / float(sample_size)
-        for idx in range(sample_size):
-            item_idx = int(math.ceil(idx * step))
-            raw_graph_data.append(rep_qs[item_idx])
+        graph_points = models.Repute.objects.get_graph_points(
+                                                user, get_language(), sample_size
+                                            )
 
     data = {
         'active_tab':'users',
         'tab_name': 'reputation',
         'page_title': _("Profile - User's Karma"),
         'latest_rep_changes': reputes[:100],
-        'rep_graph_data': format_graph_data(raw_graph_data, user)
+        'rep_graph_data': format_graph_data(graph_points, user)
     }
     context.update(data)
     return render(request, 'user_profile/user_reputation.html', context)